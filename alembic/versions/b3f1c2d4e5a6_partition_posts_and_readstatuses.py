@@ -0,0 +1,120 @@
+"""Partition posts and readstatuses by created_at.
+
+Revision ID: b3f1c2d4e5a6
+Revises: 9aae827381b1
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.config import constants
+from app.db.partitions import (
+    add_months, create_default_partition_sql, create_partition_sql,
+    monthly_range
+)
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f1c2d4e5a6'
+down_revision: Union[str, None] = '9aae827381b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = {
+    'posts': {
+        'columns': (
+            "id INTEGER NOT NULL DEFAULT nextval('posts_id_seq'::regclass), "
+            'created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL, '
+            'blog_id INTEGER NOT NULL, '
+            'title VARCHAR(50) NOT NULL, '
+            'content VARCHAR(140), '
+            'CONSTRAINT posts_blog_id_fkey FOREIGN KEY (blog_id) '
+            'REFERENCES blogs (id)'
+        ),
+        'names': ('id', 'created_at', 'blog_id', 'title', 'content'),
+        'indexes': (
+            ('ix_posts_blog_id_created_at', ['blog_id', 'created_at']),
+        ),
+    },
+    'readstatuses': {
+        'columns': (
+            'id INTEGER NOT NULL '
+            "DEFAULT nextval('readstatuses_id_seq'::regclass), "
+            'created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL, '
+            'user_id INTEGER NOT NULL, '
+            'post_id INTEGER NOT NULL, '
+            'CONSTRAINT readstatuses_user_id_fkey FOREIGN KEY (user_id) '
+            'REFERENCES users (id)'
+        ),
+        'names': ('id', 'created_at', 'user_id', 'post_id'),
+        'indexes': (
+            ('ix_readstatuses_user_id_post_id', ['user_id', 'post_id']),
+            ('ix_readstatuses_post_id', ['post_id']),
+        ),
+    },
+}
+CREATED_AT_EXPR = "COALESCE(created_at, timezone('utc', now()))"
+
+
+def _rebuild_table(table: str, partitioned: bool) -> None:
+    """
+    Пересоздает таблицу с секционированием или без него, перенося данные и
+    последовательность первичного ключа.
+    """
+    spec = TABLES[table]
+    old_table = f'{table}_old'
+    op.execute(f'ALTER TABLE {table} RENAME TO {old_table}')
+    op.execute(f'ALTER INDEX {table}_pkey RENAME TO {old_table}_pkey')
+    if partitioned:
+        op.execute(
+            f"CREATE TABLE {table} ({spec['columns']}, "
+            f'CONSTRAINT {table}_pkey PRIMARY KEY (id, created_at)) '
+            'PARTITION BY RANGE (created_at)'
+        )
+        op.execute(create_default_partition_sql(table))
+        first = op.get_bind().execute(
+            sa.text(f'SELECT min(created_at) FROM {old_table}')
+        ).scalar() or datetime.utcnow()
+        last = add_months(
+            datetime.utcnow(), constants.PARTITIONS_PREMAKE_MONTHS
+        )
+        for start in monthly_range(first, last):
+            op.execute(create_partition_sql(table, start))
+    else:
+        op.execute(
+            f"CREATE TABLE {table} ({spec['columns']}, "
+            f'CONSTRAINT {table}_pkey PRIMARY KEY (id))'
+        )
+    columns = ', '.join(spec['names'])
+    values = columns.replace('created_at', CREATED_AT_EXPR)
+    op.execute(
+        f'INSERT INTO {table} ({columns}) SELECT {values} FROM {old_table}'
+    )
+    op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id')
+    op.execute(f'DROP TABLE {old_table} CASCADE')
+    for index_name, index_columns in spec['indexes']:
+        op.create_index(index_name, table, index_columns)
+
+
+def upgrade() -> None:
+    op.drop_constraint(
+        'readstatuses_post_id_fkey', 'readstatuses', type_='foreignkey'
+    )
+    _rebuild_table('posts', partitioned=True)
+    _rebuild_table('readstatuses', partitioned=True)
+
+
+def downgrade() -> None:
+    _rebuild_table('readstatuses', partitioned=False)
+    _rebuild_table('posts', partitioned=False)
+    op.execute(
+        'DELETE FROM readstatuses WHERE post_id NOT IN (SELECT id FROM posts)'
+    )
+    op.create_foreign_key(
+        'readstatuses_post_id_fkey', 'readstatuses', 'posts',
+        ['post_id'], ['id']
+    )
@@ -0,0 +1,43 @@
+"""Add feedchanges log for feed delta sync.
+
+Revision ID: c4d2e3f5a6b7
+Revises: b3f1c2d4e5a6
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d2e3f5a6b7'
+down_revision: Union[str, None] = 'b3f1c2d4e5a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('feedchanges',
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('blog_id', sa.Integer(), nullable=True),
+    sa.Column('post_id', sa.Integer(), nullable=True),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_feedchanges_user_id_id', 'feedchanges',
+                    ['user_id', 'id'])
+    op.create_index('ix_feedchanges_blog_id_id', 'feedchanges',
+                    ['blog_id', 'id'])
+    op.create_index('ix_feedchanges_created_at', 'feedchanges',
+                    ['created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_feedchanges_created_at', table_name='feedchanges')
+    op.drop_index('ix_feedchanges_blog_id_id', table_name='feedchanges')
+    op.drop_index('ix_feedchanges_user_id_id', table_name='feedchanges')
+    op.drop_table('feedchanges')
@@ -0,0 +1,40 @@
+"""Add blogsimilarities for blog recommendations.
+
+Revision ID: d5e3f4a6b7c8
+Revises: c4d2e3f5a6b7
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5e3f4a6b7c8'
+down_revision: Union[str, None] = 'c4d2e3f5a6b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('blogsimilarities',
+    sa.Column('blog_id', sa.Integer(), nullable=False),
+    sa.Column('similar_blog_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['blog_id'], ['blogs.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['similar_blog_id'], ['blogs.id'],
+                            ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_blogsimilarities_blog_id', 'blogsimilarities',
+                    ['blog_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_blogsimilarities_blog_id',
+                  table_name='blogsimilarities')
+    op.drop_table('blogsimilarities')
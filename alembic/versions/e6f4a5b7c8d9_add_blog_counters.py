@@ -0,0 +1,54 @@
+"""Add subscriber, post counters and last post time to blogs.
+
+Revision ID: e6f4a5b7c8d9
+Revises: d5e3f4a6b7c8
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6f4a5b7c8d9'
+down_revision: Union[str, None] = 'd5e3f4a6b7c8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('blogs', sa.Column('subscribers_count', sa.Integer(),
+                                     server_default='0', nullable=False))
+    op.add_column('blogs', sa.Column('posts_count', sa.Integer(),
+                                     server_default='0', nullable=False))
+    op.add_column('blogs', sa.Column('last_post_at', sa.DateTime(),
+                                     nullable=True))
+    # Начальные значения для основной базы; при шардировании их выставит
+    # задача сверки счётчиков.
+    op.execute(
+        'UPDATE blogs SET '
+        'subscribers_count = (SELECT count(*) FROM subscriptions '
+        'WHERE subscriptions.blog_id = blogs.id), '
+        'posts_count = (SELECT count(*) FROM posts '
+        'WHERE posts.blog_id = blogs.id), '
+        'last_post_at = (SELECT max(created_at) FROM posts '
+        'WHERE posts.blog_id = blogs.id)'
+    )
+    op.create_index('ix_blogs_subscribers_count_id', 'blogs',
+                    ['subscribers_count', 'id'])
+    op.create_index('ix_blogs_posts_count_id', 'blogs',
+                    ['posts_count', 'id'])
+    op.create_index('ix_blogs_last_post_at_id', 'blogs',
+                    [sa.text('last_post_at DESC NULLS LAST'),
+                     sa.text('id DESC')])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_blogs_last_post_at_id', table_name='blogs')
+    op.drop_index('ix_blogs_posts_count_id', table_name='blogs')
+    op.drop_index('ix_blogs_subscribers_count_id', table_name='blogs')
+    op.drop_column('blogs', 'last_post_at')
+    op.drop_column('blogs', 'posts_count')
+    op.drop_column('blogs', 'subscribers_count')
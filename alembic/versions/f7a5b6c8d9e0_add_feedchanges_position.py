@@ -0,0 +1,62 @@
+"""Order feedchanges by commit with a position assigned after commit.
+
+Revision ID: f7a5b6c8d9e0
+Revises: e6f4a5b7c8d9
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7a5b6c8d9e0'
+down_revision: Union[str, None] = 'e6f4a5b7c8d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('feedchanges', sa.Column(
+        'txid', sa.BigInteger(), nullable=False,
+        server_default=sa.text('CAST(CAST(pg_current_xact_id() AS text) '
+                               'AS bigint)')
+    ))
+    op.add_column('feedchanges', sa.Column('position', sa.BigInteger(),
+                                           nullable=True))
+    op.execute('CREATE SEQUENCE feedchanges_position_seq')
+    # Уже выданные токены содержат ID записей, поэтому позиции старых
+    # записей совпадают с их ID.
+    op.execute('UPDATE feedchanges SET position = id')
+    op.execute(
+        "SELECT setval('feedchanges_position_seq', "
+        "COALESCE((SELECT max(id) FROM feedchanges), 0) + 1, false)"
+    )
+    op.drop_index('ix_feedchanges_user_id_id', table_name='feedchanges')
+    op.drop_index('ix_feedchanges_blog_id_id', table_name='feedchanges')
+    op.create_index('ix_feedchanges_position', 'feedchanges',
+                    ['position'], unique=True)
+    op.create_index('ix_feedchanges_user_id_position', 'feedchanges',
+                    ['user_id', 'position'])
+    op.create_index('ix_feedchanges_blog_id_position', 'feedchanges',
+                    ['blog_id', 'position'])
+    op.create_index('ix_feedchanges_unpositioned', 'feedchanges', ['id'],
+                    postgresql_where=sa.text('position IS NULL'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_feedchanges_unpositioned', table_name='feedchanges')
+    op.drop_index('ix_feedchanges_blog_id_position',
+                  table_name='feedchanges')
+    op.drop_index('ix_feedchanges_user_id_position',
+                  table_name='feedchanges')
+    op.drop_index('ix_feedchanges_position', table_name='feedchanges')
+    op.create_index('ix_feedchanges_user_id_id', 'feedchanges',
+                    ['user_id', 'id'])
+    op.create_index('ix_feedchanges_blog_id_id', 'feedchanges',
+                    ['blog_id', 'id'])
+    op.drop_column('feedchanges', 'position')
+    op.drop_column('feedchanges', 'txid')
+    op.execute('DROP SEQUENCE feedchanges_position_seq')
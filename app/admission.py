@@ -0,0 +1,178 @@
+import asyncio
+from collections import Counter
+from contextlib import asynccontextmanager
+from enum import Enum
+
+from fastapi import HTTPException, Request, status
+
+from app.config import constants, settings
+from app.db.session import get_engine
+
+
+class Priority(str, Enum):
+    """
+    Класс приоритета запроса: записи (CRITICAL) обслуживаются прежде
+    чтения отдельных объектов (NORMAL), а оно - прежде тяжёлых выборок
+    лент и целых таблиц (BULK).
+    """
+    CRITICAL = 'critical'
+    NORMAL = 'normal'
+    BULK = 'bulk'
+
+
+def priority(value: Priority):
+    """Декоратор эндпоинта, задающий класс приоритета его запросов."""
+    def decorator(endpoint):
+        endpoint.priority = value
+        return endpoint
+    return decorator
+
+
+def get_route_priority(request: Request) -> Priority:
+    """
+    Возвращает класс приоритета запроса: заданный декоратором priority, а
+    без него - CRITICAL для записей и NORMAL для чтения.
+    """
+    route = request.scope['route']
+    value = getattr(route.endpoint, 'priority', None)
+    if value is not None:
+        return value
+    if request.method in ('GET', 'HEAD'):
+        return Priority.NORMAL
+    return Priority.CRITICAL
+
+
+class AdmissionController:
+    """
+    Ограничивает число одновременно обрабатываемых запросов каждого класса
+    приоритета и отдельных маршрутов. Запрос, которому не хватило места,
+    ждёт в очереди своего класса; если очередь переполнена, ожидание
+    превысило допустимое или пул соединений с основной базой исчерпан
+    (для классов ниже CRITICAL), запрос сразу отклоняется с 503.
+    """
+
+    def __init__(
+        self, limits: dict[str, int], queue_limits: dict[str, int],
+        max_wait_ms: dict[str, float], route_limits: dict[str, int],
+        pool_capacity: int, retry_after: int
+    ):
+        self.queue_limits = queue_limits
+        self.max_wait_ms = max_wait_ms
+        self.route_limits = route_limits
+        self.pool_capacity = pool_capacity
+        self.retry_after = retry_after
+        self._semaphores = {
+            value: asyncio.Semaphore(limits[value]) for value in Priority
+        }
+        self.waiting: Counter = Counter()
+        self.in_flight: Counter = Counter()
+        self.routes_in_flight: Counter = Counter()
+        self.admitted: Counter = Counter()
+        self.shed: Counter = Counter()
+
+    def is_pool_saturated(self) -> bool:
+        """Заняты ли все соединения пула основной базы."""
+        pool = get_engine().sync_engine.pool
+        return pool.checkedout() >= self.pool_capacity
+
+    def _reject(self, value: Priority, reason: str) -> HTTPException:
+        """Учитывает отклонённый запрос и возвращает ошибку 503."""
+        self.shed[(value, reason)] += 1
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='Сервис перегружен, повторите запрос позже.',
+            headers={'Retry-After': str(self.retry_after)}
+        )
+
+    @asynccontextmanager
+    async def admit(self, value: Priority, route_name: str):
+        """
+        Допускает запрос к обработке на время контекста или отклоняет его
+        с HTTPException 503 и заголовком Retry-After.
+        """
+        route_limit = self.route_limits.get(route_name)
+        if (
+            route_limit is not None and
+            self.routes_in_flight[route_name] >= route_limit
+        ):
+            raise self._reject(value, 'route_limit')
+        # Место маршрута занимается до первого ожидания, иначе пачка
+        # одновременных запросов пройдёт проверку лимита маршрута вместе.
+        self.routes_in_flight[route_name] += 1
+        try:
+            if value != Priority.CRITICAL and self.is_pool_saturated():
+                raise self._reject(value, 'pool_saturated')
+            if self.waiting[value] >= self.queue_limits[value]:
+                raise self._reject(value, 'queue_full')
+            self.waiting[value] += 1
+            try:
+                await asyncio.wait_for(
+                    self._semaphores[value].acquire(),
+                    timeout=self.max_wait_ms[value] / 1000
+                )
+            except asyncio.TimeoutError:
+                raise self._reject(value, 'queue_timeout')
+            finally:
+                self.waiting[value] -= 1
+            self.admitted[value] += 1
+            self.in_flight[value] += 1
+            try:
+                yield
+            finally:
+                self.in_flight[value] -= 1
+                self._semaphores[value].release()
+        finally:
+            self.routes_in_flight[route_name] -= 1
+
+    def stats(self) -> dict:
+        """
+        Возвращает занятость пула основной базы и счётчики допущенных,
+        ожидающих и отклонённых запросов по классам приоритета.
+        """
+        classes = {
+            value.value: {
+                'in_flight': self.in_flight[value],
+                'waiting': self.waiting[value],
+                'admitted': self.admitted[value],
+                'shed': {
+                    reason: count
+                    for (shed_value, reason), count in self.shed.items()
+                    if shed_value == value
+                },
+            }
+            for value in Priority
+        }
+        return {
+            'pool': {
+                'checked_out': get_engine().sync_engine.pool.checkedout(),
+                'capacity': self.pool_capacity,
+            },
+            'classes': classes,
+        }
+
+
+admission_controller = (
+    AdmissionController(
+        limits=settings.admission_limits,
+        queue_limits=settings.admission_queue_limits,
+        max_wait_ms=settings.admission_max_wait_ms,
+        route_limits=settings.admission_route_limits,
+        pool_capacity=settings.db_pool_size + settings.db_max_overflow,
+        retry_after=constants.ADMISSION_RETRY_AFTER
+    )
+    if settings.admission_control else None
+)
+
+
+async def admit_request(request: Request):
+    """
+    Зависимость роутеров API: допускает запрос к обработке по его классу
+    приоритета и маршруту, если контроль допуска включён.
+    """
+    if admission_controller is None:
+        yield
+        return
+    async with admission_controller.admit(
+        get_route_priority(request), request.scope['route'].name
+    ):
+        yield
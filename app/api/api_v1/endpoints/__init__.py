@@ -1,3 +1,5 @@
 # Flake8: noqa F401
 from .users import router as users_router
-from .blogs import router as blogs_router
\ No newline at end of file
+from .blogs import router as blogs_router
+from .admin import router as admin_router
+from .batch import router as batch_router
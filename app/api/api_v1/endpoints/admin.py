@@ -0,0 +1,132 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import HTMLResponse
+
+from app.admission import admission_controller
+from app.config import constants
+from app.db.slow_queries import slow_query_log
+from app.db.statements import get_cache_stats
+from app.profiling import request_profiler
+from app.singleflight import single_flight
+
+router = APIRouter()
+
+
+async def check_profiling_token(
+    token: str | None = Header(None, alias=constants.PROFILE_HEADER)
+) -> None:
+    """
+    Зависимость эндпоинтов профилей: пропускает запрос, только если в
+    заголовке PROFILE_HEADER передан PROFILING_TOKEN.
+    """
+    if request_profiler is not None and not request_profiler.check_token(
+        token
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail='Неверный токен профилирования'
+        )
+
+
+@router.get(
+    path='/metrics/single-flight',
+    status_code=status.HTTP_200_OK
+)
+async def get_single_flight_metrics() -> dict:
+    """
+    Возвращает счётчики объединения одинаковых запросов на чтение в этом
+    процессе.
+    """
+    if single_flight is None:
+        return {'enabled': False}
+    return {'enabled': True, **single_flight.stats()}
+
+
+@router.get(
+    path='/metrics/statement-cache',
+    status_code=status.HTTP_200_OK
+)
+async def get_statement_cache_metrics() -> dict:
+    """
+    Возвращает счётчики обращений к кэшу скомпилированных запросов
+    SQLAlchemy в этом процессе.
+    """
+    return get_cache_stats()
+
+
+@router.get(
+    path='/metrics/slow-queries',
+    status_code=status.HTTP_200_OK
+)
+async def get_slow_queries() -> dict:
+    """
+    Возвращает самые медленные формы запросов этого процесса с их планами
+    выполнения и последние записанные запросы.
+    """
+    if slow_query_log is None:
+        return {'enabled': False}
+    return {'enabled': True, **slow_query_log.stats()}
+
+
+@router.get(
+    path='/metrics/admission',
+    status_code=status.HTTP_200_OK
+)
+async def get_admission_metrics() -> dict:
+    """
+    Возвращает счётчики контроля допуска запросов этого процесса, в том
+    числе отклонённых по причинам.
+    """
+    if admission_controller is None:
+        return {'enabled': False}
+    return {'enabled': True, **admission_controller.stats()}
+
+
+@router.post(
+    path='/profiles/arm',
+    dependencies=[Depends(check_profiling_token)],
+    status_code=status.HTTP_200_OK
+)
+async def arm_request_profiling(
+    count: int = Query(1, ge=0, le=constants.PROFILES_MAX),
+    path: str = '/'
+) -> dict:
+    """
+    Включает профилирование count следующих запросов этого процесса, путь
+    которых начинается с path. count=0 выключает профилирование.
+    """
+    if request_profiler is None:
+        return {'enabled': False}
+    request_profiler.arm(count, path)
+    return {'enabled': True, **request_profiler.stats()}
+
+
+@router.get(
+    path='/profiles',
+    dependencies=[Depends(check_profiling_token)],
+    status_code=status.HTTP_200_OK
+)
+async def get_request_profiles() -> dict:
+    """Возвращает список сохранённых профилей запросов этого процесса."""
+    if request_profiler is None:
+        return {'enabled': False}
+    return {'enabled': True, **request_profiler.stats()}
+
+
+@router.get(
+    path='/profiles/{profile_id}',
+    dependencies=[Depends(check_profiling_token)],
+    response_class=HTMLResponse,
+    status_code=status.HTTP_200_OK
+)
+async def get_request_profile(profile_id: str) -> HTMLResponse:
+    """Возвращает профиль запроса в виде HTML-отчёта pyinstrument."""
+    profile = (
+        request_profiler.profiles.get(profile_id)
+        if request_profiler is not None else None
+    )
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f'Профиль {profile_id} не найден'
+        )
+    return HTMLResponse(profile['html'])
@@ -0,0 +1,240 @@
+import asyncio
+from functools import partial
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.admission import admit_request
+from app.api.api_v1.validators import (
+    check_blog_exists, check_post_exists, check_read_status_exists,
+    check_subscription_exists, check_user_exists, check_user_is_blog_owner
+)
+from app.crud import (
+    commit_batch, post_crud, read_status_crud, run_after_commit, savepoint,
+    subscription_crud
+)
+from app.db.loader import get_loader
+from app.db.session import get_async_session
+from app.db.shards import get_shard_session
+from app.models import Blog, Post, User
+from app.negotiation import NegotiatedRoute
+from app.read_buffer import read_status_buffer
+from app.schemas import (
+    BatchOperationResult, BatchRequest, BatchResponse, CreatePostOperation,
+    DeletePostOperation, MarkReadOperation, PostCreate, PostView,
+    ReadStatusCreate, ReadStatusPending, ReadStatusView, SubscribeOperation,
+    SubscriptionCreate, SubscriptionView, UnmarkReadOperation,
+    UnsubscribeOperation
+)
+
+router = APIRouter(
+    route_class=NegotiatedRoute, dependencies=[Depends(admit_request)]
+)
+
+
+async def _subscribe(
+    session: AsyncSession, operation: SubscribeOperation
+) -> BatchOperationResult:
+    """Подписывает пользователя на блог."""
+    user_id, blog_id = operation.user_id, operation.blog_id
+    await asyncio.gather(
+        check_user_exists(session=session, user_id=user_id),
+        check_blog_exists(session=session, blog_id=blog_id)
+    )
+    await check_subscription_exists(
+        session=session, user_id=user_id, blog_id=blog_id, delete=False
+    )
+    await check_user_is_blog_owner(
+        session=session, user_id=user_id, blog_id=blog_id
+    )
+    db_subscription = await subscription_crud.create(
+        session, SubscriptionCreate(blog_id=blog_id), commit=False,
+        user_id=user_id
+    )
+    return BatchOperationResult(
+        status=status.HTTP_201_CREATED,
+        result=SubscriptionView.model_validate(db_subscription)
+    )
+
+
+async def _unsubscribe(
+    session: AsyncSession, operation: UnsubscribeOperation
+) -> BatchOperationResult:
+    """Отписывает пользователя от блога."""
+    user_id, blog_id = operation.user_id, operation.blog_id
+    await asyncio.gather(
+        check_user_exists(session=session, user_id=user_id),
+        check_blog_exists(session=session, blog_id=blog_id)
+    )
+    db_subscription = await check_subscription_exists(
+        session=session, user_id=user_id, blog_id=blog_id, delete=True
+    )
+    await subscription_crud.remove(session, db_subscription, commit=False)
+    return BatchOperationResult(status=status.HTTP_204_NO_CONTENT)
+
+
+async def _mark_read(
+    session: AsyncSession, operation: MarkReadOperation
+) -> BatchOperationResult:
+    """
+    Отмечает пост прочитанным. В режиме отложенной записи отметка ставится
+    в очередь после коммита пакета.
+    """
+    user_id, post_id = operation.user_id, operation.post_id
+    await asyncio.gather(
+        check_user_exists(session=session, user_id=user_id),
+        check_post_exists(session=session, post_id=post_id)
+    )
+    await check_read_status_exists(
+        session=session, user_id=user_id, post_id=post_id, delete=False
+    )
+    if read_status_buffer is not None:
+        await run_after_commit(
+            session,
+            partial(
+                read_status_crud.enqueue, session, user_id, post_id,
+                read=True
+            ),
+            commit=False
+        )
+        return BatchOperationResult(
+            status=status.HTTP_202_ACCEPTED,
+            result=ReadStatusPending(user_id=user_id, post_id=post_id)
+        )
+    db_read_status = await read_status_crud.create(
+        session, ReadStatusCreate(post_id=post_id), commit=False,
+        user_id=user_id
+    )
+    return BatchOperationResult(
+        status=status.HTTP_201_CREATED,
+        result=ReadStatusView.model_validate(db_read_status)
+    )
+
+
+async def _unmark_read(
+    session: AsyncSession, operation: UnmarkReadOperation
+) -> BatchOperationResult:
+    """
+    Снимает отметку о прочтении поста. В режиме отложенной записи снятие
+    отметки ставится в очередь после коммита пакета.
+    """
+    user_id, post_id = operation.user_id, operation.post_id
+    await asyncio.gather(
+        check_user_exists(session=session, user_id=user_id),
+        check_post_exists(session=session, post_id=post_id)
+    )
+    db_read_status = await check_read_status_exists(
+        session=session, user_id=user_id, post_id=post_id, delete=True
+    )
+    if read_status_buffer is not None:
+        await run_after_commit(
+            session,
+            partial(
+                read_status_crud.enqueue, session, user_id, post_id,
+                read=False
+            ),
+            commit=False
+        )
+        return BatchOperationResult(status=status.HTTP_202_ACCEPTED)
+    await read_status_crud.remove(session, db_read_status, commit=False)
+    return BatchOperationResult(status=status.HTTP_204_NO_CONTENT)
+
+
+async def _create_post(
+    session: AsyncSession, operation: CreatePostOperation
+) -> BatchOperationResult:
+    """Создает пост в блоге."""
+    await check_blog_exists(session=session, blog_id=operation.blog_id)
+    db_post = await post_crud.create(
+        session,
+        PostCreate(title=operation.title, content=operation.content),
+        commit=False, blog_id=operation.blog_id
+    )
+    return BatchOperationResult(
+        status=status.HTTP_201_CREATED,
+        result=PostView.model_validate(db_post)
+    )
+
+
+async def _delete_post(
+    session: AsyncSession, operation: DeletePostOperation
+) -> BatchOperationResult:
+    """Удаляет пост."""
+    db_post = await check_post_exists(
+        session=session, post_id=operation.post_id
+    )
+    await post_crud.remove(session, db_post, commit=False)
+    return BatchOperationResult(status=status.HTTP_204_NO_CONTENT)
+
+
+# Обработчик операции и поле, по которому выбирается шард её объекта.
+OPERATIONS = {
+    SubscribeOperation: (_subscribe, 'user_id'),
+    UnsubscribeOperation: (_unsubscribe, 'user_id'),
+    MarkReadOperation: (_mark_read, 'user_id'),
+    UnmarkReadOperation: (_unmark_read, 'user_id'),
+    CreatePostOperation: (_create_post, 'blog_id'),
+    DeletePostOperation: (_delete_post, 'post_id'),
+}
+
+
+async def _prefetch(session: AsyncSession, obj_in: BatchRequest) -> None:
+    """
+    Загружает пользователей, блоги и посты всех операций пакета через
+    загрузчик сессии: проверки существования объектов в операциях берут
+    их из загрузчика без отдельных запросов.
+    """
+    ids = {User: set(), Blog: set(), Post: set()}
+    for operation in obj_in.operations:
+        for model, field in (
+            (User, 'user_id'), (Blog, 'blog_id'), (Post, 'post_id')
+        ):
+            obj_id = getattr(operation, field, None)
+            if obj_id is not None:
+                ids[model].add(obj_id)
+    loader = get_loader(session)
+    await asyncio.gather(*(
+        loader.load_many(model, list(obj_ids))
+        for model, obj_ids in ids.items() if obj_ids
+    ))
+
+
+@router.post(
+    path='/',
+    response_model=BatchResponse,
+    response_model_exclude_none=True,
+    status_code=status.HTTP_200_OK
+)
+async def execute_batch(
+    obj_in: BatchRequest,
+    session: AsyncSession = Depends(get_async_session)
+) -> BatchResponse:
+    """
+    Выполняет пакет операций с подписками, статусами прочтения и постами в
+    одной транзакции с одним коммитом. Каждая операция выполняется в своей
+    точке сохранения: ошибка операции откатывает только её, а в результатах
+    возвращаются коды ответа и объекты, которые вернули бы отдельные
+    эндпоинты.
+    """
+    await _prefetch(session, obj_in)
+    results = []
+    for operation in obj_in.operations:
+        handler, shard_key = OPERATIONS[type(operation)]
+        db_session = get_shard_session(
+            session, getattr(operation, shard_key)
+        )
+        try:
+            async with savepoint(session, db_session):
+                results.append(await handler(session, operation))
+        except HTTPException as error:
+            results.append(BatchOperationResult(
+                status=error.status_code, detail=error.detail
+            ))
+        except IntegrityError:
+            results.append(BatchOperationResult(
+                status=status.HTTP_409_CONFLICT,
+                detail='Операция противоречит состоянию базы.'
+            ))
+    await commit_batch(session)
+    return BatchResponse(results=results)
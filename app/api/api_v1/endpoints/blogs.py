@@ -1,14 +1,20 @@
+from functools import partial
+
 from fastapi import APIRouter, Depends, Response, status
-from fastapi_pagination import paginate
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.admission import Priority, admit_request, priority
 from app.api.api_v1.validators import check_blog_exists, check_post_exists
-from app.pagination import CustomPage as Page
+from app.pagination import CustomPage as Page, paginate_lazy
 from app.crud import blog_crud, post_crud
 from app.db.session import get_async_session
-from app.schemas import BlogView, PostCreate, PostView
+from app.db.totals import TotalMode
+from app.negotiation import NegotiatedRoute
+from app.schemas import BlogSort, BlogView, PostCreate, PostView
 
-router = APIRouter()
+router = APIRouter(
+    route_class=NegotiatedRoute, dependencies=[Depends(admit_request)]
+)
 
 
 @router.get(
@@ -16,11 +22,17 @@ router = APIRouter()
     response_model=list[BlogView],
     status_code=status.HTTP_200_OK
 )
+@priority(Priority.BULK)
 async def get_blogs(
-    session: AsyncSession = Depends(get_async_session)
+    session: AsyncSession = Depends(get_async_session),
+    sort: BlogSort = BlogSort.CREATED
 ) -> list[BlogView]:
-    """Возвращает список всех блогов."""
-    db_blogs = await blog_crud.get_multi(session)
+    """
+    Возвращает список всех блогов. Параметр sort задает порядок: по времени
+    создания (created), количеству подписчиков (subscribers), количеству
+    постов (posts) или времени последнего поста (last_post).
+    """
+    db_blogs = await blog_crud.get_multi_sorted(session, sort=sort)
     return db_blogs
 
 
@@ -67,11 +79,18 @@ async def delete_post(
 )
 async def get_posts_for_blog(
     blog_id: int,
-    session: AsyncSession = Depends(get_async_session)
+    session: AsyncSession = Depends(get_async_session),
+    total_mode: TotalMode = TotalMode.EXACT
 ) -> Page[PostView]:  # type: ignore
-    """Возвращает список всех постов блога с пагинацией."""
+    """
+    Возвращает список всех постов блога с пагинацией. Параметр total_mode
+    задает способ подсчёта общего количества постов: exact, capped,
+    estimate или none.
+    """
     await check_blog_exists(session=session, blog_id=blog_id)
-    db_posts = await post_crud.get_multi_for_blog(
-        session=session, blog_id=blog_id
+    return await paginate_lazy(
+        fetch_items=partial(post_crud.get_multi_for_blog, session, blog_id),
+        count_items=partial(
+            post_crud.count_for_blog, session, blog_id, total_mode=total_mode
+        )
     )
-    return paginate(db_posts)
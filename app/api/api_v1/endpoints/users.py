@@ -1,24 +1,38 @@
-from fastapi import APIRouter, Depends, Response, status
+import asyncio
+from functools import partial
+
+from fastapi import APIRouter, Depends, Query, Response, status
+from fastapi.responses import JSONResponse
 from fastapi_pagination import paginate
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.admission import Priority, admit_request, priority
 from app.api.api_v1.validators import (
     check_blog_exists, check_post_exists, check_read_status_exists,
-    check_subscription_exists, check_user_exists,
+    check_subscription_exists, check_sync_token, check_user_exists,
     check_user_is_blog_owner, check_username_or_email_exists
 )
+from app.config import constants
 from app.crud import (
-    blog_crud, post_crud, read_status_crud, subscription_crud, user_crud
+    blog_crud, blog_similarity_crud, feed_change_crud, post_crud,
+    read_status_crud, subscription_crud, user_crud
 )
 from app.db.session import get_async_session
+from app.db.totals import TotalMode
 from app.models import User
-from app.pagination import CustomPage as Page
+from app.negotiation import NegotiatedRoute
+from app.pagination import CustomPage as Page, paginate_lazy
+from app.read_buffer import read_status_buffer
 from app.schemas import (
-    BlogCreate, PostView, PostInFeed, ReadStatusCreate, ReadStatusView,
+    BlogCreate, BlogRecommendation, BlogView, FeedChanges, PostView,
+    PostInFeed, ReadStatusCreate, ReadStatusPending, ReadStatusView,
     SubscriptionCreate, SubscriptionView, UserCreate, UserView
 )
+from app.sync_tokens import encode_sync_token
 
-router = APIRouter()
+router = APIRouter(
+    route_class=NegotiatedRoute, dependencies=[Depends(admit_request)]
+)
 
 
 @router.post(
@@ -47,6 +61,7 @@ async def create_user(
     response_model=list[UserView],
     status_code=status.HTTP_200_OK
 )
+@priority(Priority.BULK)
 async def get_users(
     session: AsyncSession = Depends(get_async_session)
 ) -> list[UserView]:
@@ -66,9 +81,11 @@ async def subscribe_user_to_blog(
     session: AsyncSession = Depends(get_async_session)
 ) -> SubscriptionView:
     """Создает подписку пользователя на блог."""
-    await check_user_exists(session=session, user_id=user_id)
     blog_id = obj_in.blog_id
-    await check_blog_exists(session=session, blog_id=blog_id)
+    await asyncio.gather(
+        check_user_exists(session=session, user_id=user_id),
+        check_blog_exists(session=session, blog_id=blog_id)
+    )
     await check_subscription_exists(
         session=session, user_id=user_id, blog_id=blog_id,
         delete=False
@@ -92,8 +109,10 @@ async def unsubscribe_user_from_blog(
     session: AsyncSession = Depends(get_async_session)
 ) -> Response:
     """Удаляет подписку пользователя на блог."""
-    await check_user_exists(session=session, user_id=user_id)
-    await check_blog_exists(session=session, blog_id=blog_id)
+    await asyncio.gather(
+        check_user_exists(session=session, user_id=user_id),
+        check_blog_exists(session=session, blog_id=blog_id)
+    )
     db_obj = await check_subscription_exists(
         session=session, user_id=user_id, blog_id=blog_id,
         delete=True
@@ -121,19 +140,32 @@ async def get_user_subscriptions(
     path='/{user_id}/read-posts',
     response_model=ReadStatusView,
     status_code=status.HTTP_201_CREATED,
+    responses={status.HTTP_202_ACCEPTED: {'model': ReadStatusPending}},
     tags=['posts read status']
 )
 async def mark_post_as_read_by_user(
     user_id: int, obj_in: ReadStatusCreate,
     session: AsyncSession = Depends(get_async_session)
 ) -> ReadStatusView:
-    """Создает запись о прочитанном пользователем посте."""
-    await check_user_exists(session=session, user_id=user_id)
+    """
+    Создает запись о прочитанном пользователем посте. В режиме отложенной
+    записи отметка ставится в очередь и подтверждается кодом 202.
+    """
     post_id = obj_in.post_id
-    await check_post_exists(session=session, post_id=post_id)
+    await asyncio.gather(
+        check_user_exists(session=session, user_id=user_id),
+        check_post_exists(session=session, post_id=post_id)
+    )
     await check_read_status_exists(
         session=session, user_id=user_id, post_id=post_id, delete=False
     )
+    if read_status_buffer is not None:
+        await read_status_crud.enqueue(session, user_id, post_id, read=True)
+        pending = ReadStatusPending(user_id=user_id, post_id=post_id)
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=pending.model_dump()
+        )
     db_read_status = await read_status_crud.create(
         session=session, obj_in=obj_in, user_id=user_id
     )
@@ -149,12 +181,22 @@ async def unmark_post_as_read_by_user(
     user_id: int, post_id: int,
     session: AsyncSession = Depends(get_async_session)
 ) -> Response:
-    """Удаляет запись о прочитанном пользователем посте."""
-    await check_user_exists(session=session, user_id=user_id)
-    await check_post_exists(session=session, post_id=post_id)
+    """
+    Удаляет запись о прочитанном пользователем посте. В режиме отложенной
+    записи снятие отметки ставится в очередь и подтверждается кодом 202.
+    """
+    await asyncio.gather(
+        check_user_exists(session=session, user_id=user_id),
+        check_post_exists(session=session, post_id=post_id)
+    )
     db_obj = await check_read_status_exists(
         session=session, user_id=user_id, post_id=post_id, delete=True
     )
+    if read_status_buffer is not None:
+        await read_status_crud.enqueue(
+            session, user_id, post_id, read=False
+        )
+        return Response(status_code=status.HTTP_202_ACCEPTED)
     await read_status_crud.remove(session, db_obj)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
@@ -181,28 +223,93 @@ async def get_user_read_statuses(
     status_code=status.HTTP_200_OK,
     tags=['feed']
 )
+@priority(Priority.BULK)
 async def get_user_feed(
     user_id: int, session: AsyncSession = Depends(get_async_session),
-    unread: bool = True, read: bool = True
+    unread: bool = True, read: bool = True,
+    total_mode: TotalMode = TotalMode.CAPPED
 ) -> Page[PostView]:  # type: ignore
     """
     Возвращает ленту пользователя с возможностью пагинации и фильтрации по
-    непрочитанным и прочитанным постам.
+    непрочитанным и прочитанным постам. Параметр total_mode задает способ
+    подсчёта общего количества постов: exact, capped, estimate или none.
     """
     await check_user_exists(session=session, user_id=user_id)
-    if unread and read:
-        db_objs = await post_crud.get_multi_for_user_feed(session, user_id)
-    elif unread:
-        db_objs = await post_crud.get_multi_unread_for_user_feed(
-            session, user_id
+    if not unread and not read:
+        return paginate([])
+    read_filter = None if unread and read else read
+    return await paginate_lazy(
+        fetch_items=partial(
+            post_crud.get_page_for_user_feed, session, user_id,
+            read=read_filter
+        ),
+        count_items=partial(
+            post_crud.count_for_user_feed, session, user_id,
+            read=read_filter, total_mode=total_mode
         )
-    elif read:
-        db_objs = await post_crud.get_multi_read_for_user_feed(
-            session, user_id
+    )
+
+
+@router.get(
+    path='/{user_id}/feed/changes',
+    response_model=FeedChanges,
+    response_model_exclude_none=True,
+    status_code=status.HTTP_200_OK,
+    tags=['feed']
+)
+@priority(Priority.BULK)
+async def get_user_feed_changes(
+    user_id: int, since: str | None = None,
+    session: AsyncSession = Depends(get_async_session)
+) -> FeedChanges:
+    """
+    Возвращает изменения ленты пользователя после токена синхронизации
+    since и новый токен. Без since возвращается только токен текущего
+    состояния ленты. На устаревший токен возвращается код 410, и ленту
+    нужно загрузить заново.
+    """
+    since_id = check_sync_token(since) if since is not None else None
+    await check_user_exists(session=session, user_id=user_id)
+    if since_id is None:
+        last_id = await feed_change_crud.get_last_position(session)
+        return FeedChanges(token=encode_sync_token(last_id or 0))
+    changes = await post_crud.get_feed_changes(session, user_id, since_id)
+    return FeedChanges(
+        added=changes['added'], removed=changes['removed'],
+        read=changes['read'], unread=changes['unread'],
+        token=encode_sync_token(changes['last_id'])
+    )
+
+
+@router.get(
+    path='/{user_id}/recommendations',
+    response_model=list[BlogRecommendation],
+    status_code=status.HTTP_200_OK,
+    tags=['blogs']
+)
+async def get_user_recommendations(
+    user_id: int,
+    limit: int = Query(
+        constants.RECOMMENDATIONS_PER_PAGE, ge=1,
+        le=constants.MAX_RECOMMENDATIONS
+    ),
+    session: AsyncSession = Depends(get_async_session)
+) -> list[BlogRecommendation]:
+    """
+    Возвращает блоги, которые могут понравиться пользователю: похожие по
+    подписчикам на блоги его подписок. Собственные блоги пользователя и
+    блоги, на которые он уже подписан, не рекомендуются.
+    """
+    await check_user_exists(session=session, user_id=user_id)
+    recommendations = await blog_similarity_crud.get_recommendations_for_user(
+        session, user_id, limit=limit
+    )
+    return [
+        BlogRecommendation(
+            **BlogView.model_validate(blog).model_dump(), score=score
         )
-    else:
-        db_objs = []
-    return paginate(db_objs)
+        for blog, score in recommendations
+    ]
 
 
 async def _create_first_blog_for_user(
@@ -1,6 +1,8 @@
 from fastapi import APIRouter
 
-from app.api.api_v1.endpoints import blogs_router, users_router
+from app.api.api_v1.endpoints import (
+    admin_router, batch_router, blogs_router, users_router
+)
 
 main_router = APIRouter(prefix='/api/v1')
 
@@ -15,3 +17,15 @@ main_router.include_router(
     prefix='/blogs',
     tags=['blogs']
 )
+
+main_router.include_router(
+    router=admin_router,
+    prefix='/admin',
+    tags=['admin']
+)
+
+main_router.include_router(
+    router=batch_router,
+    prefix='/batch',
+    tags=['batch']
+)
@@ -6,6 +6,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.crud import (
     blog_crud, post_crud, read_status_crud, subscription_crud, user_crud
 )
+from app.read_buffer import read_status_buffer
+from app.sync_tokens import ExpiredSyncToken, decode_sync_token
 
 
 async def check_username_or_email_exists(
@@ -75,7 +77,10 @@ async def check_subscription_exists(
 async def check_user_is_blog_owner(
         session: AsyncSession, user_id: int, blog_id: int
 ):
-    """Проверяет, не является ли пользователь владельцем блога."""
+    """
+    Проверяет, не является ли пользователь владельцем блога. Блог обычно уже
+    загружен при проверке его существования и берётся из загрузчика сессии.
+    """
     db_blog = await blog_crud.get_by_id(session=session, obj_id=blog_id)
     if db_blog.user_id == user_id:
         raise HTTPException(
@@ -102,13 +107,21 @@ async def check_read_status_exists(
     session: AsyncSession, user_id: int, post_id: int, delete: bool = False
 ):
     """
-    Проверяет наличие статуса прочтения в базе. Не даёт создать или удалить
+    Проверяет наличие статуса прочтения в базе с учётом ещё не записанных
+    изменений из буфера отложенной записи. Не даёт создать или удалить
     повторно.
     """
     db_read_status = await read_status_crud.get(
         session=session, user_id=user_id, post_id=post_id
     )
-    if db_read_status and not delete:
+    is_read = db_read_status is not None
+    if read_status_buffer is not None:
+        pending_state = await read_status_buffer.get_pending_state(
+            user_id, post_id
+        )
+        if pending_state is not None:
+            is_read = pending_state
+    if is_read and not delete:
         raise HTTPException(
             status_code=HTTPStatus.BAD_REQUEST,
             detail=(
@@ -116,7 +129,7 @@ async def check_read_status_exists(
                 f'{post_id}.'
             )
         )
-    if not db_read_status and delete:
+    if not is_read and delete:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND,
             detail=(
@@ -125,3 +138,22 @@ async def check_read_status_exists(
             )
         )
     return db_read_status
+
+
+def check_sync_token(token: str) -> int:
+    """
+    Проверяет токен синхронизации ленты и возвращает позицию в журнале
+    изменений. Для устаревшего токена клиент должен заново загрузить ленту.
+    """
+    try:
+        return decode_sync_token(token)
+    except ExpiredSyncToken:
+        raise HTTPException(
+            status_code=HTTPStatus.GONE,
+            detail='Токен синхронизации устарел, загрузите ленту заново'
+        )
+    except ValueError:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail='Некорректный токен синхронизации'
+        )
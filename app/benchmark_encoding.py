@@ -0,0 +1,91 @@
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+
+import msgpack
+
+from app.compression import COMPRESSORS
+from app.config import constants
+
+
+def build_feed_page(size: int) -> dict:
+    """
+    Возвращает страницу ленты в том виде, в каком её сериализует FastAPI:
+    словари с датами в формате ISO.
+    """
+    now = datetime.utcnow()
+    return {
+        'items': [
+            {
+                'id': number,
+                'blog_id': number % 97,
+                'title': f'Заголовок поста номер {number}'[
+                    :constants.TITLE_MAX_LENGTH
+                ],
+                'content': (
+                    f'Текст поста {number}. ' * 10
+                )[:constants.CONTENT_MAX_LENGTH],
+                'created_at': (now - timedelta(minutes=number)).isoformat(),
+                'is_read': number % 3 == 0,
+            }
+            for number in range(size)
+        ],
+        'total': size,
+        'page': 1,
+        'size': size,
+        'pages': 1,
+        'total_kind': 'exact',
+    }
+
+
+def encode_json(content) -> bytes:
+    """Кодирует ответ так же, как JSONResponse."""
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None,
+        separators=(',', ':')
+    ).encode('utf-8')
+
+
+ENCODERS = {'json': encode_json, 'msgpack': msgpack.packb}
+
+
+def measure(function, argument, repeat: int) -> tuple[float, bytes]:
+    """Возвращает процессорное время одного вызова в мкс и его результат."""
+    started = time.process_time()
+    for _ in range(repeat):
+        result = function(argument)
+    return (time.process_time() - started) / repeat * 1e6, result
+
+
+def main() -> int:
+    """
+    Выводит для каждого формата и кодировки сжатия размер ответа в байтах и
+    процессорное время кодирования страницы ленты.
+    """
+    parser = argparse.ArgumentParser(
+        description='Размер и время кодирования ответа по форматам.'
+    )
+    parser.add_argument(
+        '--size', type=int, default=constants.MAX_POSTS_IN_FEED,
+        help='Количество постов на странице.'
+    )
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+    page = build_feed_page(args.size)
+    print(f'{"формат":>18} {"байт":>10} {"мкс":>10}')
+    for format_name, encoder in ENCODERS.items():
+        encode_us, body = measure(encoder, page, args.repeat)
+        print(f'{format_name:>18} {len(body):10d} {encode_us:10.1f}')
+        for encoding, compress in COMPRESSORS.items():
+            compress_us, compressed = measure(compress, body, args.repeat)
+            print(
+                f'{format_name + "+" + encoding:>18} {len(compressed):10d} '
+                f'{encode_us + compress_us:10.1f}'
+            )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
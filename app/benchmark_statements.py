@@ -0,0 +1,101 @@
+import argparse
+import random
+import sys
+import time
+from datetime import datetime
+
+from sqlalchemy import desc, select
+from sqlalchemy.dialects.postgresql.asyncpg import dialect as asyncpg_dialect
+
+from app.crud import post_crud
+from app.models import Post, Subscription
+
+DIALECT = asyncpg_dialect()
+
+
+def build_feed_statement(user_id: int, read_posts_ids: list[int]):
+    """
+    Строит запрос непрочитанных постов ленты так, как он строился до
+    выделения общих запросов: с литералами и списком IN (...).
+    """
+    return select(Post).join(
+        Subscription, Post.blog_id == Subscription.blog_id
+    ).where(
+        (Subscription.user_id == user_id) &
+        (Post.created_at >= datetime.utcnow()) &
+        ~Post.id.in_(read_posts_ids)
+    ).order_by(desc(Post.created_at)).offset(0).limit(10)
+
+
+def run_rebuilt(calls: list[tuple[int, list[int]]]) -> tuple[float, set]:
+    """
+    Строит и компилирует запрос заново на каждый вызов, раскрывая список
+    IN в текст запроса, как это делает драйвер перед выполнением.
+    """
+    texts = set()
+    started = time.process_time()
+    for user_id, read_posts_ids in calls:
+        compiled = build_feed_statement(user_id, read_posts_ids).compile(
+            dialect=DIALECT, compile_kwargs={'render_postcompile': True}
+        )
+        compiled.construct_params()
+        texts.add(compiled.string)
+    return time.process_time() - started, texts
+
+
+def run_prebuilt(calls: list[tuple[int, list[int]]]) -> tuple[float, set]:
+    """
+    Использует общий запрос с параметрами: на каждый вызов вычисляется
+    только ключ кэша и значения параметров, как при попадании в кэш
+    SQLAlchemy.
+    """
+    statement = post_crud._feed_page_statements[False]
+    compiled_cache = {}
+    texts = set()
+    started = time.process_time()
+    for user_id, read_posts_ids in calls:
+        cache_key = statement._generate_cache_key()
+        compiled = compiled_cache.get(cache_key)
+        if compiled is None:
+            compiled = compiled_cache[cache_key] = statement.compile(
+                dialect=DIALECT
+            )
+        compiled.construct_params({
+            'user_id': user_id, 'since': datetime.utcnow(),
+            'read_ids': read_posts_ids, 'limit': 10, 'offset': 0
+        })
+        texts.add(compiled.string)
+    return time.process_time() - started, texts
+
+
+def main() -> int:
+    """
+    Сравнивает процессорное время подготовки запроса непрочитанных постов
+    ленты на один вызов и количество различных текстов SQL, каждый из
+    которых asyncpg подготавливает отдельно.
+    """
+    parser = argparse.ArgumentParser(
+        description='Сравнение общих запросов с запросами, строящимися '
+                    'на каждый вызов.'
+    )
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--max-read', type=int, default=200)
+    args = parser.parse_args()
+    calls = [
+        (
+            random.randint(1, 1000),
+            random.sample(range(100000), random.randint(0, args.max_read))
+        )
+        for _ in range(args.calls)
+    ]
+    for name, run in (('rebuilt', run_rebuilt), ('prebuilt', run_prebuilt)):
+        elapsed, texts = run(calls)
+        print(
+            f'{name:>9}: {elapsed / args.calls * 1e6:8.1f} мкс на вызов, '
+            f'различных текстов SQL: {len(texts)}'
+        )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,31 +1,213 @@
 import asyncio
+import time
+from importlib import import_module
 
-from celery import Celery
+from celery import Celery, group
 from celery.schedules import crontab
+from celery.signals import (
+    before_task_publish, worker_init, worker_process_init,
+    worker_process_shutdown, worker_shutdown
+)
 
-from app.celery.tasks import send_email_to_users_with_feed
 from app.config import constants, settings
+from app.tracing import configure_tracing, shutdown_tracing, span
+
+QUEUE_REALTIME = 'realtime'
+QUEUE_MAINTENANCE = 'maintenance'
+QUEUE_BATCH = 'batch'
 
 celery_app = Celery(
     main='celery_app',
     broker=settings.redis_url
 )
+celery_app.conf.update(
+    task_default_queue=QUEUE_REALTIME,
+    task_default_priority=constants.CELERY_DEFAULT_PRIORITY,
+    broker_transport_options={
+        # В Redis 0 - наивысший приоритет.
+        'priority_steps': list(range(10)),
+        'queue_order_strategy': 'priority',
+        'visibility_timeout': constants.CELERY_VISIBILITY_TIMEOUT,
+    },
+    worker_prefetch_multiplier=settings.celery_prefetch_multiplier,
+    task_acks_late=settings.celery_acks_late,
+    task_reject_on_worker_lost=settings.celery_acks_late,
+    task_annotations={
+        f'app.celery.app.{name}': {'rate_limit': rate_limit}
+        for name, rate_limit in settings.celery_rate_limits.items()
+    },
+)
+
+
+def _load_tasks():
+    """
+    Возвращает модуль с реализацией задач. Он тянет за собой модели, CRUD и
+    драйверы баз, поэтому загружается при первом выполнении задачи, а не
+    при запуске воркера и beat.
+    """
+    return import_module('app.celery.tasks')
+
+
+def _is_prefork_pool(worker) -> bool:
+    """Работает ли воркер с пулом процессов prefork."""
+    pool_cls = getattr(worker, 'pool_cls', None)
+    name = pool_cls if isinstance(pool_cls, str) else getattr(
+        pool_cls, '__module__', ''
+    )
+    return 'prefork' in name
+
+
+@worker_init.connect
+def start_main_process_tracing(sender=None, **kwargs):
+    """
+    Настраивает трассировку в основном процессе воркера, если задачи
+    выполняются в нём самом (--pool=solo, threads, gevent): сигналы
+    процессов пула приходят только при prefork.
+    """
+    if not _is_prefork_pool(sender):
+        configure_tracing('nekidaem-worker')
+
+
+@worker_shutdown.connect
+def stop_main_process_tracing(sender=None, **kwargs):
+    """Отправляет накопленные спаны перед остановкой воркера без prefork."""
+    if not _is_prefork_pool(sender):
+        shutdown_tracing()
+
+
+@worker_process_init.connect
+def start_worker_tracing(**kwargs):
+    """
+    Настраивает трассировку в каждом процессе воркера: потоки экспорта
+    спанов не переживают fork.
+    """
+    configure_tracing('nekidaem-worker')
+
+
+@worker_process_shutdown.connect
+def stop_worker_tracing(**kwargs):
+    """Отправляет накопленные спаны перед остановкой процесса воркера."""
+    shutdown_tracing()
 
 
-@celery_app.task
-def email_users_with_feed():
+@before_task_publish.connect(sender='app.celery.app.email_users_with_feed')
+def stamp_mailing_time(body=None, **kwargs):
+    """
+    Запоминает в аргументах рассылки без явного слота время её отправки в
+    очередь: слот определяется по тику beat, а не по времени, когда
+    воркер взял задачу.
+    """
+    task_kwargs = body[1]
+    if task_kwargs.get('slot') is None:
+        task_kwargs.setdefault('scheduled_at', time.time())
+
+
+@celery_app.task(queue=QUEUE_REALTIME, priority=1)
+def email_users_with_feed(
+    slot: int | None = None, profile: bool = False,
+    scheduled_at: float | None = None
+):
     """
     Рассылка емэйлов (понарошку) пользователям с новыми постами из ленты.
+    Без аргумента slot рассылается слот, наступивший к моменту отправки
+    задачи в очередь, и пропущенные с последней рассылки слоты; уже
+    разосланный слот повторно не рассылается. Слот отмечается разосланным
+    только после отправки в очередь всех его частей. Пользователи слота
+    делятся на части по MAILING_CHUNK_SIZE, и каждая часть рассылается
+    отдельной задачей, так что рассылку можно распределить по воркерам, а
+    сбой одной части не заставляет повторять весь слот. С profile=True каждая
+    часть сохраняет профиль времени по этапам и памяти по пачкам.
     """
-    asyncio.run(send_email_to_users_with_feed())
+    tasks = _load_tasks()
+    size = constants.MAILING_CHUNK_SIZE
+    if slot is not None:
+        users_ids = asyncio.run(tasks.get_mailing_slot_users_ids(slot))
+        _publish_mailing_chunks(users_ids, size, profile)
+        return
+    for index in asyncio.run(tasks.get_pending_mailing_slots(
+        tasks.get_mailing_slot_index(scheduled_at or time.time())
+    )):
+        users_ids = asyncio.run(tasks.get_mailing_slot_users_ids(
+            index % constants.MAILING_SLOTS_PER_DAY
+        ))
+        _publish_mailing_chunks(users_ids, size, profile)
+        asyncio.run(tasks.mark_mailing_slot_sent(index))
+
+
+def _publish_mailing_chunks(
+    users_ids: list[int], size: int, profile: bool
+) -> None:
+    """Отправляет в очередь задачи рассылки частей слота."""
+    group(
+        email_users_chunk.s(users_ids[start:start + size], profile)
+        for start in range(0, len(users_ids), size)
+    ).apply_async()
+
+
+@celery_app.task(queue=QUEUE_BATCH, priority=7)
+def email_users_chunk(users_ids: list[int], profile: bool = False):
+    """Рассылка емэйлов части пользователей слота рассылки."""
+    with span('celery.email_users_chunk', users_count=len(users_ids)):
+        asyncio.run(_load_tasks().send_email_to_users(users_ids, profile))
+
+
+@celery_app.task(queue=QUEUE_MAINTENANCE, priority=3)
+def maintain_table_partitions():
+    """Обслуживание секций таблиц постов и статусов прочтения."""
+    asyncio.run(_load_tasks().maintain_partitions())
+
+
+@celery_app.task(queue=QUEUE_REALTIME, priority=0)
+def flush_read_statuses():
+    """Перенос отложенных отметок о прочтении постов в базу."""
+    asyncio.run(_load_tasks().flush_read_status_buffer())
+
+
+@celery_app.task(queue=QUEUE_MAINTENANCE, priority=3)
+def prune_feed_changes_log():
+    """Очистка журнала изменений лент от устаревших записей."""
+    asyncio.run(_load_tasks().prune_feed_changes())
+
+
+@celery_app.task(queue=QUEUE_BATCH, priority=9)
+def refresh_blog_recommendations():
+    """Пересчёт похожих блогов для рекомендаций."""
+    asyncio.run(_load_tasks().refresh_similar_blogs())
+
+
+@celery_app.task(queue=QUEUE_MAINTENANCE, priority=3)
+def reconcile_blog_counters():
+    """Сверка счётчиков блогов с постами и подписками."""
+    asyncio.run(_load_tasks().reconcile_blog_counters())
 
 
 celery_app.conf.beat_schedule = {
-    'email_uesrs_with_feed_daily': {
+    'email_users_with_feed_by_slots': {
         'task': 'app.celery.app.email_users_with_feed',
-        'schedule': crontab(
-            hour=constants.MAILING_TIME[0],
-            minute=constants.MAILING_TIME[1]
-        ),
+        'schedule': crontab(minute=f'*/{constants.MAILING_SLOT_MINUTES}'),
+        # Опоздавшая задача отбрасывается, её слот разошлёт следующая.
+        'options': {'expires': constants.MAILING_SLOT_MINUTES * 60},
+    },
+    'maintain_table_partitions_daily': {
+        'task': 'app.celery.app.maintain_table_partitions',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'prune_feed_changes_log_daily': {
+        'task': 'app.celery.app.prune_feed_changes_log',
+        'schedule': crontab(hour=3, minute=30),
+    },
+    'refresh_blog_recommendations_daily': {
+        'task': 'app.celery.app.refresh_blog_recommendations',
+        'schedule': crontab(hour=4, minute=0),
+    },
+    'reconcile_blog_counters_daily': {
+        'task': 'app.celery.app.reconcile_blog_counters',
+        'schedule': crontab(hour=4, minute=30),
     },
 }
+
+if settings.read_status_write_behind:
+    celery_app.conf.beat_schedule['flush_read_statuses'] = {
+        'task': 'app.celery.app.flush_read_statuses',
+        'schedule': constants.READ_STATUS_FLUSH_INTERVAL,
+    }
@@ -0,0 +1,111 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from html import escape
+from string import Template
+
+from app.config import settings
+from app.models import Post, User
+
+POST_TEXT_TEMPLATE = Template('  $title\n')
+POST_HTML_TEMPLATE = Template('<li><h3>$title</h3><p>$content</p></li>')
+EMAIL_SUBJECT_TEMPLATE = Template('Новые посты в вашей ленте: $count')
+EMAIL_TEXT_TEMPLATE = Template(
+    'Здравствуйте, $username!\nПоследние посты из вашей ленты:\n$posts'
+)
+EMAIL_HTML_TEMPLATE = Template(
+    '<html><body><p>Здравствуйте, $username!</p>'
+    '<p>Последние посты из вашей ленты:</p><ul>$posts</ul></body></html>'
+)
+
+# Данные поста для рендеринга: (ID, заголовок, текст). Кортеж, а не объект
+# ORM, чтобы его можно было передать в другой процесс.
+PostData = tuple[int, str, str | None]
+# Отрендеренный пост: (ID, текстовый фрагмент, HTML-фрагмент).
+PostFragment = tuple[int, str, str]
+
+
+def render_posts(posts: list[PostData]) -> list[PostFragment]:
+    """Рендерит фрагменты писем для списка постов."""
+    return [
+        (
+            post_id,
+            POST_TEXT_TEMPLATE.substitute(title=title),
+            POST_HTML_TEMPLATE.substitute(
+                title=escape(title), content=escape(content or '')
+            )
+        )
+        for post_id, title, content in posts
+    ]
+
+
+@dataclass
+class DigestEmail:
+    """Письмо рассылки."""
+    recipient: str
+    subject: str
+    text: str
+    html: str
+
+
+class DigestRenderer:
+    """
+    Рендеринг писем в рамках одного запуска рассылки. Каждый пост рендерится
+    один раз, фрагменты кэшируются по ID поста и переиспользуются во всех
+    письмах, где встречается пост. Рендеринг выполняется в пуле исполнителя
+    и не блокирует цикл событий, который тем временем загружает ленты
+    следующих пользователей.
+    """
+
+    def __init__(self, executor: Executor | None = None):
+        self._executor = executor
+        self._fragments: dict[int, tuple[str, str]] = {}
+
+    async def prepare(self, posts: list[Post]) -> None:
+        """Рендерит посты, которых ещё нет в кэше фрагментов."""
+        missing = {
+            post.id: (post.id, post.title, post.content)
+            for post in posts if post.id not in self._fragments
+        }
+        if not missing:
+            return
+        fragments = await asyncio.get_running_loop().run_in_executor(
+            self._executor, render_posts, list(missing.values())
+        )
+        for post_id, text, html in fragments:
+            self._fragments[post_id] = (text, html)
+
+    def build(self, user: User, posts: list[Post]) -> DigestEmail:
+        """Собирает письмо пользователя из закэшированных фрагментов."""
+        fragments = [self._fragments[post.id] for post in posts]
+        return DigestEmail(
+            recipient=user.email,
+            subject=EMAIL_SUBJECT_TEMPLATE.substitute(count=len(posts)),
+            text=EMAIL_TEXT_TEMPLATE.substitute(
+                username=user.username,
+                posts=''.join(text for text, _ in fragments)
+            ),
+            html=EMAIL_HTML_TEMPLATE.substitute(
+                username=escape(user.username),
+                posts=''.join(html for _, html in fragments)
+            )
+        )
+
+    @property
+    def cached_posts_count(self) -> int:
+        """Количество отрендеренных за запуск постов."""
+        return len(self._fragments)
+
+
+def create_render_executor() -> Executor | None:
+    """
+    Создает пул процессов для рендеринга, если он включен в настройках.
+    Без него используется пул потоков цикла событий по умолчанию. Пул
+    процессов нельзя создать внутри процесса prefork-пула Celery, поэтому
+    такой воркер нужно запускать с --pool=solo или --pool=threads.
+    """
+    if settings.digest_render_processes > 0:
+        return ProcessPoolExecutor(
+            max_workers=settings.digest_render_processes
+        )
+    return None
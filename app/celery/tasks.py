@@ -1,44 +1,328 @@
+import asyncio
+import heapq
+import os
+from datetime import datetime, timedelta
+from itertools import islice
+from operator import attrgetter
+
+from redis.exceptions import LockError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.celery.digest import DigestRenderer, create_render_executor
+from app.db.partitions import (
+    apply_retention_policy, create_future_partitions
+)
+from app.db.redis import get_redis
 from app.db.session import AsyncSessionLocal
-from app.config import constants
-from app.crud import post_crud, user_crud
+from app.db.shards import shard_router
+from app.config import constants, settings
+from app.crud import (
+    blog_crud, blog_similarity_crud, feed_change_crud, post_crud,
+    read_status_crud, user_crud
+)
 from app.models import Post, User
+from app.profiling import StageProfiler
+from app.read_buffer import OP_MARK, read_status_buffer
+from app.recommendations import compute_similar_blogs
+from app.subscription_graph import subscription_graph
+from app.tracing import span, traced
 
 
-async def _get_all_users() -> list[User]:
-    """Возвращает всех пользователей из базы."""
-    async with AsyncSessionLocal() as session:
-        users = await user_crud.get_multi(session)
-        return users
+MAILING_LAST_SLOT_KEY = 'mailing:last-slot'
+# Запоминает слот, если он новее последнего разосланного.
+MARK_MAILING_SLOT_SCRIPT = """
+    local last = redis.call('GET', KEYS[1])
+    if not last or tonumber(last) < tonumber(ARGV[1]) then
+        redis.call('SET', KEYS[1], ARGV[1])
+    end
+"""
+
+
+def get_mailing_slot_index(timestamp: float) -> int:
+    """
+    Возвращает сквозной номер слота рассылки от начала эпохи (UTC) для
+    момента времени. Остаток от деления на MAILING_SLOTS_PER_DAY - номер
+    слота в сутках.
+    """
+    return int(timestamp // (constants.MAILING_SLOT_MINUTES * 60))
+
+
+async def get_pending_mailing_slots(slot_index: int) -> list[int]:
+    """
+    Возвращает сквозные номера слотов, которые нужно разослать: слот
+    slot_index и пропущенные после последнего разосланного, но не больше
+    чем за сутки. Уже разосланный слот не возвращается.
+    """
+    last = await get_redis().get(MAILING_LAST_SLOT_KEY)
+    first = slot_index
+    if last is not None:
+        first = max(
+            int(last) + 1, slot_index - constants.MAILING_SLOTS_PER_DAY + 1
+        )
+    return list(range(first, slot_index + 1))
+
 
+async def mark_mailing_slot_sent(slot_index: int) -> None:
+    """
+    Отмечает слот разосланным. Вызывается после отправки в очередь задач
+    всех частей слота, чтобы сбой до этого не терял слот.
+    """
+    await get_redis().eval(
+        MARK_MAILING_SLOT_SCRIPT, 1, MAILING_LAST_SLOT_KEY, slot_index
+    )
 
-async def _get_users_feed(user_id: int) -> list[Post]:
-    """Возвращает ленту постов пользователя."""
+
+async def get_mailing_slot_users_ids(slot: int) -> list[int]:
+    """Возвращает ID пользователей, которым рассылка отправляется в слоте."""
     async with AsyncSessionLocal() as session:
-        feed = await post_crud.get_multi_for_user_feed(
-            session=session, user_id=user_id,
-            limit=constants.POSTS_PER_EMAIL
+        return await user_crud.get_ids_for_mailing_slot(
+            session, slot=slot, slots_count=constants.MAILING_SLOTS_PER_DAY
         )
-        return feed
 
 
-async def send_email_to_users_with_feed() -> None:
+async def _get_users_feeds(
+    session: AsyncSession, users: list[User]
+) -> list[tuple[User, list[Post]]]:
+    """
+    Возвращает последние посты лент пачки пользователей. Подписки берутся
+    из снимка графа подписок, а последние посты всех нужных блогов
+    загружаются одним запросом к каждой базе вместо запроса на
+    пользователя.
+    """
+    graph = await subscription_graph.get(session)
+    blog_ids_by_user = {
+        user.id: graph.get_blogs(user.id).tolist() for user in users
+    }
+    latest = await post_crud.get_latest_for_blogs(
+        session,
+        {blog_id for ids in blog_ids_by_user.values() for blog_id in ids},
+        per_blog=constants.POSTS_PER_EMAIL
+    )
+    return [
+        (user, _merge_latest_posts(latest, blog_ids_by_user[user.id]))
+        for user in users
+    ]
+
+
+def _merge_latest_posts(
+    latest: dict[int, list[Post]], blog_ids: list[int]
+) -> list[Post]:
     """
-    Отправляет email пользователям с """
-    users = await _get_all_users()
-    for user in users:
-        feed = await _get_users_feed(user.id)
+    Сливает последние посты блогов в ленту от новых к старым и оставляет
+    POSTS_PER_EMAIL первых.
+    """
+    feed = heapq.merge(
+        *(latest.get(blog_id, ()) for blog_id in blog_ids),
+        key=attrgetter('created_at', 'id'), reverse=True
+    )
+    return list(islice(feed, constants.POSTS_PER_EMAIL))
+
+
+@traced('email.send_batch')
+async def _send_batch(
+    renderer: DigestRenderer, feeds: list[tuple[User, list[Post]]]
+) -> None:
+    """Рендерит и отправляет письма пачки пользователей."""
+    await renderer.prepare([post for _, feed in feeds for post in feed])
+    for user, feed in feeds:
         if feed:
+            email = renderer.build(user, feed)
             # Отправка email
             print(
                 f'Отправка email для пользователя {user.username} '
-                f'по адресу {user.email} с {len(feed)} последними постами'
+                f'по адресу {email.recipient} с {len(feed)} последними '
+                'постами'
             )
-            print('Список постов:')
-            for post in feed:
-                print(f'  {post.title}')
+            print(email.text)
         else:
             print(
-                f'Пользователь {user.email} ни на кого не подписан. Email не '
-                'отправлен.'
+                f'Пользователь {user.email} ни на кого не подписан. '
+                'Email не отправлен.'
             )
-    print('Все email отправлены.')
+
+
+async def send_email_to_users(
+    users_ids: list[int], profile: bool = False
+) -> None:
+    """
+    Отправляет email с последними постами ленты пользователям из части
+    слота рассылки через одно соединение с базой. Письма пачки
+    рендерятся, пока загружаются ленты следующей. С profile=True пачки
+    обрабатываются последовательно, чтобы процессорное время делилось по
+    этапам без наложения, а после каждой пачки снимается память.
+    """
+    profiler = StageProfiler(enabled=profile)
+    profiler.start()
+    executor = create_render_executor()
+    renderer = DigestRenderer(executor)
+    try:
+        async with AsyncSessionLocal() as session:
+            with profiler.stage('load_users'):
+                users = await user_crud.get_multi_by_ids(session, users_ids)
+            profiler.snapshot(stage='load_users', users_count=len(users))
+            sending = None
+            try:
+                for start in range(
+                    0, len(users), constants.DIGEST_BATCH_SIZE
+                ):
+                    batch = users[start:start + constants.DIGEST_BATCH_SIZE]
+                    with span(
+                        'email.batch', start=start, users_count=len(batch)
+                    ):
+                        with profiler.stage('load_feeds'):
+                            feeds = await _get_users_feeds(session, batch)
+                        if sending is not None:
+                            pending, sending = sending, None
+                            await pending
+                        if profiler.enabled:
+                            with profiler.stage('render_and_send'):
+                                await _send_batch(renderer, feeds)
+                            profiler.snapshot(
+                                start=start, users_count=len(batch)
+                            )
+                            continue
+                        sending = asyncio.create_task(
+                            _send_batch(renderer, feeds)
+                        )
+                if sending is not None:
+                    pending, sending = sending, None
+                    await pending
+            finally:
+                # Если загрузка лент упала, пока отправлялась предыдущая
+                # пачка, отправка дожидается завершения до закрытия сессии
+                # и пула рендера.
+                if sending is not None:
+                    error, = await asyncio.gather(
+                        sending, return_exceptions=True
+                    )
+                    if isinstance(error, Exception):
+                        print(f'Ошибка отправки пачки писем: {error!r}')
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        profile_path = profiler.stop('email_users')
+    print(
+        f'Отправлены email {len(users)} пользователям. '
+        f'Отрендерено постов: {renderer.cached_posts_count}.'
+    )
+    if profile_path is not None:
+        print(f'Профиль рассылки сохранён в {profile_path}')
+
+
+async def _maintain_database_partitions(
+    session: AsyncSession, archive_dir: str
+) -> None:
+    """Обслуживает секции таблиц одной базы."""
+    created = await create_future_partitions(
+        session, months_ahead=constants.PARTITIONS_PREMAKE_MONTHS
+    )
+    print(f'Создано секций: {len(created)}')
+    if settings.partition_retention_months is None:
+        return
+    processed = await apply_retention_policy(
+        session,
+        retention_months=settings.partition_retention_months,
+        mode=settings.partition_retention_mode,
+        archive_dir=archive_dir
+    )
+    print(f'Секций за пределами срока хранения: {len(processed)}')
+
+
+async def maintain_partitions() -> None:
+    """
+    Создает секции постов и статусов прочтения на ближайшие месяцы и
+    применяет к старым секциям политику хранения в основной базе и во всех
+    шардах. Архивы секций шардов складываются в отдельные подкаталоги.
+    """
+    async with AsyncSessionLocal() as session:
+        databases = [(session, settings.partition_archive_dir)]
+        if shard_router is not None:
+            databases += [
+                (
+                    shard_router.get_session(session, shard),
+                    os.path.join(
+                        settings.partition_archive_dir, f'shard_{shard}'
+                    )
+                )
+                for shard in range(shard_router.shards_count)
+            ]
+        for db_session, archive_dir in databases:
+            await _maintain_database_partitions(db_session, archive_dir)
+
+
+async def prune_feed_changes() -> None:
+    """Удаляет записи журнала изменений лент старше срока хранения."""
+    before = datetime.utcnow() - timedelta(
+        days=constants.FEED_CHANGES_RETENTION_DAYS
+    )
+    async with AsyncSessionLocal() as session:
+        removed = await feed_change_crud.remove_older_than(session, before)
+    print(f'Удалено записей журнала изменений лент: {removed}')
+
+
+async def refresh_similar_blogs() -> None:
+    """
+    Пересчитывает похожие блоги по снимку графа подписок и сохраняет
+    SIMILAR_BLOGS_TOP_K похожих блогов для каждого блога.
+    """
+    async with AsyncSessionLocal() as session:
+        graph = await subscription_graph.get(session)
+        blog_ids, similar_blog_ids, scores = compute_similar_blogs(
+            *graph.get_edges(), top_k=constants.SIMILAR_BLOGS_TOP_K
+        )
+        saved = await blog_similarity_crud.replace_all(
+            session, blog_ids, similar_blog_ids, scores
+        )
+    print(
+        f'Похожие блоги пересчитаны по {graph.edges_count} подпискам: '
+        f'{saved} пар.'
+    )
+
+
+async def reconcile_blog_counters() -> None:
+    """Исправляет расхождения счётчиков блогов с постами и подписками."""
+    async with AsyncSessionLocal() as session:
+        fixed = await blog_crud.reconcile_counters(session)
+    print(f'Исправлены счётчики блогов: {fixed}')
+
+
+async def flush_read_status_buffer() -> None:
+    """
+    Переносит накопленные в буфере события прочтения постов в базу
+    пакетами по READ_STATUS_FLUSH_BATCH_SIZE событий. Блокировка переноса
+    продлевается перед каждым пакетом; если она потеряна, перенос
+    прекращается, чтобы не выполняться одновременно с другим воркером.
+    """
+    if read_status_buffer is None:
+        return
+    lock = read_status_buffer.lock(timeout=constants.READ_STATUS_FLUSH_LOCK)
+    if not await lock.acquire(blocking=False):
+        return
+    try:
+        async with AsyncSessionLocal() as session:
+            while True:
+                await lock.reacquire()
+                event_ids, latest = await read_status_buffer.read_batch(
+                    count=constants.READ_STATUS_FLUSH_BATCH_SIZE
+                )
+                if not event_ids:
+                    break
+                marked = {
+                    key: created_at
+                    for key, (op, _, created_at) in latest.items()
+                    if op == OP_MARK
+                }
+                unmarked = [key for key in latest if key not in marked]
+                await read_status_crud.apply_batch(
+                    session, marked=marked, unmarked=unmarked
+                )
+                await read_status_buffer.acknowledge(event_ids, latest)
+                if len(event_ids) < constants.READ_STATUS_FLUSH_BATCH_SIZE:
+                    break
+    except LockError as error:
+        print(f'Блокировка переноса отметок о прочтении потеряна: {error}')
+    finally:
+        try:
+            await lock.release()
+        except LockError:
+            pass
@@ -0,0 +1,90 @@
+import asyncio
+import sys
+
+from sqlalchemy import delete, insert
+
+from app.crud import feed_change_crud
+from app.db.session import AsyncSessionLocal, dispose_engine
+from app.models import FeedChange
+
+# Пользователь, которого нет в базе: записи проверки не попадут в ленты.
+CHECK_USER_ID = -1
+
+
+async def _insert_change(session, post_id: int) -> int:
+    """Добавляет в журнал запись проверки и возвращает её ID."""
+    result = await session.execute(
+        insert(FeedChange).values(
+            kind=FeedChange.READ, user_id=CHECK_USER_ID, post_id=post_id
+        ).returning(FeedChange.id)
+    )
+    return result.scalar_one()
+
+
+async def check_out_of_order_commits() -> list[str]:
+    """
+    Проверяет, что клиент с токеном синхронизации не пропускает запись
+    журнала, транзакция которой коммитится позже транзакции записи с
+    большим ID. Две транзакции пишут в журнал внахлёст: первая получает
+    меньший ID, но коммитится второй. Возвращает список ошибок.
+    """
+    errors = []
+    async with (
+        AsyncSessionLocal() as first, AsyncSessionLocal() as second,
+        AsyncSessionLocal() as reader
+    ):
+        try:
+            token = await feed_change_crud.get_last_position(reader) or 0
+            first_id = await _insert_change(first, post_id=1)
+            second_id = await _insert_change(second, post_id=2)
+            await second.commit()
+            position = await feed_change_crud.get_last_position(reader) or 0
+            early = await feed_change_crud.get_multi_for_user(
+                reader, CHECK_USER_ID, token, position
+            )
+            if early:
+                errors.append(
+                    'Позиция выдана записи, пока транзакция записи с '
+                    f'меньшим ID {first_id} не завершена: '
+                    f'{[change.id for change in early]}'
+                )
+            await first.commit()
+            position = await feed_change_crud.get_last_position(reader) or 0
+            changes = await feed_change_crud.get_multi_for_user(
+                reader, CHECK_USER_ID, token, position
+            )
+            received = [change.id for change in changes]
+            if sorted(received) != sorted([first_id, second_id]):
+                errors.append(
+                    f'После токена {token} клиент получил записи '
+                    f'{received} вместо {[first_id, second_id]}'
+                )
+        finally:
+            await first.rollback()
+            await second.rollback()
+            await reader.execute(
+                delete(FeedChange).where(FeedChange.user_id == CHECK_USER_ID)
+            )
+            await reader.commit()
+    return errors
+
+
+async def main() -> int:
+    """
+    Выполняет проверку на базе из DATABASE_URL. Возвращает код 1, если
+    порядок позиций журнала нарушен.
+    """
+    try:
+        errors = await check_out_of_order_commits()
+    finally:
+        await dispose_engine()
+    for error in errors:
+        print(error)
+    if errors:
+        return 1
+    print('Позиции журнала изменений лент выдаются в порядке коммита')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,91 @@
+import gzip
+
+import brotli
+import zstandard
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import constants
+from app.negotiation import parse_quality_values
+
+_zstd_compressor = zstandard.ZstdCompressor(
+    level=constants.COMPRESSION_LEVELS['zstd']
+)
+
+# Кодировки в порядке предпочтения сервера при равных q клиента.
+COMPRESSORS = {
+    'zstd': _zstd_compressor.compress,
+    'br': lambda body: brotli.compress(
+        body, quality=constants.COMPRESSION_LEVELS['br']
+    ),
+    'gzip': lambda body: gzip.compress(
+        body, compresslevel=constants.COMPRESSION_LEVELS['gzip']
+    ),
+}
+
+
+def choose_encoding(accept_encoding: str) -> str | None:
+    """
+    Выбирает кодировку сжатия по заголовку Accept-Encoding: с наибольшим q,
+    а при равных q - в порядке COMPRESSORS. Возвращает None, если клиент не
+    принимает ни одну из них.
+    """
+    accepted = parse_quality_values(accept_encoding)
+    default = accepted.get('*', 0.0)
+    best, best_quality = None, 0.0
+    for encoding in COMPRESSORS:
+        quality = accepted.get(encoding, default)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class CompressionMiddleware:
+    """
+    Сжимает ответы размером от minimum_size байт кодировкой, выбранной по
+    заголовку Accept-Encoding (zstd, br или gzip). Тело ответа собирается
+    целиком: эндпоинты приложения не отдают потоковых ответов.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(
+            Headers(scope=scope).get('accept-encoding', '')
+        )
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        start_message: Message | None = None
+        body_parts: list[bytes] = []
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message
+            if message['type'] == 'http.response.start':
+                start_message = message
+                return
+            if message['type'] != 'http.response.body':
+                await send(message)
+                return
+            body_parts.append(message.get('body', b''))
+            if message.get('more_body', False):
+                return
+            body = b''.join(body_parts)
+            headers = MutableHeaders(raw=start_message['headers'])
+            headers.add_vary_header('Accept-Encoding')
+            if (
+                len(body) >= self.minimum_size and
+                'content-encoding' not in headers
+            ):
+                body = COMPRESSORS[encoding](body)
+                headers['Content-Encoding'] = encoding
+                headers['Content-Length'] = str(len(body))
+            await send(start_message)
+            await send({'type': 'http.response.body', 'body': body})
+
+        await self.app(scope, receive, send_compressed)
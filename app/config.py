@@ -11,6 +11,48 @@ class Settings(BaseSettings):
     logging_format: str = '%(asctime)s - %(levelname)s - %(message)s'
     logging_dt_format: str = '%Y-%m-%d %H:%M:%S'
     redis_url: str = 'redis://broker:6379/0'
+    partition_retention_months: int | None = None
+    partition_retention_mode: str = 'archive'
+    partition_archive_dir: str = 'archive'
+    feed_timeline_cache: str | None = None
+    read_status_write_behind: bool = False
+    digest_render_processes: int = 0
+    cache_invalidation_bus: bool = False
+    single_flight: bool = False
+    single_flight_ttl: float = 0.0
+    shard_database_urls: list[str] = []
+    web_host: str = '0.0.0.0'
+    web_port: int = 8000
+    web_workers: int = 1
+    web_warm_up: bool = False
+    web_graceful_timeout: int = 30
+    tracing_exporter: str | None = None
+    tracing_file: str = 'traces.jsonl'
+    slow_query_threshold_ms: float | None = None
+    slow_query_sample_rate: float = 0.0
+    slow_query_explain: bool = False
+    response_compression: bool = False
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    admission_control: bool = False
+    admission_limits: dict[str, int] = {
+        'critical': 100, 'normal': 50, 'bulk': 10
+    }
+    admission_queue_limits: dict[str, int] = {
+        'critical': 200, 'normal': 100, 'bulk': 20
+    }
+    admission_max_wait_ms: dict[str, float] = {
+        'critical': 5000, 'normal': 2000, 'bulk': 500
+    }
+    admission_route_limits: dict[str, int] = {}
+    celery_prefetch_multiplier: int = 1
+    celery_acks_late: bool = True
+    celery_rate_limits: dict[str, str] = {
+        'email_users_chunk': '30/m', 'refresh_blog_recommendations': '1/h'
+    }
+    profiling: bool = False
+    profiling_token: str | None = None
+    profiling_dir: str = 'profiles'
 
     class Config:
         env_file = '.env'
@@ -25,10 +67,50 @@ class Constants:
     TITLE_MAX_LENGTH = 50
     CONTENT_MAX_LENGTH = 140
     EMAIL_MAX_LENGTH = 254
+    FEED_CHANGE_KIND_MAX_LENGTH = 20
     POSTS_PER_PAGE = 10
     MAX_POSTS_IN_FEED = 500
+    TOTAL_COUNT_CAP = MAX_POSTS_IN_FEED
+    FEED_HORIZON_DAYS = 365
+    FEED_SCAN_WINDOWS_DAYS = (1, 7, 30, 90)
+    PARTITIONS_PREMAKE_MONTHS = 3
+    TIMELINE_MAX_LENGTH = MAX_POSTS_IN_FEED
+    TIMELINE_TTL_SECONDS = 24 * 60 * 60
+    TIMELINE_CACHE_MAX_BLOGS = 10_000
+    READ_STATUS_FLUSH_INTERVAL = 5  # seconds
+    READ_STATUS_FLUSH_BATCH_SIZE = 5000
+    READ_STATUS_FLUSH_LOCK = 60  # seconds
+    INVALIDATION_RECONNECT_DELAY = 1  # seconds
+    INVALIDATION_RECONNECT_MAX_DELAY = 30  # seconds
+    SINGLE_FLIGHT_CACHE_MAX_ENTRIES = 10_000
+    FEED_CHANGES_RETENTION_DAYS = 30
+    FEED_CHANGES_POSITION_LOCK = 0x66656564  # advisory lock key
+    STARTUP_TIME_BUDGET = 3.0  # seconds
+    SLOW_QUERY_TOP_N = 50
+    SLOW_QUERY_RECENT_MAX = 200
+    SLOW_QUERY_EXPLAIN_INTERVAL = 60  # seconds
+    SLOW_QUERY_EXPLAIN_CONCURRENCY = 2
+    COMPRESSION_MIN_SIZE = 1024  # bytes
+    COMPRESSION_LEVELS = {'zstd': 3, 'br': 4, 'gzip': 6}
+    ADMISSION_RETRY_AFTER = 1  # seconds
+    PROFILE_HEADER = 'X-Profile'
+    PROFILES_PATH = '/api/v1/admin/profiles'
+    PROFILE_INTERVAL = 0.001  # seconds
+    PROFILES_MAX = 20
+    PROFILE_TOP_ALLOCATIONS = 10
+    SUBSCRIPTION_GRAPH_CHUNK_SIZE = 50_000
+    SIMILAR_BLOGS_TOP_K = 20
+    SIMILAR_BLOGS_BATCH_SIZE = 10_000
+    RECOMMENDATIONS_PER_PAGE = 10
+    MAX_RECOMMENDATIONS = 50
+    BATCH_MAX_OPERATIONS = 200
     POSTS_PER_EMAIL = 5
-    MAILING_TIME = (12, 00)  # (hour, minute)
+    DIGEST_BATCH_SIZE = 100
+    MAILING_SLOT_MINUTES = 5
+    MAILING_SLOTS_PER_DAY = 24 * 60 // MAILING_SLOT_MINUTES
+    MAILING_CHUNK_SIZE = 10 * DIGEST_BATCH_SIZE
+    CELERY_DEFAULT_PRIORITY = 5
+    CELERY_VISIBILITY_TIMEOUT = 2 * 60 * 60  # seconds
 
 
 constants = Constants()
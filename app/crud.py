@@ -1,22 +1,158 @@
+import asyncio
+import heapq
+from contextlib import AsyncExitStack, asynccontextmanager
+from datetime import datetime, timedelta
+from functools import cached_property, partial
+from itertools import islice
+from operator import attrgetter
+
 from pydantic import BaseModel
-from sqlalchemy import desc, select
+from sqlalchemy import (
+    all_, bindparam, delete, desc, func, insert, select, text, update
+)
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.config import constants
+from app.db.invalidation import (
+    build_event, build_event_for, dispatch_committed, publish
+)
+from app.db.loader import get_loader
+from app.db.shards import (
+    get_all_sessions, get_shard_session, group_by_shard, shard_router
+)
+from app.db.statements import get_by_ids_statement, ids_param, in_ids
+from app.db.totals import TotalMode, count_total
+from app.models import (
+    Blog, BlogSimilarity, FeedChange, Post, ReadStatus, Subscription, User
+)
+from app.read_buffer import read_status_buffer
+from app.schemas import BlogSort
+from app.singleflight import coalesced
+from app.timelines import (
+    Timeline, merge_timelines, timeline_cache, to_timestamp
+)
+from app.tracing import is_tracing_enabled, trace_methods
+
+# Запросы горячих путей строятся один раз с параметрами вместо литералов:
+# SQLAlchemy берёт их скомпилированный вид из кэша, а asyncpg - из кэша
+# подготовленных запросов.
+READ_POSTS_IDS_STATEMENT = select(ReadStatus.post_id).where(
+    ReadStatus.user_id == bindparam('user_id')
+)
+SUBSCRIBED_BLOGS_IDS_STATEMENT = select(Subscription.blog_id).where(
+    Subscription.user_id == bindparam('user_id')
+)
+
+
+async def run_after_commit(session: AsyncSession, action, commit: bool):
+    """
+    Выполняет действие с кэшами, которое должно следовать за коммитом:
+    сразу, если транзакция уже закоммичена, или при вызове commit_batch.
+    """
+    if commit:
+        await action()
+    else:
+        session.info.setdefault('after_commit', []).append(action)
+
 
-from app.models import Blog, Post, ReadStatus, Subscription, User
+@asynccontextmanager
+async def savepoint(session: AsyncSession, *db_sessions: AsyncSession):
+    """
+    Выполняет часть общей транзакции в точках сохранения основной базы и
+    баз db_sessions. При ошибке откатываются только изменения этой части
+    и отменяются её отложенные до коммита действия.
+    """
+    after_commit = session.info.setdefault('after_commit', [])
+    pending = len(after_commit)
+    try:
+        async with AsyncExitStack() as stack:
+            for db_session in dict.fromkeys((session, *db_sessions)):
+                await stack.enter_async_context(db_session.begin_nested())
+            yield
+    except BaseException:
+        del after_commit[pending:]
+        raise
+
+
+async def commit_batch(session: AsyncSession) -> None:
+    """
+    Коммитит транзакцию, накопленную операциями с commit=False: шарды,
+    затем основную базу, после чего рассылает события инвалидации и
+    выполняет отложенные действия с кэшами.
+    """
+    await CRUDBase._commit(
+        session, *session.info.get('shard_sessions', {}).values()
+    )
+    dispatch_committed(session)
+    for action in session.info.pop('after_commit', []):
+        await action()
 
 
 class CRUDBase:
-    """Базовый класс для CRUD-операций с моделями."""
+    """
+    Базовый класс для CRUD-операций с моделями. Для моделей, хранящихся в
+    шардах, shard_key - поле, по которому объект распределяется по шардам.
+    """
+    shard_key: str | None = None
+
     def __init__(self, model):
         self.model = model
 
+    def _get_session(self, session: AsyncSession, key: int) -> AsyncSession:
+        """
+        Возвращает сессию шарда для значения ключа шардирования или ID
+        объекта либо саму сессию для моделей основной базы.
+        """
+        if self.shard_key is None:
+            return session
+        return get_shard_session(session, key)
+
+    def _get_session_for(self, session: AsyncSession, db_obj) -> AsyncSession:
+        """Возвращает сессию шарда, в котором хранится объект."""
+        if self.shard_key is None:
+            return session
+        return self._get_session(session, getattr(db_obj, self.shard_key))
+
+    @staticmethod
+    async def _commit(session: AsyncSession, *shard_sessions) -> None:
+        """
+        Коммитит транзакции шардов, а затем транзакцию основной базы с
+        журналом изменений лент и уведомлениями для инвалидации кэшей. Без
+        шардирования коммитится только основная сессия.
+        """
+        for shard_session in shard_sessions:
+            if shard_session is not session:
+                await shard_session.commit()
+        await session.commit()
+
+    @staticmethod
+    async def _select_on_shards(
+        session: AsyncSession, statement, column, keys
+    ) -> list:
+        """
+        Выполняет запрос с условием column = ANY(keys) на всех шардах, к
+        которым относятся ключи (ID объектов или значения ключа
+        шардирования), параллельно и объединяет результаты.
+        """
+        keys = list(keys)
+        if not keys:
+            return []
+        statement = statement.where(in_ids(column, 'keys'))
+        results = await asyncio.gather(*(
+            shard_session.execute(statement, {'keys': shard_keys})
+            for shard_session, shard_keys in group_by_shard(session, keys)
+        ))
+        return [row for result in results for row in result.scalars().all()]
+
     async def get_by_id(self, session: AsyncSession, obj_id: int):
-        """Возвращает объект по его ID."""
-        db_obj = await session.execute(
-            select(self.model).where(self.model.id == obj_id)
-        )
-        return db_obj.scalars().first()
+        """
+        Возвращает объект по его ID. Запросы группируются и запоминаются
+        загрузчиком сессии.
+        """
+        return await get_loader(session).load(self.model, obj_id)
 
+    @coalesced
     async def get_multi(self, session: AsyncSession):
         """
         Возвращает список объектов в обратном хронологическом порядке
@@ -29,113 +165,809 @@ class CRUDBase:
         )
         return db_objs.scalars().all()
 
-    async def create(self, session: AsyncSession, obj_in: BaseModel, **kwargs):
-        """Создает новый объект."""
+    async def create(
+        self, session: AsyncSession, obj_in: BaseModel, commit: bool = True,
+        **kwargs
+    ):
+        """
+        Создает новый объект и в той же транзакции публикует событие для
+        инвалидации кэшей. С commit=False транзакция остаётся открытой до
+        вызова commit_batch.
+        """
         obj_in_data = obj_in.model_dump()
         obj_in_data.update(kwargs)
         db_obj = self.model(**obj_in_data)
-        session.add(db_obj)
-        await session.commit()
-        await session.refresh(db_obj)
+        db_session = self._get_session_for(session, db_obj)
+        db_session.add(db_obj)
+        await db_session.flush()
+        self._log_feed_change(session, db_obj, removed=False)
+        await self._update_counters(session, db_session, db_obj, removed=False)
+        await publish(session, build_event_for(db_obj))
+        if not commit:
+            await db_session.refresh(db_obj)
+            return db_obj
+        await self._commit(session, db_session)
+        dispatch_committed(session)
+        await db_session.refresh(db_obj)
+        get_loader(session).prime(db_obj)
         return db_obj
 
+    def _build_feed_change(self, db_obj, removed: bool):
+        """
+        Возвращает запись журнала изменений лент для созданного или
+        удаляемого объекта либо None, если объект не влияет на ленты.
+        """
+        return None
+
+    async def _update_counters(
+        self, session: AsyncSession, db_session: AsyncSession, db_obj,
+        removed: bool
+    ) -> None:
+        """
+        Обновляет в текущей транзакции основной базы счётчики, зависящие от
+        созданного или удаляемого объекта. db_session - сессия базы, в
+        которой хранится объект.
+        """
+
+    def _log_feed_change(
+        self, session: AsyncSession, db_obj, removed: bool
+    ) -> None:
+        """Добавляет изменение объекта в журнал в текущей транзакции."""
+        feed_change = self._build_feed_change(db_obj, removed)
+        if feed_change is not None:
+            session.add(feed_change)
+
 
 class UserCRUD(CRUDBase):
     """Класс для CRUD-операций с пользователями."""
 
+    @cached_property
+    def _by_username_or_email_statement(self):
+        """Запрос пользователей по параметрам username или email."""
+        return select(self.model).where(
+            (self.model.username == bindparam('username')) |
+            (self.model.email == bindparam('email'))
+        )
+
     async def get_by_username_or_email(
         self, session: AsyncSession, username: str, email: str
     ):
         """Возвращает пользователей из базы по его имени или email."""
         db_user = await session.execute(
-            select(self.model).where(
-                (self.model.username == username) |
-                (self.model.email == email)
-            )
+            self._by_username_or_email_statement,
+            {'username': username, 'email': email}
         )
         return db_user.scalars().all()
 
+    async def get_ids_for_mailing_slot(
+        self, session: AsyncSession, slot: int, slots_count: int
+    ) -> list[int]:
+        """
+        Возвращает ID пользователей, попадающих в слот рассылки. Слот
+        пользователя определяется остатком от деления его ID на количество
+        слотов, так что пользователи равномерно распределены по суткам.
+        """
+        users_ids = await session.execute(
+            select(self.model.id).where(
+                self.model.id % slots_count == slot
+            ).order_by(self.model.id)
+        )
+        return users_ids.scalars().all()
+
+    async def get_multi_by_ids(
+        self, session: AsyncSession, users_ids: list[int]
+    ):
+        """Возвращает пользователей по списку ID в порядке ID."""
+        db_users = await session.execute(
+            get_by_ids_statement(self.model).order_by(self.model.id),
+            {'ids': users_ids}
+        )
+        return db_users.scalars().all()
+
+
+class BlogCRUD(CRUDBase):
+    """Класс для CRUD-операций с блогами."""
+
+    @staticmethod
+    def _get_sort_order(sort: BlogSort) -> tuple:
+        """
+        Возвращает порядок сортировки списка блогов. Для сортировок по
+        счётчикам и последнему посту есть индексы с ID блога для
+        однозначного порядка.
+        """
+        if sort == BlogSort.SUBSCRIBERS:
+            return desc(Blog.subscribers_count), desc(Blog.id)
+        if sort == BlogSort.POSTS:
+            return desc(Blog.posts_count), desc(Blog.id)
+        if sort == BlogSort.LAST_POST:
+            return Blog.last_post_at.desc().nulls_last(), desc(Blog.id)
+        return (desc(Blog.created_at),)
+
+    @coalesced
+    async def get_multi_sorted(
+        self, session: AsyncSession, sort: BlogSort = BlogSort.CREATED
+    ):
+        """Возвращает список блогов в выбранном порядке."""
+        db_objs = await session.execute(
+            select(self.model).order_by(*self._get_sort_order(sort))
+        )
+        return db_objs.scalars().all()
+
+    async def update_counters(
+        self, session: AsyncSession, blog_id: int, **values
+    ) -> None:
+        """
+        Обновляет счётчики блога в текущей транзакции основной базы
+        атомарными выражениями вида count + 1 и публикует событие для
+        инвалидации кэшей.
+        """
+        await session.execute(
+            update(self.model).where(self.model.id == blog_id).values(
+                **values
+            ).execution_options(synchronize_session=False)
+        )
+        await publish(
+            session, build_event(self.model.__tablename__, id=blog_id)
+        )
+
+    async def reconcile_counters(self, session: AsyncSession) -> int:
+        """
+        Пересчитывает счётчики всех блогов по постам и подпискам во всех
+        базах и исправляет расхождения одним запросом UPDATE ... FROM
+        unnest(...). Возвращает количество исправленных блогов.
+        """
+        stats: dict[int, list] = {}
+        for db_session in get_all_sessions(session):
+            posts = await db_session.execute(
+                select(
+                    Post.blog_id, func.count(), func.max(Post.created_at)
+                ).group_by(Post.blog_id)
+            )
+            for blog_id, posts_count, last_post_at in posts:
+                blog_stats = stats.setdefault(blog_id, [0, 0, None])
+                blog_stats[1] += posts_count
+                if blog_stats[2] is None or last_post_at > blog_stats[2]:
+                    blog_stats[2] = last_post_at
+            subscriptions = await db_session.execute(
+                select(Subscription.blog_id, func.count()).group_by(
+                    Subscription.blog_id
+                )
+            )
+            for blog_id, subscribers_count in subscriptions:
+                stats.setdefault(blog_id, [0, 0, None])[0] += subscribers_count
+        blog_ids = list(stats)
+        subscribers_counts, posts_counts, last_posts_at = (
+            [list(column) for column in zip(*stats.values())]
+            if stats else ([], [], [])
+        )
+        result = await session.execute(
+            text(
+                'UPDATE blogs SET '
+                'subscribers_count = COALESCE(actual.subscribers_count, 0), '
+                'posts_count = COALESCE(actual.posts_count, 0), '
+                'last_post_at = actual.last_post_at '
+                'FROM blogs AS current LEFT JOIN unnest('
+                'CAST(:blog_ids AS integer[]), '
+                'CAST(:subscribers_counts AS integer[]), '
+                'CAST(:posts_counts AS integer[]), '
+                'CAST(:last_posts_at AS timestamp[])'
+                ') AS actual (blog_id, subscribers_count, posts_count, '
+                'last_post_at) ON actual.blog_id = current.id '
+                'WHERE blogs.id = current.id AND ('
+                'current.subscribers_count, current.posts_count, '
+                'current.last_post_at) IS DISTINCT FROM ('
+                'COALESCE(actual.subscribers_count, 0), '
+                'COALESCE(actual.posts_count, 0), actual.last_post_at)'
+            ),
+            {
+                'blog_ids': blog_ids,
+                'subscribers_counts': subscribers_counts,
+                'posts_counts': posts_counts,
+                'last_posts_at': last_posts_at,
+            }
+        )
+        await session.commit()
+        return result.rowcount
+
 
 class RemoveMixin:
     """Миксин для удаления объектов."""
-    async def remove(self, session: AsyncSession, db_obj):
-        """Удаляет объект."""
-        await session.delete(db_obj)
-        await session.commit()
+    async def remove(
+        self, session: AsyncSession, db_obj, commit: bool = True
+    ):
+        """
+        Удаляет объект и в той же транзакции публикует событие для
+        инвалидации кэшей. С commit=False транзакция остаётся открытой до
+        вызова commit_batch.
+        """
+        db_session = self._get_session_for(session, db_obj)
+        self._log_feed_change(session, db_obj, removed=True)
+        await publish(session, build_event_for(db_obj))
+        await db_session.delete(db_obj)
+        await self._update_counters(session, db_session, db_obj, removed=True)
+        get_loader(session).forget(type(db_obj), db_obj.id)
+        if commit:
+            await self._commit(session, db_session)
+            dispatch_committed(session)
 
 
 class PostCRUD(CRUDBase, RemoveMixin):
     """Класс для CRUD-операций с постами."""
+    shard_key = 'blog_id'
 
     @staticmethod
-    def _get_base_query_for_user_feed(user_id: int):
+    def _get_feed_horizon() -> datetime:
+        """
+        Возвращает самое раннее время создания поста, попадающего в ленту.
+        Условие по created_at позволяет планировщику отбросить секции таблицы
+        постов за пределами горизонта ленты.
+        """
+        return datetime.utcnow() - timedelta(days=constants.FEED_HORIZON_DAYS)
+
+    @staticmethod
+    def _with_read_filters(statement) -> dict:
+        """
+        Возвращает варианты запроса ленты с фильтром по статусу прочтения:
+        все посты (None), только прочитанные (True) и только непрочитанные
+        (False). ID прочитанных постов передаются параметром-массивом
+        read_ids.
         """
-        Возвращает базовый запрос для получения постов для ленты в обратном
-        хронологическом порядке их создания.
+        return {
+            None: statement,
+            True: statement.where(in_ids(Post.id, 'read_ids')),
+            False: statement.where(Post.id != all_(ids_param('read_ids'))),
+        }
+
+    @cached_property
+    def _feed_statements(self) -> dict:
+        """
+        Запросы ленты пользователя в обратном хронологическом порядке,
+        построенные один раз для каждого фильтра по статусу прочтения.
+        Параметры: user_id, since - самое раннее время создания поста и
+        read_ids.
         """
-        return select(Post).join(
-            Subscription, Post.blog_id == Subscription.blog_id
-        ).where(Subscription.user_id == user_id).order_by(
-            desc(Post.created_at)
+        return self._with_read_filters(
+            select(Post).join(
+                Subscription, Post.blog_id == Subscription.blog_id
+            ).where(
+                (Subscription.user_id == bindparam('user_id')) &
+                (Post.created_at >= bindparam('since'))
+            ).order_by(desc(Post.created_at), desc(Post.id))
         )
 
+    @cached_property
+    def _shard_feed_statements(self) -> dict:
+        """
+        Запросы ленты к одному шарду по списку ID блогов в параметре
+        blog_ids; остальные параметры как у _feed_statements.
+        """
+        return self._with_read_filters(
+            select(Post).where(
+                in_ids(Post.blog_id, 'blog_ids') &
+                (Post.created_at >= bindparam('since'))
+            ).order_by(desc(Post.created_at), desc(Post.id))
+        )
+
+    @staticmethod
+    def _paged(statements: dict) -> dict:
+        """
+        Добавляет к запросам ленты LIMIT и OFFSET с параметрами limit и
+        offset.
+        """
+        return {
+            read: statement.limit(bindparam('limit')).offset(
+                bindparam('offset')
+            )
+            for read, statement in statements.items()
+        }
+
+    @cached_property
+    def _feed_page_statements(self) -> dict:
+        """Запросы страницы ленты пользователя."""
+        return self._paged(self._feed_statements)
+
+    @cached_property
+    def _shard_feed_page_statements(self) -> dict:
+        """Запросы страницы ленты к одному шарду."""
+        return self._paged(self._shard_feed_statements)
+
+    async def _get_feed_params(
+        self, session: AsyncSession, user_id: int, read: bool | None
+    ) -> dict:
+        """Возвращает общие параметры запросов ленты пользователя."""
+        params = {'user_id': user_id, 'since': self._get_feed_horizon()}
+        if read is not None:
+            params['read_ids'] = await self._get_read_posts_ids(
+                session, user_id
+            )
+        return params
+
     @staticmethod
     async def _get_read_posts_ids(
         session: AsyncSession, user_id: int
     ) -> list[int]:
-        """Возвращает список ID прочитанных пользователем постов."""
-        statement = select(ReadStatus.post_id).where(
-            ReadStatus.user_id == user_id
+        """
+        Возвращает список ID прочитанных пользователем постов с учётом
+        изменений, ещё не перенесённых в базу из буфера отложенной записи.
+        """
+        result = await get_shard_session(session, user_id).execute(
+            READ_POSTS_IDS_STATEMENT, {'user_id': user_id}
+        )
+        read_posts_ids = result.scalars().all()
+        if read_status_buffer is not None:
+            read_posts_ids = list(
+                await read_status_buffer.apply_pending(user_id, read_posts_ids)
+            )
+        return read_posts_ids
+
+    @staticmethod
+    async def _get_subscribed_blogs_ids(
+        session: AsyncSession, user_id: int
+    ) -> list[int]:
+        """Возвращает список ID блогов, на которые подписан пользователь."""
+        result = await get_shard_session(session, user_id).execute(
+            SUBSCRIBED_BLOGS_IDS_STATEMENT, {'user_id': user_id}
         )
-        result = await session.execute(statement)
         return result.scalars().all()
 
+    async def _load_timelines(
+        self, session: AsyncSession, blog_ids: list[int]
+    ) -> dict[int, Timeline]:
+        """
+        Загружает из базы последние TIMELINE_MAX_LENGTH постов каждого блога
+        в пределах горизонта ленты, из шардов - параллельно.
+        """
+        timelines = {blog_id: [] for blog_id in blog_ids}
+        results = await asyncio.gather(*(
+            self._load_shard_timelines(shard_session, shard_blog_ids)
+            for shard_session, shard_blog_ids in group_by_shard(
+                session, blog_ids
+            )
+        ))
+        for result in results:
+            for blog_id, post_id, created_at in result:
+                timelines[blog_id].append((to_timestamp(created_at), post_id))
+        return timelines
+
+    @cached_property
+    def _timelines_statement(self):
+        """
+        Запрос последних TIMELINE_MAX_LENGTH постов каждого блога из
+        параметра blog_ids, созданных не раньше параметра since.
+        """
+        ranked = select(
+            Post.blog_id, Post.id, Post.created_at,
+            func.row_number().over(
+                partition_by=Post.blog_id,
+                order_by=(desc(Post.created_at), desc(Post.id))
+            ).label('position')
+        ).where(
+            in_ids(Post.blog_id, 'blog_ids') &
+            (Post.created_at >= bindparam('since'))
+        ).subquery()
+        return select(
+            ranked.c.blog_id, ranked.c.id, ranked.c.created_at
+        ).where(
+            ranked.c.position <= constants.TIMELINE_MAX_LENGTH
+        ).order_by(ranked.c.blog_id, ranked.c.position)
+
+    async def _load_shard_timelines(
+        self, session: AsyncSession, blog_ids: list[int]
+    ):
+        """
+        Возвращает строки (ID блога, ID поста, время создания) последних
+        постов блогов из одной базы.
+        """
+        return await session.execute(
+            self._timelines_statement,
+            {'blog_ids': blog_ids, 'since': self._get_feed_horizon()}
+        )
+
+    async def _get_page_from_timelines(
+        self, session: AsyncSession, user_id: int, limit: int, offset: int,
+        read: bool | None
+    ):
+        """
+        Собирает страницу ленты слиянием закэшированных лент блогов, на
+        которые подписан пользователь, и загружает из базы только посты этой
+        страницы. Возвращает None, если кэша недостаточно для страницы.
+        """
+        blog_ids = await self._get_subscribed_blogs_ids(session, user_id)
+        timelines = await timeline_cache.get_many(blog_ids)
+        missing_ids = [
+            blog_id for blog_id in blog_ids if blog_id not in timelines
+        ]
+        if missing_ids:
+            loaded = await self._load_timelines(session, missing_ids)
+            await timeline_cache.set_many(loaded)
+            timelines.update(loaded)
+        read_filter = {}
+        if read is not None:
+            read_posts_ids = set(
+                await self._get_read_posts_ids(session, user_id)
+            )
+            read_filter['include' if read else 'exclude'] = read_posts_ids
+        page_ids = merge_timelines(
+            list(timelines.values()),
+            max_length=constants.TIMELINE_MAX_LENGTH,
+            horizon=to_timestamp(self._get_feed_horizon()),
+            offset=offset, limit=limit, **read_filter
+        )
+        if not page_ids:
+            return page_ids
+        db_objs = await self._select_on_shards(
+            session, select(self.model), self.model.id, page_ids
+        )
+        posts = {post.id: post for post in db_objs}
+        return [posts[post_id] for post_id in page_ids if post_id in posts]
+
+    async def _get_shard_params_for_user_feed(
+        self, session: AsyncSession, user_id: int, read: bool | None
+    ) -> list[tuple[AsyncSession, dict]]:
+        """
+        Возвращает сессии шардов с постами блогов, на которые подписан
+        пользователь, и параметры запросов ленты к ним.
+        """
+        blog_ids = await self._get_subscribed_blogs_ids(session, user_id)
+        params = await self._get_feed_params(session, user_id, read)
+        return [
+            (shard_session, {**params, 'blog_ids': shard_blog_ids})
+            for shard_session, shard_blog_ids in group_by_shard(
+                session, blog_ids
+            )
+        ]
+
+    async def _get_page_from_shards(
+        self, session: AsyncSession, user_id: int, limit: int, offset: int,
+        read: bool | None
+    ):
+        """
+        Собирает страницу ленты из шардов: первые offset + limit постов
+        запрашиваются у шардов параллельно и сливаются по времени создания.
+        """
+        shards = await self._get_shard_params_for_user_feed(
+            session, user_id, read
+        )
+        statement = self._shard_feed_page_statements[read]
+        results = await asyncio.gather(*(
+            shard_session.execute(
+                statement, {**params, 'limit': offset + limit, 'offset': 0}
+            )
+            for shard_session, params in shards
+        ))
+        merged = heapq.merge(
+            *(result.scalars().all() for result in results),
+            key=attrgetter('created_at', 'id'), reverse=True
+        )
+        return list(islice(merged, offset, offset + limit))
+
+    async def _count_on_shards(
+        self, session: AsyncSession, user_id: int, read: bool | None,
+        total_mode: TotalMode
+    ) -> tuple[int | None, TotalMode]:
+        """
+        Считает посты ленты на шардах параллельно и складывает результаты.
+        """
+        if total_mode == TotalMode.NONE:
+            return None, total_mode
+        shards = await self._get_shard_params_for_user_feed(
+            session, user_id, read
+        )
+        results = await asyncio.gather(*(
+            count_total(
+                shard_session, self._shard_feed_statements[read], total_mode,
+                cap=constants.MAX_POSTS_IN_FEED, params=params
+            )
+            for shard_session, params in shards
+        ))
+        total = sum(shard_total for shard_total, _ in results)
+        total_kinds = {shard_kind for _, shard_kind in results}
+        if TotalMode.ESTIMATE in total_kinds:
+            total_kind = TotalMode.ESTIMATE
+        elif (
+            TotalMode.CAPPED in total_kinds or
+            total_mode == TotalMode.CAPPED and
+            total > constants.MAX_POSTS_IN_FEED
+        ):
+            total_kind = TotalMode.CAPPED
+        else:
+            total_kind = TotalMode.EXACT
+        return min(total, constants.MAX_POSTS_IN_FEED), total_kind
+
+    @coalesced
+    async def get_page_for_user_feed(
+        self, session: AsyncSession, user_id: int, limit: int,
+        offset: int = 0, read: bool | None = None
+    ):
+        """
+        Возвращает страницу ленты пользователя. Посты сначала ищутся в
+        коротком окне последних дней, и окно расширяется, только если
+        страница не заполнилась. Глубина ленты ограничена MAX_POSTS_IN_FEED,
+        поэтому стоимость запроса зависит от размера страницы, а не от всей
+        истории блогов.
+        """
+        limit = min(limit, constants.MAX_POSTS_IN_FEED - offset)
+        if limit <= 0:
+            return []
+        if timeline_cache is not None:
+            db_objs = await self._get_page_from_timelines(
+                session, user_id, limit, offset, read
+            )
+            if db_objs is not None:
+                return db_objs
+        if shard_router is not None:
+            return await self._get_page_from_shards(
+                session, user_id, limit, offset, read
+            )
+        statement = self._feed_page_statements[read]
+        params = await self._get_feed_params(session, user_id, read)
+        params.update(limit=limit, offset=offset)
+        now = datetime.utcnow()
+        for days in constants.FEED_SCAN_WINDOWS_DAYS:
+            db_objs = await session.execute(
+                statement, {**params, 'since': now - timedelta(days=days)}
+            )
+            window_posts = db_objs.scalars().all()
+            if len(window_posts) == limit:
+                return window_posts
+        db_objs = await session.execute(statement, params)
+        return db_objs.scalars().all()
+
+    @coalesced
+    async def count_for_user_feed(
+        self, session: AsyncSession, user_id: int, read: bool | None = None,
+        total_mode: TotalMode = TotalMode.EXACT
+    ) -> tuple[int | None, TotalMode]:
+        """
+        Возвращает количество постов в ленте пользователя в пределах
+        MAX_POSTS_IN_FEED и способ его подсчёта.
+        """
+        if shard_router is not None:
+            return await self._count_on_shards(
+                session, user_id, read, total_mode
+            )
+        statement = self._feed_statements[read]
+        if total_mode == TotalMode.EXACT:
+            statement = statement.limit(constants.MAX_POSTS_IN_FEED)
+        total, total_kind = await count_total(
+            session, statement, total_mode, cap=constants.MAX_POSTS_IN_FEED,
+            params=await self._get_feed_params(session, user_id, read)
+        )
+        if total is not None:
+            total = min(total, constants.MAX_POSTS_IN_FEED)
+        return total, total_kind
+
     async def get_multi_for_user_feed(
         self, session: AsyncSession, user_id: int,
         limit: int | None = None
     ):
-        """Возвращает все посты для ленты пользователя."""
-        statement = self._get_base_query_for_user_feed(user_id)
-        if limit:
-            statement = statement.limit(limit)
-        db_objs = await session.execute(statement)
-        return db_objs.scalars().all()
+        """Возвращает последние посты для ленты пользователя."""
+        return await self.get_page_for_user_feed(
+            session, user_id, limit=limit or constants.MAX_POSTS_IN_FEED
+        )
 
-    async def get_multi_unread_for_user_feed(
-        self, session: AsyncSession, user_id: int
+    async def create(
+        self, session: AsyncSession, obj_in: BaseModel, commit: bool = True,
+        **kwargs
     ):
-        """Возвращает непрочитанные посты для ленты пользователя."""
-        read_posts_ids = await self._get_read_posts_ids(session, user_id)
-        base_query = self._get_base_query_for_user_feed(user_id)
-        statement = base_query.where(
-            self.model.id.notin_(read_posts_ids)
-        )
-        db_objs = await session.execute(statement)
-        return db_objs.scalars().all()
+        """Создает пост и добавляет его в закэшированную ленту блога."""
+        db_obj = await super().create(session, obj_in, commit, **kwargs)
+        if timeline_cache is not None:
+            await run_after_commit(
+                session,
+                partial(
+                    timeline_cache.add, db_obj.blog_id, db_obj.id,
+                    db_obj.created_at
+                ),
+                commit
+            )
+        return db_obj
 
-    async def get_multi_read_for_user_feed(
-        self, session: AsyncSession, user_id: int
+    async def remove(
+        self, session: AsyncSession, db_obj, commit: bool = True
     ):
-        """Возвращает прочитанные посты для ленты пользователя."""
-        read_posts_ids = await self._get_read_posts_ids(session, user_id)
-        base_query = self._get_base_query_for_user_feed(user_id)
-        statement = base_query.where(
-            self.model.id.in_(read_posts_ids)
+        """
+        Удаляет пост и сбрасывает закэшированную ленту блога: после удаления
+        обрезанная лента стала бы выглядеть полной.
+        """
+        blog_id = db_obj.blog_id
+        await super().remove(session, db_obj, commit)
+        if timeline_cache is not None:
+            await run_after_commit(
+                session, partial(timeline_cache.evict, blog_id), commit
+            )
+
+    def _build_feed_change(self, db_obj, removed: bool):
+        """Возвращает запись журнала о добавлении или удалении поста."""
+        return FeedChange(
+            kind=FeedChange.POST_REMOVED if removed else FeedChange.POST_ADDED,
+            blog_id=db_obj.blog_id, post_id=db_obj.id
         )
-        db_objs = await session.execute(statement)
-        return db_objs.scalars().all()
 
+    async def _update_counters(
+        self, session: AsyncSession, db_session: AsyncSession, db_obj,
+        removed: bool
+    ) -> None:
+        """
+        Обновляет количество постов блога и время его последнего поста.
+        После удаления время последнего поста берётся по индексу
+        (blog_id, created_at) из оставшихся постов.
+        """
+        if removed:
+            await db_session.flush()
+            last_post_at = await db_session.execute(
+                select(func.max(Post.created_at)).where(
+                    Post.blog_id == db_obj.blog_id
+                )
+            )
+            values = {
+                'posts_count': Blog.posts_count - 1,
+                'last_post_at': last_post_at.scalar_one(),
+            }
+        else:
+            values = {
+                'posts_count': Blog.posts_count + 1,
+                'last_post_at': func.greatest(
+                    Blog.last_post_at, db_obj.created_at
+                ),
+            }
+        await blog_crud.update_counters(session, db_obj.blog_id, **values)
+
+    async def get_feed_changes(
+        self, session: AsyncSession, user_id: int, since_id: int
+    ) -> dict:
+        """
+        Возвращает изменения ленты пользователя после позиции since_id в
+        журнале: добавленные в ленту посты (новые посты и посты блогов, на
+        которые пользователь подписался), ID удаленных из ленты постов
+        (удаленные посты и посты блогов, от которых пользователь отписался),
+        ID постов, отмеченных прочитанными и непрочитанными, а также новую
+        позицию в журнале. Для каждого объекта учитывается только последнее
+        изменение.
+        """
+        last_id = await feed_change_crud.get_last_position(session)
+        changes = {
+            'added': [], 'removed': [], 'read': [], 'unread': [],
+            'last_id': max(last_id or 0, since_id)
+        }
+        if changes['last_id'] == since_id:
+            return changes
+        until_id = changes['last_id']
+        subscriptions, read_flips = {}, {}
+        for change in await feed_change_crud.get_multi_for_user(
+            session, user_id, since_id, until_id
+        ):
+            if change.kind in (FeedChange.READ, FeedChange.UNREAD):
+                read_flips[change.post_id] = change.kind == FeedChange.READ
+            else:
+                subscriptions[change.blog_id] = (
+                    change.kind == FeedChange.SUBSCRIBED
+                )
+        blog_ids = set(await self._get_subscribed_blogs_ids(session, user_id))
+        new_blog_ids = {
+            blog_id for blog_id, subscribed in subscriptions.items()
+            if subscribed and blog_id in blog_ids
+        }
+        gone_blog_ids = {
+            blog_id for blog_id, subscribed in subscriptions.items()
+            if not subscribed and blog_id not in blog_ids
+        }
+        posts = {}
+        for change in await feed_change_crud.get_multi_for_blogs(
+            session, list(blog_ids - new_blog_ids), since_id, until_id
+        ):
+            posts[change.post_id] = change.kind == FeedChange.POST_ADDED
+        in_horizon = self.model.created_at >= self._get_feed_horizon()
+        added = await self._select_on_shards(
+            session, select(self.model), self.model.id,
+            [post_id for post_id, is_added in posts.items() if is_added]
+        )
+        added += await self._select_on_shards(
+            session, select(self.model).where(in_horizon),
+            self.model.blog_id, new_blog_ids
+        )
+        added.sort(key=attrgetter('created_at', 'id'), reverse=True)
+        changes['added'] = added[:constants.MAX_POSTS_IN_FEED]
+        changes['removed'] = [
+            post_id for post_id, is_added in posts.items() if not is_added
+        ]
+        changes['removed'] += await self._select_on_shards(
+            session, select(self.model.id).where(in_horizon),
+            self.model.blog_id, gone_blog_ids
+        )
+        for post_id, read in read_flips.items():
+            changes['read' if read else 'unread'].append(post_id)
+        return changes
+
+    @cached_property
+    def _blog_statement(self):
+        """
+        Запрос постов блога из параметра blog_id в обратном хронологическом
+        порядке их создания.
+        """
+        return select(Post).where(
+            Post.blog_id == bindparam('blog_id')
+        ).order_by(desc(Post.created_at), desc(Post.id))
+
+    @cached_property
+    def _blog_page_statement(self):
+        """
+        Запрос страницы постов блога с параметрами limit и offset. При
+        limit=None возвращаются все посты.
+        """
+        return self._blog_statement.limit(bindparam('limit')).offset(
+            bindparam('offset')
+        )
+
+    @coalesced
     async def get_multi_for_blog(
-        self, session: AsyncSession, blog_id: int
+        self, session: AsyncSession, blog_id: int,
+        limit: int | None = None, offset: int = 0
     ):
-        """Возвращает посты данного блога."""
+        """Возвращает посты данного блога, при необходимости страницу."""
+        session = self._get_session(session, blog_id)
         db_objs = await session.execute(
-            select(self.model).where(
-                self.model.blog_id == blog_id
-            ).order_by(desc(self.model.created_at))
+            self._blog_page_statement,
+            {'blog_id': blog_id, 'limit': limit, 'offset': offset}
         )
         return db_objs.scalars().all()
 
+    @coalesced
+    async def count_for_blog(
+        self, session: AsyncSession, blog_id: int,
+        total_mode: TotalMode = TotalMode.EXACT
+    ) -> tuple[int | None, TotalMode]:
+        """Возвращает количество постов блога и способ его подсчёта."""
+        return await count_total(
+            self._get_session(session, blog_id), self._blog_statement,
+            total_mode, cap=constants.TOTAL_COUNT_CAP,
+            params={'blog_id': blog_id}
+        )
+
+    @cached_property
+    def _latest_for_blogs_statement(self):
+        """
+        Запрос не более per_blog последних постов каждого блога из параметра
+        blog_ids, созданных не раньше параметра since.
+        """
+        ranked = select(
+            Post, func.row_number().over(
+                partition_by=Post.blog_id,
+                order_by=(desc(Post.created_at), desc(Post.id))
+            ).label('position')
+        ).where(
+            in_ids(Post.blog_id, 'blog_ids') &
+            (Post.created_at >= bindparam('since'))
+        ).subquery()
+        ranked_post = aliased(Post, ranked)
+        return select(ranked_post).where(
+            ranked.c.position <= bindparam('per_blog')
+        ).order_by(ranked.c.blog_id, ranked.c.position)
+
+    async def get_latest_for_blogs(
+        self, session: AsyncSession, blog_ids, per_blog: int
+    ) -> dict[int, list[Post]]:
+        """
+        Возвращает последние посты блогов в пределах горизонта ленты: не
+        больше per_blog постов каждого блога от новых к старым. Для всех
+        блогов выполняется один запрос к каждой базе.
+        """
+        params = {'since': self._get_feed_horizon(), 'per_blog': per_blog}
+        results = await asyncio.gather(*(
+            shard_session.execute(
+                self._latest_for_blogs_statement,
+                {**params, 'blog_ids': shard_blog_ids}
+            )
+            for shard_session, shard_blog_ids in group_by_shard(
+                session, blog_ids
+            )
+        ))
+        posts = {}
+        for result in results:
+            for post in result.scalars():
+                posts.setdefault(post.blog_id, []).append(post)
+        return posts
+
 
 class UserToObjRelationsMixin:
     """
@@ -143,14 +975,20 @@ class UserToObjRelationsMixin:
     Subscription и ReadStatus.
     """
 
+    @cached_property
+    def _for_user_statement(self):
+        """Запрос объектов пользователя из параметра user_id."""
+        return select(self.model).where(
+            self.model.user_id == bindparam('user_id')
+        ).order_by(desc(self.model.created_at))
+
     async def get_multi_for_user(
         self, session: AsyncSession, user_id: int
     ):
         """Возвращает список объектов из базы по ID пользователя."""
+        session = self._get_session(session, user_id)
         db_objs = await session.execute(
-            select(self.model).where(self.model.user_id == user_id).order_by(
-                desc(self.model.created_at)
-            )
+            self._for_user_statement, {'user_id': user_id}
         )
         return db_objs.scalars().all()
 
@@ -159,40 +997,384 @@ class SubscriptionCRUD(
     CRUDBase, RemoveMixin, UserToObjRelationsMixin
 ):
     """Класс для CRUD-операций с подписками."""
+    shard_key = 'user_id'
+
+    async def _update_counters(
+        self, session: AsyncSession, db_session: AsyncSession, db_obj,
+        removed: bool
+    ) -> None:
+        """Обновляет количество подписчиков блога."""
+        await blog_crud.update_counters(
+            session, db_obj.blog_id,
+            subscribers_count=Blog.subscribers_count + (-1 if removed else 1)
+        )
+
+    def _build_feed_change(self, db_obj, removed: bool):
+        """Возвращает запись журнала о подписке или отписке от блога."""
+        return FeedChange(
+            kind=(
+                FeedChange.UNSUBSCRIBED if removed else FeedChange.SUBSCRIBED
+            ),
+            user_id=db_obj.user_id, blog_id=db_obj.blog_id
+        )
+
+    @cached_property
+    def _get_statement(self):
+        """Запрос подписки по параметрам user_id и blog_id."""
+        return select(self.model).where(
+            (self.model.user_id == bindparam('user_id')) &
+            (self.model.blog_id == bindparam('blog_id'))
+        )
 
     async def get(
         self, session: AsyncSession, user_id: int, blog_id: int
     ):
         """Возвращает подписку из базы по ID пользователя и блога."""
+        session = self._get_session(session, user_id)
         db_obj = await session.execute(
-            select(self.model).where(
-                (self.model.user_id == user_id) &
-                (self.model.blog_id == blog_id)
-            )
+            self._get_statement, {'user_id': user_id, 'blog_id': blog_id}
         )
         return db_obj.scalars().first()
 
+    async def stream_pairs(self, session: AsyncSession, chunk_size: int):
+        """
+        Читает все подписки из всех баз потоком и отдаёт их пачками пар
+        (user_id, blog_id) не больше chunk_size, не создавая ORM-объектов.
+        """
+        statement = select(self.model.user_id, self.model.blog_id)
+        for db_session in get_all_sessions(session):
+            result = await db_session.stream(statement)
+            async for rows in result.partitions(chunk_size):
+                yield rows
+
 
 class ReadStatusCRUD(
     CRUDBase, RemoveMixin, UserToObjRelationsMixin
 ):
     """Класс для CRUD-операций со статусами прочтения постов."""
+    shard_key = 'user_id'
+
+    def _build_feed_change(self, db_obj, removed: bool):
+        """Возвращает запись журнала об изменении статуса прочтения."""
+        return FeedChange(
+            kind=FeedChange.UNREAD if removed else FeedChange.READ,
+            user_id=db_obj.user_id, post_id=db_obj.post_id
+        )
+
+    @cached_property
+    def _get_statement(self):
+        """Запрос статуса прочтения по параметрам user_id и post_id."""
+        return select(self.model).where(
+            (self.model.user_id == bindparam('user_id')) &
+            (self.model.post_id == bindparam('post_id'))
+        )
 
     async def get(
         self, session: AsyncSession, user_id: int, post_id: int
     ):
         """Возвращает статус прочтения из базы по ID пользователя и поста."""
+        session = self._get_session(session, user_id)
         db_obj = await session.execute(
+            self._get_statement, {'user_id': user_id, 'post_id': post_id}
+        )
+        return db_obj.scalars().first()
+
+    async def enqueue(
+        self, session: AsyncSession, user_id: int, post_id: int, read: bool
+    ) -> None:
+        """
+        Ставит отметку о прочтении или её снятие в буфер отложенной записи
+        и сразу публикует событие для инвалидации кэшей ленты пользователя:
+        иначе до переноса в базу кэши отдавали бы прежний статус поста.
+        """
+        if not await read_status_buffer.enqueue(user_id, post_id, read=read):
+            return
+        await publish(
+            session, build_event(self.model.__tablename__, user_id=user_id)
+        )
+        await session.commit()
+        dispatch_committed(session)
+
+    async def apply_batch(
+        self, session: AsyncSession, marked: dict, unmarked: list
+    ) -> None:
+        """
+        Переносит в базу пакет операций из буфера отложенной записи: удаляет
+        статусы для пар (user_id, post_id) из unmarked и добавляет
+        недостающие статусы из marked ({(user_id, post_id): время прочтения})
+        для ещё существующих постов. В каждой базе всё выполняется двумя
+        запросами, шарды обрабатываются параллельно.
+        """
+        if marked:
+            existing_posts_ids = set(await self._select_on_shards(
+                session, select(Post.id), Post.id,
+                {post_id for _, post_id in marked}
+            ))
+            marked = {
+                key: created_at for key, created_at in marked.items()
+                if key[1] in existing_posts_ids
+            }
+        users_ids = {user_id for user_id, _ in [*marked, *unmarked]}
+        groups = [
+            (shard_session, set(shard_users_ids))
+            for shard_session, shard_users_ids in group_by_shard(
+                session, users_ids
+            )
+        ]
+        await asyncio.gather(*(
+            self._apply_shard_batch(
+                shard_session,
+                {
+                    key: created_at for key, created_at in marked.items()
+                    if key[0] in shard_users_ids
+                },
+                [key for key in unmarked if key[0] in shard_users_ids]
+            )
+            for shard_session, shard_users_ids in groups
+        ))
+        feed_changes = [
+            {'kind': FeedChange.READ, 'user_id': user_id, 'post_id': post_id}
+            for user_id, post_id in marked
+        ] + [
+            {'kind': FeedChange.UNREAD, 'user_id': user_id, 'post_id': post_id}
+            for user_id, post_id in unmarked
+        ]
+        if feed_changes:
+            await session.execute(insert(FeedChange), feed_changes)
+        await publish(session, *(
+            build_event(self.model.__tablename__, user_id=user_id)
+            for user_id in users_ids
+        ))
+        await self._commit(
+            session, *(shard_session for shard_session, _ in groups)
+        )
+        dispatch_committed(session)
+
+    @staticmethod
+    async def _apply_shard_batch(
+        session: AsyncSession, marked: dict, unmarked: list
+    ) -> None:
+        """Применяет операции пакета к статусам прочтения одной базы."""
+        if unmarked:
+            users_ids, posts_ids = zip(*unmarked)
+            await session.execute(
+                text(
+                    'DELETE FROM readstatuses WHERE (user_id, post_id) IN ('
+                    'SELECT * FROM unnest(CAST(:users_ids AS integer[]), '
+                    'CAST(:posts_ids AS integer[])))'
+                ),
+                {'users_ids': list(users_ids), 'posts_ids': list(posts_ids)}
+            )
+        if marked:
+            users_ids, posts_ids = zip(*marked)
+            await session.execute(
+                text(
+                    'INSERT INTO readstatuses (created_at, user_id, post_id) '
+                    'SELECT pending.created_at, pending.user_id, '
+                    'pending.post_id FROM unnest('
+                    'CAST(:created_ats AS timestamp[]), '
+                    'CAST(:users_ids AS integer[]), '
+                    'CAST(:posts_ids AS integer[])'
+                    ') AS pending (created_at, user_id, post_id) '
+                    'WHERE NOT EXISTS (SELECT 1 FROM readstatuses '
+                    'WHERE readstatuses.user_id = pending.user_id '
+                    'AND readstatuses.post_id = pending.post_id)'
+                ),
+                {
+                    'created_ats': list(marked.values()),
+                    'users_ids': list(users_ids),
+                    'posts_ids': list(posts_ids)
+                }
+            )
+
+
+class FeedChangeCRUD(CRUDBase):
+    """Класс для работы с журналом изменений лент."""
+
+    async def assign_positions(self, session: AsyncSession) -> None:
+        """
+        Назначает позиции в журнале записям, транзакции которых завершены
+        вместе со всеми более ранними: их txid меньше xmin текущего снимка,
+        так что ни одна незавершённая транзакция уже не добавит запись,
+        которой должна достаться меньшая позиция. Назначение выполняет
+        один процесс за раз под advisory-блокировкой, и его транзакция
+        коммитится до следующего назначения, поэтому видимые позиции не
+        имеют пропусков. Если блокировка занята, назначение пропускается:
+        позиции выдаст процесс, который её держит.
+        """
+        locked = await session.execute(
+            select(func.pg_try_advisory_xact_lock(
+                constants.FEED_CHANGES_POSITION_LOCK
+            ))
+        )
+        if locked.scalar_one():
+            await session.execute(text(
+                'UPDATE feedchanges SET position = settled.position FROM ('
+                "SELECT id, nextval('feedchanges_position_seq') AS position "
+                'FROM (SELECT id FROM feedchanges WHERE position IS NULL '
+                'AND txid < CAST(CAST(pg_snapshot_xmin(pg_current_snapshot()) '
+                'AS text) AS bigint) ORDER BY id) AS ordered'
+                ') AS settled WHERE feedchanges.id = settled.id'
+            ))
+        await session.commit()
+
+    async def get_last_position(self, session: AsyncSession) -> int | None:
+        """
+        Возвращает последнюю позицию в журнале, предварительно назначив
+        позиции записям завершённых транзакций. Записи ещё идущих
+        транзакций получат большие позиции и будут отданы клиенту при
+        следующей синхронизации, даже если их ID меньше.
+        """
+        await self.assign_positions(session)
+        last_position = await session.execute(
+            select(func.max(self.model.position))
+        )
+        return last_position.scalar_one()
+
+    async def get_multi_for_user(
+        self, session: AsyncSession, user_id: int, since_id: int,
+        until_id: int
+    ):
+        """
+        Возвращает изменения подписок и статусов прочтения пользователя в
+        диапазоне позиций журнала (since_id, until_id].
+        """
+        db_objs = await session.execute(
             select(self.model).where(
                 (self.model.user_id == user_id) &
-                (self.model.post_id == post_id)
+                (self.model.position > since_id) &
+                (self.model.position <= until_id)
+            ).order_by(self.model.position)
+        )
+        return db_objs.scalars().all()
+
+    async def get_multi_for_blogs(
+        self, session: AsyncSession, blog_ids: list[int], since_id: int,
+        until_id: int
+    ):
+        """
+        Возвращает добавления и удаления постов в блогах в диапазоне позиций
+        журнала (since_id, until_id].
+        """
+        if not blog_ids:
+            return []
+        db_objs = await session.execute(
+            select(self.model).where(
+                self.model.blog_id.in_(blog_ids) &
+                self.model.kind.in_(
+                    (FeedChange.POST_ADDED, FeedChange.POST_REMOVED)
+                ) &
+                (self.model.position > since_id) &
+                (self.model.position <= until_id)
+            ).order_by(self.model.position)
+        )
+        return db_objs.scalars().all()
+
+    async def get_subscription_changes(
+        self, session: AsyncSession, since_id: int, until_id: int
+    ) -> list[tuple[str, int, int]]:
+        """
+        Возвращает подписки и отписки (kind, user_id, blog_id) всех
+        пользователей в диапазоне позиций журнала (since_id, until_id] в
+        порядке журнала.
+        """
+        rows = await session.execute(
+            select(
+                self.model.kind, self.model.user_id, self.model.blog_id
+            ).where(
+                self.model.kind.in_(
+                    (FeedChange.SUBSCRIBED, FeedChange.UNSUBSCRIBED)
+                ) &
+                (self.model.position > since_id) &
+                (self.model.position <= until_id)
+            ).order_by(self.model.position)
+        )
+        return [tuple(row) for row in rows]
+
+    async def remove_older_than(
+        self, session: AsyncSession, before: datetime
+    ) -> int:
+        """Удаляет записи журнала, созданные раньше before."""
+        result = await session.execute(
+            delete(self.model).where(self.model.created_at < before)
+        )
+        await session.commit()
+        return result.rowcount
+
+
+class BlogSimilarityCRUD(CRUDBase):
+    """Класс для работы с похожими блогами и рекомендациями блогов."""
+
+    async def replace_all(
+        self, session: AsyncSession, blog_ids, similar_blog_ids, scores
+    ) -> int:
+        """
+        Заменяет все похожие блоги новыми в одной транзакции: до её
+        коммита рекомендации строятся по прежним данным. Возвращает
+        количество записанных пар.
+        """
+        await session.execute(delete(self.model))
+        rows = [
+            {'blog_id': blog_id, 'similar_blog_id': similar_id, 'score': score}
+            for blog_id, similar_id, score in zip(
+                blog_ids.tolist(), similar_blog_ids.tolist(), scores.tolist()
+            )
+        ]
+        for start in range(0, len(rows), constants.SIMILAR_BLOGS_BATCH_SIZE):
+            await session.execute(
+                insert(self.model),
+                rows[start:start + constants.SIMILAR_BLOGS_BATCH_SIZE]
             )
+        await session.commit()
+        return len(rows)
+
+    @cached_property
+    def _recommendations_statement(self):
+        """
+        Запрос блогов, похожих на блоги из параметра blog_ids, по убыванию
+        суммарного сходства. Исключаются сами блоги blog_ids и блоги
+        пользователя из параметра user_id.
+        """
+        score = func.sum(BlogSimilarity.score).label('score')
+        return select(Blog, score).join(
+            BlogSimilarity, Blog.id == BlogSimilarity.similar_blog_id
+        ).where(
+            in_ids(BlogSimilarity.blog_id, 'blog_ids') &
+            (BlogSimilarity.similar_blog_id != all_(ids_param('blog_ids'))) &
+            Blog.user_id.is_distinct_from(bindparam('user_id'))
+        ).group_by(Blog.id).order_by(desc(score), Blog.id).limit(
+            bindparam('limit')
         )
-        return db_obj.scalars().first()
 
+    async def get_recommendations_for_user(
+        self, session: AsyncSession, user_id: int, limit: int
+    ) -> list[tuple[Blog, float]]:
+        """
+        Возвращает блоги, рекомендуемые пользователю, и их оценки: блоги,
+        похожие на блоги его подписок, кроме уже подписанных и собственных.
+        """
+        blog_ids = await PostCRUD._get_subscribed_blogs_ids(session, user_id)
+        if not blog_ids:
+            return []
+        rows = await session.execute(
+            self._recommendations_statement,
+            {'blog_ids': blog_ids, 'user_id': user_id, 'limit': limit}
+        )
+        return [(blog, score) for blog, score in rows]
+
+
+if is_tracing_enabled():
+    # Базовый класс последним: иначе подклассы унаследуют его спаны.
+    for crud_class in (
+        UserCRUD, BlogCRUD, PostCRUD, SubscriptionCRUD, ReadStatusCRUD,
+        FeedChangeCRUD, BlogSimilarityCRUD, CRUDBase
+    ):
+        trace_methods(crud_class)
 
 user_crud = UserCRUD(User)
-blog_crud = CRUDBase(Blog)
+blog_crud = BlogCRUD(Blog)
 post_crud = PostCRUD(Post)
 subscription_crud = SubscriptionCRUD(Subscription)
 read_status_crud = ReadStatusCRUD(ReadStatus)
+feed_change_crud = FeedChangeCRUD(FeedChange)
+blog_similarity_crud = BlogSimilarityCRUD(BlogSimilarity)
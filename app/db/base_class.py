@@ -1,17 +1,47 @@
 from datetime import datetime
+from functools import lru_cache
 
-from inflect import engine
 from sqlalchemy import Column, DateTime, Integer
 from sqlalchemy.orm import declarative_base, declared_attr
 
+# Заранее вычисленные имена таблиц моделей приложения: при импорте моделей
+# не нужно загружать inflect.
+TABLE_NAMES = {
+    'user': 'users',
+    'blog': 'blogs',
+    'post': 'posts',
+    'subscription': 'subscriptions',
+    'readstatus': 'readstatuses',
+    'feedchange': 'feedchanges',
+    'blogsimilarity': 'blogsimilarities',
+}
+
+
+@lru_cache(maxsize=None)
+def get_table_name(class_name: str) -> str:
+    """
+    Возвращает имя таблицы модели - название класса во множественном числе.
+    Для моделей вне TABLE_NAMES имя вычисляется через inflect, который
+    загружается только при первом таком вызове.
+    """
+    singular_name = class_name.lower()
+    if singular_name in TABLE_NAMES:
+        return TABLE_NAMES[singular_name]
+    return _get_inflect_engine().plural(singular_name)
+
+
+@lru_cache(maxsize=None)
+def _get_inflect_engine():
+    """Возвращает общий движок inflect."""
+    from inflect import engine
+    return engine()
+
 
 class Prebase:
 
     @declared_attr
     def __tablename__(cls) -> str:
-        singular_name = cls.__name__.lower()
-        plural_name = engine().plural(singular_name)
-        return plural_name
+        return get_table_name(cls.__name__)
 
     id = Column(Integer, primary_key=True)
     created_at = Column(DateTime, default=datetime.utcnow)
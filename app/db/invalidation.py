@@ -0,0 +1,166 @@
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from typing import Callable
+from uuid import uuid4
+
+import asyncpg
+from sqlalchemy import Text, bindparam, func, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import constants, settings
+
+CHANNEL = 'cache_invalidation'
+ALL_ENTITIES = '*'
+# Поля объектов, по которым локальные кэши находят устаревшие записи.
+EVENT_KEYS = ('id', 'user_id', 'blog_id', 'post_id')
+# Метка процесса: свои уведомления процесс уже обработал после коммита.
+ORIGIN = uuid4().hex
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[dict], None]
+
+
+class InvalidationBus:
+    """
+    Шина инвалидации локальных кэшей между процессами. Изменения в базе
+    сопровождаются NOTIFY в той же транзакции, а каждый процесс держит одно
+    выделенное соединение с LISTEN и удаляет из своих кэшей устаревшие
+    записи.
+    """
+
+    def __init__(self):
+        self._handlers: dict[str, list[tuple[Handler, bool]]] = (
+            defaultdict(list)
+        )
+        self._task: asyncio.Task | None = None
+
+    def subscribe(self, entity: str, handler: Handler, local: bool = True):
+        """
+        Подписывает обработчик на события сущности (имя таблицы или
+        ALL_ENTITIES для всех событий). Обработчик с local=False получает
+        только события других процессов: свои изменения кэш учитывает сам.
+        При переподключении к базе все обработчики получают событие с
+        сущностью ALL_ENTITIES и должны сбросить свои кэши целиком.
+        """
+        self._handlers[entity].append((handler, local))
+
+    def dispatch(self, event: dict, local: bool = True) -> None:
+        """Передает событие подписанным обработчикам."""
+        entity = event['entity']
+        if entity == ALL_ENTITIES:
+            handlers = [
+                handler for entity_handlers in self._handlers.values()
+                for handler in entity_handlers
+            ]
+        else:
+            handlers = (
+                self._handlers.get(entity, []) +
+                self._handlers.get(ALL_ENTITIES, [])
+            )
+        for handler, handles_local in handlers:
+            if local and not handles_local:
+                continue
+            try:
+                handler(event)
+            except Exception:
+                logger.exception('Ошибка обработчика инвалидации кэша')
+
+    def _on_notification(self, connection, pid, channel, payload) -> None:
+        """Обрабатывает уведомление из базы."""
+        event = json.loads(payload)
+        if event.pop('origin', None) != ORIGIN:
+            self.dispatch(event, local=False)
+
+    async def _listen(self, dsn: str) -> None:
+        """
+        Слушает канал инвалидации, переподключаясь при обрыве соединения или
+        любой другой ошибке с экспоненциально растущей паузой. Пропущенные
+        за время обрыва события восполняются полным сбросом кэшей.
+        """
+        delay = constants.INVALIDATION_RECONNECT_DELAY
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(dsn)
+                lost = asyncio.Event()
+                connection.add_termination_listener(lambda _: lost.set())
+                await connection.add_listener(CHANNEL, self._on_notification)
+                self.dispatch({'entity': ALL_ENTITIES}, local=False)
+                delay = constants.INVALIDATION_RECONNECT_DELAY
+                await lost.wait()
+            except (OSError, asyncpg.PostgresError) as error:
+                logger.warning('Шина инвалидации недоступна: %s', error)
+            except Exception:
+                logger.exception('Ошибка прослушивания шины инвалидации')
+            finally:
+                if connection is not None and not connection.is_closed():
+                    connection.terminate()
+            await asyncio.sleep(delay)
+            delay = min(
+                delay * 2, constants.INVALIDATION_RECONNECT_MAX_DELAY
+            )
+
+    async def start(self) -> None:
+        """Открывает выделенное соединение для прослушивания канала."""
+        url = make_url(settings.database_url).set(drivername='postgresql')
+        self._task = asyncio.create_task(
+            self._listen(url.render_as_string(hide_password=False))
+        )
+
+    async def stop(self) -> None:
+        """Закрывает соединение прослушивания."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+invalidation_bus = InvalidationBus()
+
+
+def build_event(entity: str, **keys) -> dict:
+    """Формирует событие инвалидации."""
+    return {
+        'entity': entity,
+        **{key: value for key, value in keys.items() if value is not None}
+    }
+
+
+def build_event_for(db_obj) -> dict:
+    """Формирует событие инвалидации для объекта модели."""
+    return build_event(
+        db_obj.__tablename__,
+        **{key: getattr(db_obj, key, None) for key in EVENT_KEYS}
+    )
+
+
+async def publish(session: AsyncSession, *events: dict) -> None:
+    """
+    Публикует события инвалидации в транзакции сессии. Уведомления
+    доставляются другим процессам только после коммита, а в своём процессе
+    события рассылаются вызовом dispatch_committed после коммита.
+    """
+    session.info.setdefault('invalidations', []).extend(events)
+    if not settings.cache_invalidation_bus:
+        return
+    payloads = [json.dumps({**event, 'origin': ORIGIN}) for event in events]
+    await session.execute(
+        select(func.pg_notify(
+            CHANNEL,
+            func.unnest(bindparam('payloads', payloads, type_=ARRAY(Text)))
+        ))
+    )
+
+
+def dispatch_committed(session: AsyncSession) -> None:
+    """Рассылает локальным кэшам события закоммиченной транзакции."""
+    for event in session.info.pop('invalidations', []):
+        invalidation_bus.dispatch(event)
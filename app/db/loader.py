@@ -0,0 +1,107 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.shards import group_by_shard, is_sharded
+from app.db.statements import get_by_ids_statement
+
+
+class DataLoader:
+    """
+    Загрузчик объектов по ID в рамках одного запроса. Запрошенные за один
+    проход цикла событий ID одной модели загружаются одним запросом
+    WHERE id = ANY(:ids), а результаты запоминаются до конца жизни сессии.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self._results: dict[tuple, asyncio.Future] = {}
+        self._queue: dict[type, dict[int, asyncio.Future]] = {}
+        self._lock = asyncio.Lock()
+        self._dispatches: set[asyncio.Task] = set()
+
+    def load(self, model, obj_id: int) -> asyncio.Future:
+        """Возвращает future с объектом модели по его ID или None."""
+        key = (model, obj_id)
+        future = self._results.get(key)
+        if future is not None:
+            return future
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._results[key] = future
+        if not self._queue:
+            loop.call_soon(self._schedule_dispatch)
+        self._queue.setdefault(model, {})[obj_id] = future
+        return future
+
+    async def load_many(self, model, obj_ids: list[int]) -> list:
+        """Возвращает объекты модели по списку ID."""
+        return await asyncio.gather(
+            *(self.load(model, obj_id) for obj_id in obj_ids)
+        )
+
+    def prime(self, db_obj) -> None:
+        """Запоминает уже загруженный или созданный объект."""
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(db_obj)
+        self._results[(type(db_obj), db_obj.id)] = future
+
+    def forget(self, model, obj_id: int) -> None:
+        """Забывает объект, например после его удаления."""
+        self._results.pop((model, obj_id), None)
+
+    def _schedule_dispatch(self) -> None:
+        """Запускает выполнение накопленных запросов отдельной задачей."""
+        task = asyncio.ensure_future(self._dispatch())
+        self._dispatches.add(task)
+        task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self) -> None:
+        """Выполняет накопленные за проход цикла событий запросы."""
+        queue, self._queue = self._queue, {}
+        async with self._lock:
+            for model, futures in queue.items():
+                await self._load_batch(model, futures)
+
+    async def _load_batch(
+        self, model, futures: dict[int, asyncio.Future]
+    ) -> None:
+        """
+        Загружает объекты модели одним запросом, а для моделей в шардах -
+        одним запросом к каждому шарду.
+        """
+        if is_sharded(model):
+            groups = group_by_shard(self.session, futures)
+        else:
+            groups = [(self.session, list(futures))]
+        try:
+            results = await asyncio.gather(*(
+                session.execute(
+                    get_by_ids_statement(model), {'ids': obj_ids}
+                )
+                for session, obj_ids in groups
+            ))
+        except Exception as error:
+            for obj_id, future in futures.items():
+                self.forget(model, obj_id)
+                if not future.done():
+                    future.set_exception(error)
+            return
+        found = {
+            db_obj.id: db_obj
+            for db_objs in results for db_obj in db_objs.scalars().all()
+        }
+        for obj_id, future in futures.items():
+            if not future.done():
+                future.set_result(found.get(obj_id))
+
+
+def get_loader(session: AsyncSession) -> DataLoader:
+    """
+    Возвращает загрузчик, привязанный к сессии. Для сессий, созданных вне
+    зависимости get_async_session, загрузчик создается при первом вызове.
+    """
+    loader = session.info.get('loader')
+    if loader is None:
+        loader = session.info['loader'] = DataLoader(session)
+    return loader
@@ -0,0 +1,159 @@
+import gzip
+import logging
+import os
+import re
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+PARTITIONED_TABLES = ('posts', 'readstatuses')
+PARTITION_NAME_FORMAT = '{table}_p{start:%Y_%m}'
+PARTITION_NAME_PATTERN = r'^{table}_p(\d{{4}})_(\d{{2}})$'
+RETENTION_MODE_DETACH = 'detach'
+RETENTION_MODE_ARCHIVE = 'archive'
+
+logger = logging.getLogger(__name__)
+
+
+def month_start(moment: datetime) -> datetime:
+    """Возвращает начало месяца, в который попадает момент времени."""
+    return datetime(moment.year, moment.month, 1)
+
+
+def add_months(moment: datetime, months: int) -> datetime:
+    """Сдвигает начало месяца на заданное количество месяцев."""
+    month_index = moment.year * 12 + moment.month - 1 + months
+    return datetime(month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(table: str, start: datetime) -> str:
+    """Возвращает имя месячной секции таблицы."""
+    return PARTITION_NAME_FORMAT.format(table=table, start=start)
+
+
+def create_partition_sql(table: str, start: datetime) -> str:
+    """Возвращает DDL для создания месячной секции таблицы."""
+    end = add_months(start, 1)
+    return (
+        f'CREATE TABLE IF NOT EXISTS {partition_name(table, start)} '
+        f'PARTITION OF {table} FOR VALUES '
+        f"FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+    )
+
+
+def create_default_partition_sql(table: str) -> str:
+    """
+    Возвращает DDL для секции по умолчанию, в которую попадают строки вне
+    заранее созданных диапазонов.
+    """
+    return (
+        f'CREATE TABLE IF NOT EXISTS {table}_default '
+        f'PARTITION OF {table} DEFAULT'
+    )
+
+
+def monthly_range(first: datetime, last: datetime) -> list[datetime]:
+    """Возвращает начала месяцев от first до last включительно."""
+    months = []
+    current = month_start(first)
+    while current <= last:
+        months.append(current)
+        current = add_months(current, 1)
+    return months
+
+
+async def get_partitions(
+    session: AsyncSession, table: str
+) -> list[tuple[str, datetime]]:
+    """
+    Возвращает месячные секции таблицы в виде пар (имя, начало диапазона),
+    отсортированные по возрастанию.
+    """
+    result = await session.execute(
+        text(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class parent ON parent.oid = pg_inherits.inhparent '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE parent.relname = :table'
+        ),
+        {'table': table}
+    )
+    pattern = re.compile(PARTITION_NAME_PATTERN.format(table=table))
+    partitions = []
+    for name in result.scalars().all():
+        match = pattern.match(name)
+        if match:
+            year, month = map(int, match.groups())
+            partitions.append((name, datetime(year, month, 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+async def create_future_partitions(
+    session: AsyncSession, months_ahead: int
+) -> list[str]:
+    """
+    Создает секции секционированных таблиц на текущий месяц и заданное
+    количество месяцев вперёд. Возвращает имена созданных секций.
+    """
+    this_month = month_start(datetime.utcnow())
+    created = []
+    for table in PARTITIONED_TABLES:
+        existing = {name for name, _ in await get_partitions(session, table)}
+        for start in monthly_range(
+            this_month, add_months(this_month, months_ahead)
+        ):
+            name = partition_name(table, start)
+            if name not in existing:
+                await session.execute(text(create_partition_sql(table, start)))
+                created.append(name)
+    await session.commit()
+    return created
+
+
+async def _archive_partition(
+    session: AsyncSession, name: str, archive_dir: str
+) -> str:
+    """Выгружает отсоединённую секцию в сжатый CSV-файл и удаляет её."""
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f'{name}.csv.gz')
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    with gzip.open(path, 'wb') as archive:
+
+        async def write_chunk(chunk: bytes) -> None:
+            archive.write(chunk)
+
+        await raw_connection.driver_connection.copy_from_table(
+            name, output=write_chunk, format='csv', header=True
+        )
+    await session.execute(text(f'DROP TABLE {name}'))
+    return path
+
+
+async def apply_retention_policy(
+    session: AsyncSession, retention_months: int, mode: str, archive_dir: str
+) -> list[str]:
+    """
+    Отсоединяет секции старше срока хранения. В режиме архивации секции
+    выгружаются в сжатые файлы и удаляются из базы, в режиме отсоединения
+    остаются в базе отдельными таблицами. Возвращает имена обработанных
+    секций.
+    """
+    boundary = add_months(month_start(datetime.utcnow()), -retention_months)
+    processed = []
+    for table in PARTITIONED_TABLES:
+        for name, start in await get_partitions(session, table):
+            if add_months(start, 1) > boundary:
+                break
+            await session.execute(
+                text(f'ALTER TABLE {table} DETACH PARTITION {name}')
+            )
+            if mode == RETENTION_MODE_ARCHIVE:
+                path = await _archive_partition(session, name, archive_dir)
+                logger.info('Секция %s выгружена в %s', name, path)
+            else:
+                logger.info('Секция %s отсоединена', name)
+            await session.commit()
+            processed.append(name)
+    return processed
@@ -0,0 +1,22 @@
+import asyncio
+from weakref import WeakKeyDictionary
+
+from redis import asyncio as aioredis
+
+from app.config import settings
+
+_clients: WeakKeyDictionary = WeakKeyDictionary()
+
+
+def get_redis() -> aioredis.Redis:
+    """
+    Возвращает клиент Redis для текущего цикла событий. Соединения клиента
+    привязаны к циклу, а задачи Celery запускают новый цикл на каждый вызов,
+    поэтому клиент создается отдельно для каждого цикла.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = aioredis.from_url(settings.redis_url)
+        _clients[loop] = client
+    return client
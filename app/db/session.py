@@ -1,20 +1,107 @@
 from typing import AsyncGenerator
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine, AsyncSession, create_async_engine
+)
 from sqlalchemy.orm import sessionmaker
 
 from app.config import settings
+from app.db.loader import DataLoader
+from app.db.slow_queries import slow_query_log
+from app.tracing import end_span, is_tracing_enabled, start_span
 
 DATABASE_URL = settings.database_url
 
-engine = create_async_engine(DATABASE_URL)
+_engine: AsyncEngine | None = None
+
+
+def get_engine() -> AsyncEngine:
+    """
+    Возвращает движок основной базы, создавая его при первом обращении.
+    Импорт модуля не загружает драйвер базы, а каждый процесс, в том числе
+    порождённый через fork, создает собственный пул соединений.
+    """
+    global _engine
+    if _engine is None:
+        _engine = create_async_engine(
+            DATABASE_URL, pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow
+        )
+        if slow_query_log is not None:
+            slow_query_log.observe(_engine)
+    return _engine
+
+
+async def dispose_engine() -> None:
+    """Закрывает соединения движка основной базы, если он был создан."""
+    if _engine is not None:
+        await _engine.dispose()
+
+
+def start_statement_span(
+    connection, cursor, statement, parameters, context, executemany
+):
+    """Начинает спан выполнения SQL-запроса."""
+    context.trace_span = start_span(
+        'db.query', **{
+            'db.system': 'postgresql',
+            'db.name': connection.engine.url.database,
+            'db.statement': statement,
+            'db.executemany': executemany,
+        }
+    )
+
+
+def end_statement_span(
+    connection, cursor, statement, parameters, context, executemany
+):
+    """Завершает спан выполненного SQL-запроса."""
+    end_span(getattr(context, 'trace_span', None))
+
+
+def fail_statement_span(exception_context):
+    """Завершает спан SQL-запроса, выполнение которого упало с ошибкой."""
+    end_span(
+        getattr(exception_context.execution_context, 'trace_span', None),
+        exception_context.original_exception
+    )
+
+
+if is_tracing_enabled():
+    # Слушатели на классе Engine действуют и для движков шардов.
+    event.listen(Engine, 'before_cursor_execute', start_statement_span)
+    event.listen(Engine, 'after_cursor_execute', end_statement_span)
+    event.listen(Engine, 'handle_error', fail_statement_span)
+
+
+class RoutingSession(AsyncSession):
+    """
+    Сессия основной базы, которая при закрытии закрывает и открытые через
+    неё сессии шардов.
+    """
+
+    def __init__(self, bind=None, **kwargs):
+        super().__init__(bind=bind or get_engine(), **kwargs)
+
+    async def close(self) -> None:
+        for shard_session in self.info.pop('shard_sessions', {}).values():
+            await shard_session.close()
+        await super().close()
+
 
 AsyncSessionLocal = sessionmaker(
-    bind=engine, class_=AsyncSession, expire_on_commit=False
+    class_=RoutingSession, expire_on_commit=False
 )
 
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
-    """Возвращает асинхронную сессию для работы с БД."""
+    """
+    Возвращает асинхронную сессию для работы с БД в рамках запроса API с
+    привязанным к ней загрузчиком объектов.
+    """
     async with AsyncSessionLocal() as session:
+        session.info['request_scoped'] = True
+        session.info['loader'] = DataLoader(session)
         yield session
@@ -0,0 +1,190 @@
+import asyncio
+import os
+from typing import Iterable
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine, AsyncSession, create_async_engine
+)
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.db.slow_queries import slow_query_log
+
+# Таблицы в шардах и их внешние ключи на таблицы основной базы, которые в
+# шарде не выполнимы.
+SHARDED_TABLES = {
+    'posts': ('posts_blog_id_fkey',),
+    'subscriptions': (
+        'subscriptions_user_id_fkey', 'subscriptions_blog_id_fkey'
+    ),
+    'readstatuses': ('readstatuses_user_id_fkey',),
+}
+
+
+class ShardRouter:
+    """
+    Маршрутизатор запросов по шардам. Посты распределены по шардам по
+    blog_id, подписки и статусы прочтения - по user_id: объект хранится в
+    шарде с номером key % количество шардов. Последовательности ID в шарде
+    выдают только ID с тем же остатком от деления, поэтому шард объекта
+    определяется и по его ID. Пользователи, блоги и журнал изменений лент
+    остаются в основной базе. Связи между шардами не поддерживаются базой:
+    при удалении поста удаляются только статусы прочтения из его шарда, а
+    остальные остаются, но на ленты не влияют.
+    """
+
+    def __init__(self, database_urls: list[str]):
+        self.database_urls = database_urls
+        self._engines: list[AsyncEngine] = []
+        self._sessionmakers: list[sessionmaker] = []
+
+    def _create_engines(self) -> None:
+        """Создает движки и фабрики сессий шардов."""
+        self._engines = [
+            create_async_engine(url) for url in self.database_urls
+        ]
+        self._sessionmakers = [
+            sessionmaker(
+                bind=shard_engine, class_=AsyncSession,
+                expire_on_commit=False
+            )
+            for shard_engine in self._engines
+        ]
+        if slow_query_log is not None:
+            for shard_engine in self._engines:
+                slow_query_log.observe(shard_engine)
+
+    @property
+    def engines(self) -> list[AsyncEngine]:
+        """
+        Движки шардов. Создаются при первом обращении, чтобы каждый процесс
+        работал с собственными пулами соединений.
+        """
+        if not self._engines:
+            self._create_engines()
+        return self._engines
+
+    async def dispose(self) -> None:
+        """Закрывает соединения созданных движков шардов."""
+        for shard_engine in self._engines:
+            await shard_engine.dispose()
+
+    @property
+    def shards_count(self) -> int:
+        """Количество шардов."""
+        return len(self.database_urls)
+
+    def get_shard(self, key: int) -> int:
+        """Возвращает номер шарда для ключа шардирования или ID объекта."""
+        return key % self.shards_count
+
+    def get_session(self, session: AsyncSession, key: int) -> AsyncSession:
+        """
+        Возвращает сессию шарда для ключа. Сессии шардов создаются по
+        требованию и живут столько же, сколько сессия основной базы.
+        """
+        shard = self.get_shard(key)
+        shard_sessions = session.info.setdefault('shard_sessions', {})
+        if shard not in shard_sessions:
+            if not self._sessionmakers:
+                self._create_engines()
+            shard_sessions[shard] = self._sessionmakers[shard]()
+        return shard_sessions[shard]
+
+
+shard_router = (
+    ShardRouter(settings.shard_database_urls)
+    if settings.shard_database_urls else None
+)
+
+
+def is_sharded(model) -> bool:
+    """Проверяет, хранится ли модель в шардах."""
+    return shard_router is not None and model.__tablename__ in SHARDED_TABLES
+
+
+def get_shard_session(session: AsyncSession, key: int) -> AsyncSession:
+    """
+    Возвращает сессию шарда для ключа шардирования или ID объекта либо саму
+    сессию, если шардирование выключено.
+    """
+    if shard_router is None:
+        return session
+    return shard_router.get_session(session, key)
+
+
+def get_all_sessions(session: AsyncSession) -> list[AsyncSession]:
+    """
+    Возвращает сессии всех баз, в которых хранятся шардированные таблицы:
+    сессии шардов или саму сессию, если шардирование выключено.
+    """
+    if shard_router is None:
+        return [session]
+    return [
+        shard_router.get_session(session, shard)
+        for shard in range(shard_router.shards_count)
+    ]
+
+
+def group_by_shard(
+    session: AsyncSession, keys: Iterable[int]
+) -> list[tuple[AsyncSession, list[int]]]:
+    """
+    Группирует ключи шардирования или ID объектов по сессиям шардов. Без
+    шардирования все ключи относятся к самой сессии.
+    """
+    keys = list(keys)
+    if shard_router is None:
+        return [(session, keys)]
+    groups: dict[int, list[int]] = {}
+    for key in keys:
+        groups.setdefault(shard_router.get_shard(key), []).append(key)
+    return [
+        (shard_router.get_session(session, shard_keys[0]), shard_keys)
+        for shard_keys in groups.values()
+    ]
+
+
+async def _configure_shard_tables(
+    database_url: str, shard: int, shards_count: int
+) -> None:
+    """
+    Удаляет внешние ключи на таблицы основной базы и настраивает
+    последовательности ID таблиц шарда.
+    """
+    shard_engine = create_async_engine(database_url)
+    async with shard_engine.begin() as connection:
+        for table, foreign_keys in SHARDED_TABLES.items():
+            for foreign_key in foreign_keys:
+                await connection.execute(text(
+                    f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS '
+                    f'{foreign_key}'
+                ))
+            await connection.execute(text(
+                f'ALTER SEQUENCE {table}_id_seq INCREMENT BY {shards_count} '
+                f'RESTART WITH {shard or shards_count}'
+            ))
+    await shard_engine.dispose()
+
+
+def prepare_shard(database_url: str, shard: int, shards_count: int) -> None:
+    """
+    Готовит новую пустую базу шарда: применяет миграции, удаляет внешние
+    ключи на таблицы основной базы и настраивает последовательности ID так,
+    чтобы они выдавали только ID с остатком shard от деления на
+    shards_count.
+    """
+    # Alembic нужен только этой команде и не загружается вместе с API.
+    from alembic import command
+    from alembic.config import Config
+
+    os.environ['DATABASE_URL'] = database_url
+    command.upgrade(Config('alembic.ini'), 'head')
+    asyncio.run(_configure_shard_tables(database_url, shard, shards_count))
+
+
+if __name__ == '__main__':
+    for index, url in enumerate(settings.shard_database_urls):
+        prepare_shard(url, index, len(settings.shard_database_urls))
+        print(f'Шард {index} готов')
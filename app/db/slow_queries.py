@@ -0,0 +1,231 @@
+import asyncio
+import json
+import logging
+import random
+import re
+import time
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import constants, settings
+
+logger = logging.getLogger(__name__)
+
+WHITESPACE = re.compile(r'\s+')
+
+
+def get_statement_shape(statement: str) -> str:
+    """
+    Возвращает форму запроса - его текст без лишних пробелов. Значения
+    передаются связанными параметрами, поэтому запросы, отличающиеся только
+    значениями, имеют одну форму.
+    """
+    return WHITESPACE.sub(' ', statement).strip()
+
+
+def to_native_placeholders(statement: str, parameters) -> str:
+    """Заменяет параметры %s драйвера на $1, $2, ... как ожидает asyncpg."""
+    return statement % tuple(
+        f'${number}' for number in range(1, len(parameters) + 1)
+    )
+
+
+class SlowQueryLog:
+    """
+    Журнал медленных запросов процесса. Запросы дольше threshold_ms
+    записываются всегда, остальные - с вероятностью sample_rate. Для
+    медленных запросов SELECT план EXPLAIN (ANALYZE, BUFFERS) снимается в
+    фоне на отдельном соединении, не чаще раза в explain_interval секунд
+    для одной формы запроса. Хранятся top_n самых медленных форм запросов
+    и кольцевой буфер последних записей.
+    """
+
+    def __init__(
+        self, threshold_ms: float, sample_rate: float, explain: bool,
+        top_n: int, recent_max: int, explain_interval: float,
+        explain_concurrency: int
+    ):
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self.explain = explain
+        self.top_n = top_n
+        self.explain_interval = explain_interval
+        self.explain_concurrency = explain_concurrency
+        self.recent: deque = deque(maxlen=recent_max)
+        self._shapes: dict[str, dict] = {}
+        self._explained_at: dict[str, float] = {}
+        self._explaining: set[asyncio.Task] = set()
+        self.observed = 0
+        self.slow = 0
+
+    def observe(self, engine: AsyncEngine) -> None:
+        """Подключает журнал к событиям выполнения запросов движка."""
+        sync_engine = engine.sync_engine
+        event.listen(sync_engine, 'before_cursor_execute', self._start)
+        event.listen(
+            sync_engine, 'after_cursor_execute',
+            lambda *args: self._finish(engine, *args)
+        )
+
+    @staticmethod
+    def _start(
+        connection, cursor, statement, parameters, context, executemany
+    ):
+        """Запоминает время начала выполнения запроса."""
+        context.query_started = time.perf_counter()
+
+    def _finish(
+        self, engine, connection, cursor, statement, parameters, context,
+        executemany
+    ):
+        """Записывает медленный или попавший в выборку запрос."""
+        started = getattr(context, 'query_started', None)
+        if started is None:
+            return
+        duration_ms = (time.perf_counter() - started) * 1000
+        self.observed += 1
+        is_slow = duration_ms >= self.threshold_ms
+        if not is_slow and random.random() >= self.sample_rate:
+            return
+        shape = get_statement_shape(statement)
+        self.recent.append({
+            'statement': shape,
+            'duration_ms': round(duration_ms, 3),
+            'slow': is_slow,
+            'database': connection.engine.url.database,
+            'at': datetime.utcnow().isoformat(),
+        })
+        if not is_slow:
+            return
+        self.slow += 1
+        self._record_shape(shape, duration_ms)
+        logger.warning('Медленный запрос (%.1f мс): %s', duration_ms, shape)
+        if self.explain and not executemany and self._should_explain(shape):
+            self._schedule_explain(
+                engine, shape,
+                to_native_placeholders(statement, parameters or ()),
+                list(parameters or ())
+            )
+
+    def _record_shape(self, shape: str, duration_ms: float) -> None:
+        """
+        Обновляет статистику формы запроса. Если форм больше top_n,
+        вытесняется форма с наименьшим максимальным временем.
+        """
+        stats = self._shapes.get(shape)
+        if stats is None:
+            stats = self._shapes[shape] = {
+                'statement': shape, 'calls': 0, 'total_ms': 0.0,
+                'max_ms': 0.0, 'plan': None, 'plan_captured_at': None,
+            }
+        stats['calls'] += 1
+        stats['total_ms'] += duration_ms
+        stats['max_ms'] = max(stats['max_ms'], duration_ms)
+        if len(self._shapes) > self.top_n:
+            fastest = min(
+                self._shapes.values(), key=lambda item: item['max_ms']
+            )
+            del self._shapes[fastest['statement']]
+            self._explained_at.pop(fastest['statement'], None)
+
+    def _should_explain(self, shape: str) -> bool:
+        """
+        Нужно ли снимать план: только для SELECT, пока форма в top_n, не
+        чаще explain_interval и не больше explain_concurrency одновременно.
+        """
+        if not shape.upper().startswith('SELECT'):
+            return False
+        if shape not in self._shapes:
+            return False
+        if len(self._explaining) >= self.explain_concurrency:
+            return False
+        explained_at = self._explained_at.get(shape)
+        return (
+            explained_at is None or
+            time.monotonic() - explained_at >= self.explain_interval
+        )
+
+    def _schedule_explain(
+        self, engine: AsyncEngine, shape: str, sql: str, values: list
+    ) -> None:
+        """
+        Запускает снятие плана отдельной задачей. Событие выполняется в
+        потоке цикла событий, но вне корутины, поэтому ждать плана здесь
+        нельзя.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._explained_at[shape] = time.monotonic()
+        task = loop.create_task(self._capture_plan(engine, shape, sql, values))
+        self._explaining.add(task)
+        task.add_done_callback(self._explaining.discard)
+
+    async def _capture_plan(
+        self, engine: AsyncEngine, shape: str, sql: str, values: list
+    ) -> None:
+        """
+        Выполняет EXPLAIN (ANALYZE, BUFFERS) на отдельном соединении прямо
+        через драйвер, минуя события движка, и откатывает транзакцию.
+        """
+        try:
+            async with engine.connect() as connection:
+                raw_connection = await connection.get_raw_connection()
+                driver_connection = raw_connection.driver_connection
+                transaction = driver_connection.transaction()
+                await transaction.start()
+                try:
+                    plan = await driver_connection.fetchval(
+                        'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + sql,
+                        *values
+                    )
+                finally:
+                    await transaction.rollback()
+        except Exception:
+            logger.exception('Не удалось снять план медленного запроса')
+            return
+        stats = self._shapes.get(shape)
+        if stats is not None:
+            stats['plan'] = json.loads(plan)
+            stats['plan_captured_at'] = datetime.utcnow().isoformat()
+
+    def stats(self) -> dict:
+        """Возвращает счётчики, самые медленные формы и последние записи."""
+        top = sorted(
+            self._shapes.values(), key=lambda item: item['max_ms'],
+            reverse=True
+        )
+        return {
+            'threshold_ms': self.threshold_ms,
+            'sample_rate': self.sample_rate,
+            'observed': self.observed,
+            'slow': self.slow,
+            'top': [
+                {
+                    **item,
+                    'mean_ms': round(item['total_ms'] / item['calls'], 3),
+                    'max_ms': round(item['max_ms'], 3),
+                    'total_ms': round(item['total_ms'], 3),
+                }
+                for item in top
+            ],
+            'recent': list(self.recent),
+        }
+
+
+slow_query_log = (
+    SlowQueryLog(
+        threshold_ms=settings.slow_query_threshold_ms,
+        sample_rate=settings.slow_query_sample_rate,
+        explain=settings.slow_query_explain,
+        top_n=constants.SLOW_QUERY_TOP_N,
+        recent_max=constants.SLOW_QUERY_RECENT_MAX,
+        explain_interval=constants.SLOW_QUERY_EXPLAIN_INTERVAL,
+        explain_concurrency=constants.SLOW_QUERY_EXPLAIN_CONCURRENCY
+    )
+    if settings.slow_query_threshold_ms is not None else None
+)
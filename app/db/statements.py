@@ -0,0 +1,58 @@
+from collections import Counter
+from functools import lru_cache
+
+from sqlalchemy import Integer, any_, bindparam, event, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.default import (
+    CACHE_HIT, CACHE_MISS, CACHING_DISABLED, NO_CACHE_KEY, NO_DIALECT_SUPPORT
+)
+
+# Результаты поиска скомпилированного запроса в кэше SQLAlchemy.
+CACHE_RESULTS = {
+    CACHE_HIT: 'hit',
+    CACHE_MISS: 'miss',
+    CACHING_DISABLED: 'disabled',
+    NO_CACHE_KEY: 'no_key',
+    NO_DIALECT_SUPPORT: 'no_dialect_support',
+}
+
+cache_counts: Counter = Counter()
+
+
+def ids_param(name: str):
+    """
+    Возвращает параметр-массив целых чисел. Условие column = ANY(:param)
+    даёт один текст запроса для списков любой длины, поэтому запрос
+    остаётся в кэше SQLAlchemy и в кэше подготовленных запросов asyncpg.
+    """
+    return bindparam(name, type_=ARRAY(Integer))
+
+
+def in_ids(column, name: str):
+    """Условие вхождения значения колонки в параметр-массив name."""
+    return column == any_(ids_param(name))
+
+
+@lru_cache(maxsize=None)
+def get_by_ids_statement(model):
+    """Возвращает общий для всех вызовов запрос объектов модели по ID."""
+    return select(model).where(in_ids(model.id, 'ids'))
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def count_cache_usage(
+    connection, cursor, statement, parameters, context, executemany
+):
+    """Учитывает, был ли скомпилированный запрос взят из кэша."""
+    if context is not None and context.compiled is not None:
+        cache_counts[CACHE_RESULTS.get(context.cache_hit, 'unknown')] += 1
+
+
+def get_cache_stats() -> dict:
+    """Возвращает счётчики обращений к кэшу запросов и долю попаданий."""
+    looked_up = cache_counts['hit'] + cache_counts['miss']
+    return {
+        **{result: cache_counts[result] for result in CACHE_RESULTS.values()},
+        'hit_ratio': cache_counts['hit'] / looked_up if looked_up else 0.0,
+    }
@@ -0,0 +1,74 @@
+from enum import Enum
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class TotalMode(str, Enum):
+    """Способ подсчёта общего количества элементов для пагинации."""
+    EXACT = 'exact'
+    CAPPED = 'capped'
+    ESTIMATE = 'estimate'
+    NONE = 'none'
+
+
+def to_native_sql(
+    statement, dialect, params: dict | None = None
+) -> tuple[str, list]:
+    """
+    Компилирует запрос в SQL с параметрами $1, $2, ... и список значений
+    параметров (с учётом переданных params) для выполнения напрямую через
+    asyncpg.
+    """
+    compiled = statement.compile(
+        dialect=dialect, compile_kwargs={'render_postcompile': True}
+    )
+    params = compiled.construct_params(params)
+    values = [params[name] for name in compiled.positiontup]
+    sql = compiled.string % tuple(
+        f'${number}' for number in range(1, len(values) + 1)
+    )
+    return sql, values
+
+
+async def explain(
+    session: AsyncSession, statement, params: dict | None = None,
+    analyze: bool = False
+) -> list:
+    """Возвращает план выполнения запроса в формате JSON."""
+    sql, values = to_native_sql(statement, session.bind.dialect, params)
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    prepared = await raw_connection.driver_connection.prepare(sql)
+    return await prepared.explain(*values, analyze=analyze)
+
+
+async def count_total(
+    session: AsyncSession, statement, mode: TotalMode, cap: int,
+    params: dict | None = None
+) -> tuple[int | None, TotalMode]:
+    """
+    Считает количество строк запроса выбранным способом и возвращает его
+    вместе со способом, которым оно фактически получено:
+    EXACT - точный COUNT(*) по всем строкам;
+    CAPPED - точный подсчёт не более cap строк; если строк больше, вернётся
+    cap со способом CAPPED, что означает «cap и более»;
+    ESTIMATE - оценка планировщика по статистике таблиц без чтения строк;
+    NONE - подсчёт не выполняется.
+    Значения связанных параметров запроса передаются в params.
+    """
+    if mode == TotalMode.NONE:
+        return None, mode
+    statement = statement.order_by(None)
+    if mode == TotalMode.ESTIMATE:
+        plan = await explain(session, statement, params)
+        return int(plan[0]['Plan']['Plan Rows']), mode
+    if mode == TotalMode.CAPPED:
+        statement = statement.limit(cap + 1)
+    total = await session.execute(
+        select(func.count()).select_from(statement.subquery()), params
+    )
+    total = total.scalar_one()
+    if mode == TotalMode.CAPPED and total > cap:
+        return cap, TotalMode.CAPPED
+    return total, TotalMode.EXACT
@@ -1,22 +1,66 @@
 import logging
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi_pagination import add_pagination
 
 from app.api.api_v1.routers import main_router
-from app.config import settings
+from app.compression import CompressionMiddleware
+from app.config import constants, settings
+from app.db.invalidation import invalidation_bus
+from app.db.session import dispose_engine
+from app.db.shards import shard_router
+from app.profiling import ProfilingMiddleware, request_profiler
+from app.tracing import (
+    configure_tracing, is_tracing_enabled, shutdown_tracing
+)
+from app.warmup import warm_up
 
 logging.basicConfig(
     level=logging.INFO,
     format=settings.logging_format,
     datefmt=settings.logging_dt_format
 )
+configure_tracing('nekidaem-api')
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Запуск и остановка фоновых служб приложения. Процесс начинает принимать
+    запросы только после прогрева, а при остановке закрывает соединения с
+    базой после завершения начатых запросов.
+    """
+    if settings.cache_invalidation_bus:
+        await invalidation_bus.start()
+    if settings.web_warm_up:
+        await warm_up()
+    yield
+    await invalidation_bus.stop()
+    await dispose_engine()
+    if shard_router is not None:
+        await shard_router.dispose()
+    shutdown_tracing()
+
 
 app = FastAPI(
     title=settings.app_title,
-    description=settings.app_description
+    description=settings.app_description,
+    lifespan=lifespan
 )
 
 app.include_router(main_router)
 
+if settings.response_compression:
+    app.add_middleware(
+        CompressionMiddleware, minimum_size=constants.COMPRESSION_MIN_SIZE
+    )
+
+if request_profiler is not None:
+    app.add_middleware(ProfilingMiddleware, profiler=request_profiler)
+
+if is_tracing_enabled():
+    from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+    FastAPIInstrumentor.instrument_app(app)
+
 add_pagination(app)
@@ -1,4 +1,9 @@
-from sqlalchemy import Column, ForeignKey, Integer, String
+from datetime import datetime
+
+from sqlalchemy import (
+    BigInteger, Column, DateTime, Float, ForeignKey, Index, Integer, String,
+    text
+)
 from sqlalchemy.orm import relationship
 
 from app.db.base_class import Base
@@ -38,8 +43,22 @@ class Blog(Base):
     блог", блог выведен в отдельную модель для возможности расширения (
     например, если в будущем будет поддержка нескольких блогов).
     """
+    __table_args__ = (
+        Index('ix_blogs_subscribers_count_id', 'subscribers_count', 'id'),
+        Index('ix_blogs_posts_count_id', 'posts_count', 'id'),
+    )
+
     user_id = Column(Integer, ForeignKey('users.id', ondelete='SET NULL'))
     title = Column(String(const.TITLE_MAX_LENGTH), nullable=False)
+    # Счётчики обновляются в транзакциях подписки, отписки, создания и
+    # удаления поста и периодически сверяются с таблицами.
+    subscribers_count = Column(
+        Integer, nullable=False, default=0, server_default='0'
+    )
+    posts_count = Column(
+        Integer, nullable=False, default=0, server_default='0'
+    )
+    last_post_at = Column(DateTime)
 
     posts = relationship('Post', back_populates='blog', cascade='all, delete')
     subscriptions = relationship(
@@ -51,8 +70,23 @@ class Blog(Base):
         return f'Блог "{self.title}" пользователя {self.user.username}'
 
 
+# Блоги без постов при сортировке по последнему посту идут в конце.
+Index(
+    'ix_blogs_last_post_at_id',
+    Blog.last_post_at.desc().nulls_last(), Blog.id.desc()
+)
+
+
 class Post(Base):
-    """Модель поста в блоге."""
+    """
+    Модель поста в блоге. Таблица секционирована по диапазонам created_at,
+    поэтому время создания обязательно.
+    """
+    __table_args__ = (
+        Index('ix_posts_blog_id_created_at', 'blog_id', 'created_at'),
+    )
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     blog_id = Column(
         Integer, ForeignKey('blogs.id'), nullable=False
     )
@@ -60,7 +94,8 @@ class Post(Base):
     content = Column(String(const.CONTENT_MAX_LENGTH))
 
     read_statuses = relationship(
-        'ReadStatus', back_populates='post', cascade='all, delete'
+        'ReadStatus', back_populates='post', cascade='all, delete',
+        primaryjoin='Post.id == foreign(ReadStatus.post_id)'
     )
     blog = relationship('Blog', back_populates='posts')
 
@@ -84,15 +119,100 @@ class Subscription(Base):
 
 
 class ReadStatus(Base):
-    """Модель статуса прочтения поста пользователем."""
+    """
+    Модель статуса прочтения поста пользователем. Таблица секционирована по
+    диапазонам created_at. Внешний ключ на секционированную таблицу постов
+    потребовал бы составного ключа (id, created_at), поэтому связь с постом
+    поддерживается только на уровне ORM.
+    """
+    __table_args__ = (
+        Index('ix_readstatuses_user_id_post_id', 'user_id', 'post_id'),
+        Index('ix_readstatuses_post_id', 'post_id'),
+    )
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
-    post_id = Column(Integer, ForeignKey('posts.id'), nullable=False)
+    post_id = Column(Integer, nullable=False)
 
     user = relationship('User', back_populates='read_statuses')
-    post = relationship('Post', back_populates='read_statuses')
+    post = relationship(
+        'Post', back_populates='read_statuses',
+        primaryjoin='foreign(ReadStatus.post_id) == Post.id'
+    )
 
     def __str__(self) -> str:
         return (
             f'Статус прочтения поста "{self.post.title}" пользователем ' +
             self.user.username
         )
+
+
+class FeedChange(Base):
+    """
+    Запись журнала изменений лент для дельта-синхронизации клиентов: пост
+    добавлен или удален в блоге, пользователь подписался на блог или
+    отписался от него, пост отмечен прочитанным или непрочитанным. Старые
+    записи периодически удаляются.
+
+    Позицией в журнале служит position, а не ID: ID выдаётся при вставке,
+    и запись с меньшим ID может стать видна позже записи с большим, если
+    её транзакция коммитится дольше. txid - номер транзакции, вставившей
+    запись; position назначается записи только после завершения этой
+    транзакции и всех более ранних, так что позиции растут в порядке
+    коммита.
+    """
+    POST_ADDED = 'post_added'
+    POST_REMOVED = 'post_removed'
+    SUBSCRIBED = 'subscribed'
+    UNSUBSCRIBED = 'unsubscribed'
+    READ = 'read'
+    UNREAD = 'unread'
+
+    __table_args__ = (
+        Index('ix_feedchanges_position', 'position', unique=True),
+        Index('ix_feedchanges_user_id_position', 'user_id', 'position'),
+        Index('ix_feedchanges_blog_id_position', 'blog_id', 'position'),
+        Index(
+            'ix_feedchanges_unpositioned', 'id',
+            postgresql_where=text('position IS NULL')
+        ),
+        Index('ix_feedchanges_created_at', 'created_at'),
+    )
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    kind = Column(String(const.FEED_CHANGE_KIND_MAX_LENGTH), nullable=False)
+    user_id = Column(Integer)
+    blog_id = Column(Integer)
+    post_id = Column(Integer)
+    txid = Column(
+        BigInteger, nullable=False,
+        server_default=text(
+            'CAST(CAST(pg_current_xact_id() AS text) AS bigint)'
+        )
+    )
+    position = Column(BigInteger)
+
+    def __str__(self) -> str:
+        return f'Изменение ленты {self.kind} №{self.id}'
+
+
+class BlogSimilarity(Base):
+    """
+    Похожий блог: similar_blog_id входит в top-K блогов с наибольшим
+    косинусным сходством подписчиков с блогом blog_id. Таблица целиком
+    пересчитывается периодической задачей.
+    """
+    __table_args__ = (
+        Index('ix_blogsimilarities_blog_id', 'blog_id'),
+    )
+
+    blog_id = Column(
+        Integer, ForeignKey('blogs.id', ondelete='CASCADE'), nullable=False
+    )
+    similar_blog_id = Column(
+        Integer, ForeignKey('blogs.id', ondelete='CASCADE'), nullable=False
+    )
+    score = Column(Float, nullable=False)
+
+    def __str__(self) -> str:
+        return f'Блог {self.similar_blog_id} похож на блог {self.blog_id}'
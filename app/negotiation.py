@@ -0,0 +1,81 @@
+from typing import Any, Callable
+
+import msgpack
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+MSGPACK_MEDIA_TYPES = ('application/msgpack', 'application/x-msgpack')
+JSON_MEDIA_TYPE = 'application/json'
+
+
+def parse_quality_values(header: str) -> dict[str, float]:
+    """
+    Разбирает заголовок вида Accept или Accept-Encoding в словарь
+    {значение: q}. Значения без q имеют q=1.
+    """
+    values = {}
+    for item in header.split(','):
+        value, *params = item.strip().split(';')
+        value = value.strip().lower()
+        if not value:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, number = param.strip().partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        values[value] = quality
+    return values
+
+
+def accepts_msgpack(request: Request) -> bool:
+    """
+    Предпочитает ли клиент MessagePack: он указан в Accept и не уступает
+    JSON по q.
+    """
+    accepted = parse_quality_values(request.headers.get('accept', ''))
+    msgpack_quality = max(
+        accepted.get(media_type, 0.0) for media_type in MSGPACK_MEDIA_TYPES
+    )
+    json_quality = max(
+        accepted.get(JSON_MEDIA_TYPE, 0.0), accepted.get('*/*', 0.0)
+    )
+    return msgpack_quality > 0 and msgpack_quality >= json_quality
+
+
+class MsgPackResponse(Response):
+    """Ответ в формате MessagePack."""
+    media_type = MSGPACK_MEDIA_TYPES[0]
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content)
+
+
+class NegotiatedRoute(APIRoute):
+    """
+    Маршрут, отдающий ответ в JSON или, если клиент предпочитает его в
+    заголовке Accept, в MessagePack. Данные в обоих случаях проходят одну и
+    ту же сериализацию по response_model.
+    """
+
+    def get_route_handler(self) -> Callable:
+        json_handler = super().get_route_handler()
+        response_class = self.response_class
+        self.response_class = MsgPackResponse
+        try:
+            msgpack_handler = super().get_route_handler()
+        finally:
+            self.response_class = response_class
+
+        async def handler(request: Request) -> Response:
+            if accepts_msgpack(request):
+                response = await msgpack_handler(request)
+            else:
+                response = await json_handler(request)
+            vary = response.headers.get('vary')
+            response.headers['vary'] = f'{vary}, Accept' if vary else 'Accept'
+            return response
+        return handler
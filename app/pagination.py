@@ -1,12 +1,46 @@
+from typing import Awaitable, Callable, Generic, Optional, Sequence, TypeVar
+
 from fastapi import Query
 from fastapi_pagination import Page
+from fastapi_pagination.api import create_page, resolve_params
 
 from app.config import constants
+from app.db.totals import TotalMode
+
+T = TypeVar('T')
+
+
+class TotalPage(Page[T], Generic[T]):
+    """
+    Страница с указанием способа подсчёта total: exact - точное значение,
+    capped - значение достигло предела и означает «не меньше», estimate -
+    оценка планировщика. При total_mode=none поля total и pages пустые.
+    """
+    total_kind: Optional[TotalMode] = None
 
-CustomPage = Page.with_custom_options(
+
+CustomPage = TotalPage.with_custom_options(
     size=Query(
         constants.POSTS_PER_PAGE,
         ge=1,
         le=constants.MAX_POSTS_IN_FEED
     )
 )
+
+
+async def paginate_lazy(
+    fetch_items: Callable[..., Awaitable[Sequence]],
+    count_items: Callable[[], Awaitable[tuple[int | None, TotalMode]]]
+):
+    """
+    Пагинация на стороне базы: запрашивает только элементы текущей страницы
+    (fetch_items вызывается с limit и offset) и их общее количество вместе
+    со способом его подсчёта (count_items).
+    """
+    params = resolve_params()
+    raw_params = params.to_raw_params().as_limit_offset()
+    items = await fetch_items(
+        limit=raw_params.limit, offset=raw_params.offset
+    )
+    total, total_kind = await count_items()
+    return create_page(items, total, params, total_kind=total_kind)
@@ -0,0 +1,85 @@
+import argparse
+import subprocess
+import sys
+
+from app.config import constants
+
+# Точки входа: API и Celery (воркер и beat загружают один модуль).
+ENTRY_POINTS = {
+    'web': 'app.main',
+    'worker': 'app.celery.app',
+}
+IMPORT_TIME_PREFIX = 'import time:'
+TIMER_CODE = (
+    'import time; started = time.perf_counter(); import {module}; '
+    'print(time.perf_counter() - started)'
+)
+
+
+def profile_import(module: str) -> tuple[float, list[tuple[int, int, str]]]:
+    """
+    Импортирует модуль в новом процессе интерпретатора с -X importtime.
+    Возвращает общее время импорта в секундах и строки отчёта (собственное
+    время модуля в мкс, время с вложенными импортами в мкс, имя модуля).
+    """
+    result = subprocess.run(
+        [
+            sys.executable, '-X', 'importtime', '-c',
+            TIMER_CODE.format(module=module)
+        ],
+        capture_output=True, text=True, check=True
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith(IMPORT_TIME_PREFIX):
+            continue
+        self_us, cumulative_us, name = line[len(IMPORT_TIME_PREFIX):].split(
+            '|'
+        )
+        if not self_us.strip().isdigit():
+            continue
+        modules.append((int(self_us), int(cumulative_us), name.strip()))
+    return float(result.stdout.strip().splitlines()[-1]), modules
+
+
+def main() -> int:
+    """
+    Выводит время холодного импорта точек входа и самые медленные модули.
+    Возвращает код 1, если время импорта какой-либо точки входа превышает
+    бюджет.
+    """
+    parser = argparse.ArgumentParser(
+        description='Профилирование времени запуска API и Celery.'
+    )
+    parser.add_argument(
+        '--entry-point', action='append', dest='entry_points',
+        choices=list(ENTRY_POINTS), help='Точка входа; по умолчанию все.'
+    )
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument(
+        '--budget', type=float, default=constants.STARTUP_TIME_BUDGET,
+        help='Допустимое время импорта в секундах.'
+    )
+    args = parser.parse_args()
+    over_budget = False
+    for entry_point in args.entry_points or ENTRY_POINTS:
+        module = ENTRY_POINTS[entry_point]
+        total, modules = profile_import(module)
+        over_budget |= total > args.budget
+        print(f'{entry_point} ({module}): {total:.3f} с')
+        print(f'{"всего, мс":>10} {"свое, мс":>10}  модуль')
+        for self_us, cumulative_us, name in sorted(
+            modules, key=lambda row: row[1], reverse=True
+        )[:args.top]:
+            print(
+                f'{cumulative_us / 1000:10.1f} {self_us / 1000:10.1f}  {name}'
+            )
+        print()
+    if over_budget:
+        print(f'Время запуска превышает бюджет {args.budget:.3f} с')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,218 @@
+import json
+import os
+import secrets
+import time
+import tracemalloc
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from uuid import uuid4
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import constants, settings
+
+
+class RequestProfiler:
+    """
+    Профили отдельных запросов API этого процесса. Запрос профилируется,
+    если в нём передан заголовок PROFILE_HEADER со значением
+    PROFILING_TOKEN, или если профилирование следующих запросов включено
+    через эндпоинт администратора. Хранятся последние PROFILES_MAX
+    профилей.
+    """
+
+    def __init__(self, token: str, max_profiles: int):
+        self.token = token
+        self.max_profiles = max_profiles
+        self.armed_count = 0
+        self.armed_path = '/'
+        self.profiles: OrderedDict[str, dict] = OrderedDict()
+
+    def arm(self, count: int, path: str = '/') -> None:
+        """Включает профилирование count следующих запросов к path*."""
+        self.armed_count = count
+        self.armed_path = path
+
+    def check_token(self, header: str | None) -> bool:
+        """Совпадает ли значение заголовка PROFILE_HEADER с токеном."""
+        return header is not None and secrets.compare_digest(
+            header.encode(), self.token.encode()
+        )
+
+    def should_profile(self, scope: Scope) -> bool:
+        """
+        Нужно ли профилировать запрос. Запросы к эндпоинтам профилей
+        передают токен для доступа и не профилируются.
+        """
+        if scope['path'].startswith(constants.PROFILES_PATH):
+            return False
+        if self.check_token(
+            Headers(scope=scope).get(constants.PROFILE_HEADER)
+        ):
+            return True
+        if self.armed_count > 0 and scope['path'].startswith(
+            self.armed_path
+        ):
+            self.armed_count -= 1
+            return True
+        return False
+
+    def add(self, profile_id: str, profile: dict) -> None:
+        """Сохраняет профиль, вытесняя самый старый."""
+        self.profiles[profile_id] = profile
+        while len(self.profiles) > self.max_profiles:
+            self.profiles.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Возвращает состояние профилировщика и список профилей."""
+        return {
+            'armed_count': self.armed_count,
+            'armed_path': self.armed_path,
+            'profiles': [
+                {key: value for key, value in profile.items() if key != 'html'}
+                for profile in reversed(self.profiles.values())
+            ],
+        }
+
+
+def _create_request_profiler() -> RequestProfiler | None:
+    """
+    Создает профилировщик запросов, если профилирование включено. Без
+    PROFILING_TOKEN профилирование не включается: иначе профиль любого
+    запроса и эндпоинты профилей были бы доступны всем.
+    """
+    if not settings.profiling:
+        return None
+    if not settings.profiling_token:
+        raise ValueError('Для PROFILING=true нужно задать PROFILING_TOKEN')
+    return RequestProfiler(settings.profiling_token, constants.PROFILES_MAX)
+
+
+request_profiler = _create_request_profiler()
+
+
+class ProfilingMiddleware:
+    """
+    Выполняет выбранные профилировщиком запросы под сэмплирующим
+    профилировщиком pyinstrument с учётом async-кода. ID сохранённого
+    профиля возвращается в заголовке X-Profile-Id, а сам профиль в HTML -
+    по GET /api/v1/admin/profiles/{id}.
+    """
+
+    def __init__(self, app: ASGIApp, profiler: RequestProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http' or not self.profiler.should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+        from pyinstrument import Profiler
+
+        profile_id = uuid4().hex
+        status_code = None
+
+        async def send_with_profile_id(message: Message) -> None:
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                headers = MutableHeaders(raw=message['headers'])
+                headers['X-Profile-Id'] = profile_id
+            await send(message)
+
+        profiler = Profiler(
+            interval=constants.PROFILE_INTERVAL, async_mode='enabled'
+        )
+        started_at = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profiler.stop()
+            self.profiler.add(profile_id, {
+                'id': profile_id,
+                'method': scope['method'],
+                'path': scope['path'],
+                'status': status_code,
+                'duration_ms': (time.perf_counter() - started_at) * 1000,
+                'created_at': datetime.utcnow().isoformat(),
+                'html': profiler.output_html(),
+            })
+
+
+class StageProfiler:
+    """
+    Профиль фонового задания: процессорное и общее время по этапам и
+    снимки памяти tracemalloc после каждой пачки с приростом памяти по
+    строкам кода относительно предыдущего снимка. Выключенный профилировщик
+    ничего не измеряет.
+    """
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.stages = defaultdict(
+            lambda: {'cpu_seconds': 0.0, 'wall_seconds': 0.0, 'calls': 0}
+        )
+        self.batches: list[dict] = []
+        self._snapshot = None
+
+    def start(self) -> None:
+        """Начинает отслеживание выделений памяти."""
+        if self.enabled:
+            tracemalloc.start()
+            self._snapshot = tracemalloc.take_snapshot()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Добавляет время выполнения контекста к этапу name."""
+        if not self.enabled:
+            yield
+            return
+        cpu, wall = time.process_time(), time.perf_counter()
+        try:
+            yield
+        finally:
+            stage = self.stages[name]
+            stage['cpu_seconds'] += time.process_time() - cpu
+            stage['wall_seconds'] += time.perf_counter() - wall
+            stage['calls'] += 1
+
+    def snapshot(self, **info) -> None:
+        """Снимает память после пачки с её описанием info."""
+        if not self.enabled:
+            return
+        snapshot = tracemalloc.take_snapshot()
+        growth = snapshot.compare_to(self._snapshot, 'lineno')
+        current, peak = tracemalloc.get_traced_memory()
+        self.batches.append({
+            **info,
+            'memory_current': current,
+            'memory_peak': peak,
+            'top_growth': [
+                str(stat)
+                for stat in growth[:constants.PROFILE_TOP_ALLOCATIONS]
+            ],
+        })
+        self._snapshot = snapshot
+
+    def stop(self, name: str) -> str | None:
+        """
+        Прекращает отслеживание памяти и сохраняет профиль в JSON-файл в
+        PROFILING_DIR. Возвращает путь к файлу.
+        """
+        if not self.enabled:
+            return None
+        tracemalloc.stop()
+        os.makedirs(settings.profiling_dir, exist_ok=True)
+        path = os.path.join(
+            settings.profiling_dir,
+            f'{name}-{datetime.utcnow():%Y%m%d%H%M%S}-{uuid4().hex[:8]}.json'
+        )
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(
+                {'stages': self.stages, 'batches': self.batches}, file,
+                ensure_ascii=False, indent=2
+            )
+        return path
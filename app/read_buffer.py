@@ -0,0 +1,132 @@
+from datetime import datetime
+
+from app.config import settings
+from app.db.redis import get_redis
+
+OP_MARK = 'mark'
+OP_UNMARK = 'unmark'
+
+
+class ReadStatusBuffer:
+    """
+    Буфер отложенной записи статусов прочтения. События пишутся в поток
+    Redis и подтверждаются сразу, а в базу переносятся пакетами фоновой
+    задачей. Последняя ещё не перенесённая операция по каждой паре
+    (пользователь, пост) хранится в хэше пользователя: он используется для
+    отсеивания повторов и для того, чтобы пользователь сразу видел свои
+    изменения.
+    """
+    STREAM_KEY = 'readstatus:events'
+    PENDING_KEY = 'readstatus:pending:{user_id}'
+    FLUSH_LOCK_KEY = 'readstatus:flush-lock'
+    ENQUEUE_SCRIPT = """
+        local current = redis.call('HGET', KEYS[2], ARGV[2])
+        if current and string.match(current, '^(%a+):') == ARGV[3] then
+            return 0
+        end
+        local event_id = redis.call(
+            'XADD', KEYS[1], '*',
+            'user_id', ARGV[1], 'post_id', ARGV[2], 'op', ARGV[3]
+        )
+        redis.call('HSET', KEYS[2], ARGV[2], ARGV[3] .. ':' .. event_id)
+        return event_id
+    """
+    CLEAR_SCRIPT = """
+        if redis.call('HGET', KEYS[1], ARGV[1]) == ARGV[2] then
+            return redis.call('HDEL', KEYS[1], ARGV[1])
+        end
+        return 0
+    """
+
+    async def enqueue(self, user_id: int, post_id: int, read: bool) -> bool:
+        """
+        Ставит в очередь отметку о прочтении поста или её снятие. Возвращает
+        False, если такая же операция уже ожидает записи.
+        """
+        event_id = await get_redis().eval(
+            self.ENQUEUE_SCRIPT, 2, self.STREAM_KEY,
+            self.PENDING_KEY.format(user_id=user_id),
+            user_id, post_id, OP_MARK if read else OP_UNMARK
+        )
+        return event_id != 0
+
+    async def get_pending(self, user_id: int) -> dict[int, bool]:
+        """
+        Возвращает ожидающие записи изменения пользователя: ID поста и
+        признак того, прочитан ли он.
+        """
+        pending = await get_redis().hgetall(
+            self.PENDING_KEY.format(user_id=user_id)
+        )
+        return {
+            int(post_id): value.decode().startswith(f'{OP_MARK}:')
+            for post_id, value in pending.items()
+        }
+
+    async def get_pending_state(self, user_id: int, post_id: int):
+        """
+        Возвращает ожидающее записи состояние поста: True, если пост отмечен
+        прочитанным, False, если отметка снята, и None, если изменений нет.
+        """
+        value = await get_redis().hget(
+            self.PENDING_KEY.format(user_id=user_id), post_id
+        )
+        if value is None:
+            return None
+        return value.decode().startswith(f'{OP_MARK}:')
+
+    async def apply_pending(self, user_id: int, post_ids) -> set[int]:
+        """
+        Накладывает ожидающие записи изменения на множество ID прочитанных
+        постов из базы.
+        """
+        read_posts_ids = set(post_ids)
+        for post_id, read in (await self.get_pending(user_id)).items():
+            if read:
+                read_posts_ids.add(post_id)
+            else:
+                read_posts_ids.discard(post_id)
+        return read_posts_ids
+
+    async def read_batch(self, count: int):
+        """
+        Читает из начала потока до count событий и сворачивает их: для каждой
+        пары (пользователь, пост) остаётся последняя операция. Возвращает ID
+        прочитанных событий и словарь {(user_id, post_id): (op, event_id,
+        время события)}.
+        """
+        entries = await get_redis().xrange(self.STREAM_KEY, count=count)
+        latest = {}
+        for event_id, fields in entries:
+            event_id = event_id.decode()
+            key = (int(fields[b'user_id']), int(fields[b'post_id']))
+            created_at = datetime.utcfromtimestamp(
+                int(event_id.split('-')[0]) / 1000
+            )
+            latest[key] = (fields[b'op'].decode(), event_id, created_at)
+        return [event_id for event_id, _ in entries], latest
+
+    async def acknowledge(self, event_ids: list, latest: dict) -> None:
+        """
+        Удаляет перенесённые в базу события из потока и снимает отметки об
+        ожидании, если после них не было новых операций.
+        """
+        redis = get_redis()
+        await redis.xdel(self.STREAM_KEY, *event_ids)
+        async with redis.pipeline(transaction=False) as pipe:
+            for (user_id, post_id), (op, event_id, _) in latest.items():
+                pipe.eval(
+                    self.CLEAR_SCRIPT, 1,
+                    self.PENDING_KEY.format(user_id=user_id),
+                    post_id, f'{op}:{event_id}'
+                )
+            await pipe.execute()
+
+    def lock(self, timeout: int):
+        """Блокировка, не дающая двум задачам переносить события разом."""
+        return get_redis().lock(self.FLUSH_LOCK_KEY, timeout=timeout)
+
+
+read_status_buffer = (
+    ReadStatusBuffer() if settings.read_status_write_behind else None
+)
@@ -0,0 +1,33 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+def compute_similar_blogs(
+    user_ids: np.ndarray, blog_ids: np.ndarray, top_k: int
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Считает для каждого блога top_k блогов с наибольшим косинусным
+    сходством множеств подписчиков. Подписки (user_ids[i], blog_ids[i])
+    образуют разреженную матрицу пользователь x блог X, число общих
+    подписчиков пар блогов - произведение X^T X, которое делится на
+    произведение корней из количеств подписчиков блогов. Отбор top_k
+    выполняется без цикла по блогам. Возвращает массивы ID блога, ID
+    похожего блога и сходства.
+    """
+    if not len(user_ids):
+        empty = np.empty(0, dtype=np.int32)
+        return empty, empty, np.empty(0, dtype=np.float32)
+    subscriptions = csr_matrix(
+        (np.ones(len(user_ids), dtype=np.float32), (user_ids, blog_ids))
+    )
+    co_subscriptions = (subscriptions.T @ subscriptions).tocoo()
+    other = co_subscriptions.row != co_subscriptions.col
+    rows = co_subscriptions.row[other]
+    cols = co_subscriptions.col[other]
+    norms = np.sqrt(np.asarray(subscriptions.sum(axis=0)).ravel())
+    scores = co_subscriptions.data[other] / (norms[rows] * norms[cols])
+    order = np.lexsort((-scores, rows))
+    rows, cols, scores = rows[order], cols[order], scores[order]
+    rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+    top = rank < top_k
+    return rows[top], cols[top], scores[top]
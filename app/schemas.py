@@ -1,5 +1,6 @@
 from datetime import datetime
-from typing import Annotated, Optional
+from enum import Enum
+from typing import Annotated, Literal, Optional, Union
 
 from pydantic import BaseModel, EmailStr, Field
 
@@ -39,7 +40,22 @@ class BlogCreate(BaseModel):
 
 class BlogView(ViewMixin, BlogCreate):
     """Схема для отображения блога."""
-    pass
+    subscribers_count: int = 0
+    posts_count: int = 0
+    last_post_at: Optional[datetime] = None
+
+
+class BlogSort(str, Enum):
+    """Порядок списка блогов."""
+    CREATED = 'created'
+    SUBSCRIBERS = 'subscribers'
+    POSTS = 'posts'
+    LAST_POST = 'last_post'
+
+
+class BlogRecommendation(BlogView):
+    """Схема рекомендуемого блога с оценкой сходства с подписками."""
+    score: float
 
 
 class PostCreate(BaseModel):
@@ -85,3 +101,93 @@ class ReadStatusCreate(BaseModel):
 class ReadStatusView(ViewMixin, ReadStatusCreate):
     """Схема для отображения записи о прочитанном пользователем посте."""
     user_id: int
+
+
+class ReadStatusPending(ReadStatusCreate):
+    """
+    Схема для отображения принятой, но ещё не записанной в базу отметки о
+    прочтении поста.
+    """
+    user_id: int
+
+
+class SubscribeOperation(SubscriptionCreate):
+    """Операция пакета: подписка пользователя на блог."""
+    op: Literal['subscribe']
+    user_id: int
+
+
+class UnsubscribeOperation(SubscriptionCreate):
+    """Операция пакета: отписка пользователя от блога."""
+    op: Literal['unsubscribe']
+    user_id: int
+
+
+class MarkReadOperation(ReadStatusCreate):
+    """Операция пакета: отметка поста прочитанным."""
+    op: Literal['mark_read']
+    user_id: int
+
+
+class UnmarkReadOperation(ReadStatusCreate):
+    """Операция пакета: снятие отметки о прочтении поста."""
+    op: Literal['unmark_read']
+    user_id: int
+
+
+class CreatePostOperation(PostCreate):
+    """Операция пакета: создание поста в блоге."""
+    op: Literal['create_post']
+    blog_id: int
+
+
+class DeletePostOperation(BaseModel):
+    """Операция пакета: удаление поста."""
+    op: Literal['delete_post']
+    post_id: int
+
+
+BatchOperation = Annotated[
+    Union[
+        SubscribeOperation, UnsubscribeOperation, MarkReadOperation,
+        UnmarkReadOperation, CreatePostOperation, DeletePostOperation
+    ],
+    Field(discriminator='op')
+]
+
+
+class BatchRequest(BaseModel):
+    """Схема пакета операций, выполняемых в одной транзакции."""
+    operations: Annotated[
+        list[BatchOperation],
+        Field(min_length=1, max_length=const.BATCH_MAX_OPERATIONS)
+    ]
+
+
+class BatchOperationResult(BaseModel):
+    """
+    Схема результата операции пакета: код ответа, который вернул бы
+    отдельный эндпоинт, созданный объект или описание ошибки.
+    """
+    status: int
+    result: Optional[
+        Union[PostView, SubscriptionView, ReadStatusView, ReadStatusPending]
+    ] = None
+    detail: Optional[str] = None
+
+
+class BatchResponse(BaseModel):
+    """Схема результатов операций пакета в порядке запроса."""
+    results: list[BatchOperationResult]
+
+
+class FeedChanges(BaseModel):
+    """
+    Схема для отображения изменений ленты пользователя после токена
+    синхронизации и нового токена.
+    """
+    added: list[PostInFeed] = []
+    removed: list[int] = []
+    read: list[int] = []
+    unread: list[int] = []
+    token: str
@@ -0,0 +1,57 @@
+import math
+import os
+
+import uvicorn
+
+from app.config import settings
+
+CGROUP_CPU_MAX = '/sys/fs/cgroup/cpu.max'
+
+
+def get_available_cpus() -> int:
+    """
+    Возвращает количество процессоров, доступных процессу, с учётом
+    привязки к ядрам и квоты cgroup контейнера.
+    """
+    cpus = len(os.sched_getaffinity(0))
+    try:
+        with open(CGROUP_CPU_MAX) as cpu_max:
+            quota, period = cpu_max.read().split()
+    except (OSError, ValueError):
+        return cpus
+    if quota == 'max':
+        return cpus
+    return max(1, min(cpus, math.ceil(int(quota) / int(period))))
+
+
+def get_workers_count() -> int:
+    """
+    Возвращает количество процессов API: из настроек или, если указан 0,
+    по одному на доступный процессор.
+    """
+    if settings.web_workers > 0:
+        return settings.web_workers
+    return get_available_cpus()
+
+
+def main() -> None:
+    """
+    Запускает API в нескольких процессах на uvloop и httptools. Каждый
+    процесс создает своё подключение к базе, прогревается до начала приёма
+    запросов и по сигналу завершения дожидается обработки начатых запросов
+    не дольше web_graceful_timeout секунд.
+    """
+    uvicorn.run(
+        'app.main:app',
+        host=settings.web_host,
+        port=settings.web_port,
+        workers=get_workers_count(),
+        loop='uvloop',
+        http='httptools',
+        proxy_headers=True,
+        timeout_graceful_shutdown=settings.web_graceful_timeout
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+import asyncio
+from functools import partial, wraps
+from time import monotonic
+from typing import Any, Awaitable, Callable, Hashable
+
+from app.config import constants, settings
+from app.db.invalidation import ALL_ENTITIES, invalidation_bus
+from app.db.session import AsyncSessionLocal
+
+
+class SingleFlight:
+    """
+    Объединение одновременных одинаковых запросов на чтение в процессе:
+    первый вызов выполняет запрос, остальные ждут его результат. Готовые
+    результаты могут храниться в микрокэше ttl секунд.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._in_flight: dict[Hashable, asyncio.Future] = {}
+        self._cache: dict[Hashable, tuple[float, Any]] = {}
+        self._generation = 0
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        """Выполняет fn или присоединяется к идущему вызову с тем же key."""
+        self.calls += 1
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] > monotonic():
+            self.cache_hits += 1
+            return cached[1]
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(
+                partial(self._finish, key, self._generation)
+            )
+        # Отмена одного из ожидающих не должна отменять общий запрос.
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, generation: int, task: asyncio.Future):
+        """Снимает запрос с учёта и кладёт результат в микрокэш."""
+        self._in_flight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        if not self.ttl or generation != self._generation:
+            return
+        now = monotonic()
+        if len(self._cache) >= self.max_entries:
+            self._cache = {
+                cached_key: cached
+                for cached_key, cached in self._cache.items()
+                if cached[0] > now
+            }
+            if len(self._cache) >= self.max_entries:
+                self._cache.clear()
+        self._cache[key] = (now + self.ttl, task.result())
+
+    def clear(self, event: dict | None = None) -> None:
+        """
+        Очищает микрокэш. Результаты запросов, начатых до очистки, в кэш
+        уже не попадут.
+        """
+        self._generation += 1
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        """Возвращает счётчики и долю вызовов, обслуженных без запроса."""
+        saved = self.coalesced + self.cache_hits
+        return {
+            'calls': self.calls,
+            'executions': self.executions,
+            'coalesced': self.coalesced,
+            'cache_hits': self.cache_hits,
+            'in_flight': len(self._in_flight),
+            'coalescing_ratio': saved / self.calls if self.calls else 0.0,
+        }
+
+
+single_flight = (
+    SingleFlight(
+        ttl=settings.single_flight_ttl,
+        max_entries=constants.SINGLE_FLIGHT_CACHE_MAX_ENTRIES
+    )
+    if settings.single_flight else None
+)
+
+if single_flight is not None:
+    invalidation_bus.subscribe(ALL_ENTITIES, single_flight.clear)
+
+
+def coalesced(method):
+    """
+    Декоратор метода чтения CRUD-класса. Одновременные вызовы метода с
+    одинаковыми аргументами из сессий запросов API выполняют один запрос в
+    отдельной сессии и разделяют результат. Объекты результата отсоединены
+    от сессии, поэтому декорируются только методы, результат которых
+    используется лишь для отображения.
+    """
+    @wraps(method)
+    async def wrapper(self, session, *args, **kwargs):
+        if single_flight is None or not session.info.get('request_scoped'):
+            return await method(self, session, *args, **kwargs)
+
+        async def run():
+            async with AsyncSessionLocal() as own_session:
+                return await method(self, own_session, *args, **kwargs)
+
+        key = (
+            self.model.__tablename__, method.__name__, args,
+            tuple(sorted(kwargs.items()))
+        )
+        return await single_flight.do(key, run)
+    return wrapper
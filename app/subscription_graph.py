@@ -0,0 +1,171 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import constants
+from app.crud import feed_change_crud, subscription_crud
+from app.models import FeedChange
+
+EMPTY = np.empty(0, dtype=np.int32)
+
+
+def _to_csr(sources: np.ndarray, targets: np.ndarray):
+    """
+    Строит CSR-представление рёбер: offsets[v]:offsets[v + 1] - диапазон
+    соседей вершины v в массиве соседей, отсортированных по возрастанию.
+    """
+    order = np.lexsort((targets, sources))
+    counts = np.bincount(
+        sources, minlength=int(sources.max(initial=-1)) + 1
+    )
+    offsets = np.zeros(len(counts) + 1, dtype=np.int32)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets, targets[order]
+
+
+def _neighbours(offsets: np.ndarray, targets: np.ndarray, vertex: int):
+    """Возвращает соседей вершины или пустой массив."""
+    if vertex < 0 or vertex + 1 >= len(offsets):
+        return EMPTY
+    return targets[offsets[vertex]:offsets[vertex + 1]]
+
+
+def _edge_keys(user_ids: np.ndarray, blog_ids: np.ndarray) -> np.ndarray:
+    """Упаковывает пары (пользователь, блог) в int64 для сравнения."""
+    return (user_ids.astype(np.int64) << 32) | blog_ids.astype(np.int64)
+
+
+class SubscriptionGraph:
+    """
+    Снимок графа подписок в виде CSR-массивов int32 в обе стороны: блоги,
+    на которые подписан пользователь, и подписчики блога. Миллион подписок
+    занимает около 8 МБ, а выборка соседей не требует запросов к базе.
+    change_id - позиция журнала изменений лент, до которой учтены
+    подписки и отписки.
+    """
+
+    def __init__(
+        self, user_ids: np.ndarray, blog_ids: np.ndarray, change_id: int
+    ):
+        self.change_id = change_id
+        self.refreshed_at = datetime.utcnow()
+        self._user_offsets, self._user_blogs = _to_csr(user_ids, blog_ids)
+        self._blog_offsets, self._blog_users = _to_csr(blog_ids, user_ids)
+
+    @property
+    def edges_count(self) -> int:
+        """Количество подписок в снимке."""
+        return len(self._user_blogs)
+
+    def get_edges(self) -> tuple[np.ndarray, np.ndarray]:
+        """Возвращает массивы ID пользователей и блогов всех подписок."""
+        user_ids = np.repeat(
+            np.arange(len(self._user_offsets) - 1, dtype=np.int32),
+            np.diff(self._user_offsets)
+        )
+        return user_ids, self._user_blogs
+
+    @property
+    def nbytes(self) -> int:
+        """Объём памяти массивов снимка в байтах."""
+        return sum(
+            array.nbytes for array in (
+                self._user_offsets, self._user_blogs, self._blog_offsets,
+                self._blog_users
+            )
+        )
+
+    def get_blogs(self, user_id: int) -> np.ndarray:
+        """Возвращает ID блогов, на которые подписан пользователь."""
+        return _neighbours(self._user_offsets, self._user_blogs, user_id)
+
+    def get_followers(self, blog_id: int) -> np.ndarray:
+        """Возвращает ID пользователей, подписанных на блог."""
+        return _neighbours(self._blog_offsets, self._blog_users, blog_id)
+
+    def apply_changes(
+        self, changes: list[tuple[str, int, int]], change_id: int
+    ) -> 'SubscriptionGraph':
+        """
+        Возвращает новый снимок с учётом подписок и отписок (kind, user_id,
+        blog_id) в порядке журнала. Для каждой пары действует последнее
+        изменение, поэтому повторное применение уже учтённых изменений
+        ничего не меняет.
+        """
+        latest = {
+            (user_id, blog_id): kind for kind, user_id, blog_id in changes
+        }
+        if not latest:
+            self.change_id = change_id
+            self.refreshed_at = datetime.utcnow()
+            return self
+        pairs = np.array(list(latest), dtype=np.int32).reshape(-1, 2)
+        subscribed = np.array(
+            [kind == FeedChange.SUBSCRIBED for kind in latest.values()]
+        )
+        user_ids, blog_ids = self.get_edges()
+        changed_keys = _edge_keys(pairs[:, 0], pairs[:, 1])
+        kept = ~np.isin(_edge_keys(user_ids, blog_ids), changed_keys)
+        added = pairs[subscribed]
+        return SubscriptionGraph(
+            np.concatenate((user_ids[kept], added[:, 0])),
+            np.concatenate((blog_ids[kept], added[:, 1])),
+            change_id
+        )
+
+
+async def load_subscription_graph(
+    session: AsyncSession
+) -> SubscriptionGraph:
+    """
+    Загружает граф подписок, читая таблицы подписок потоком пачками по
+    SUBSCRIPTION_GRAPH_CHUNK_SIZE строк без создания ORM-объектов. Позиция
+    журнала берётся до чтения, так что изменения во время чтения будут
+    применены при следующем обновлении.
+    """
+    change_id = await feed_change_crud.get_last_position(session) or 0
+    user_chunks, blog_chunks = [], []
+    async for rows in subscription_crud.stream_pairs(
+        session, constants.SUBSCRIPTION_GRAPH_CHUNK_SIZE
+    ):
+        chunk = np.array(rows, dtype=np.int32).reshape(-1, 2)
+        user_chunks.append(chunk[:, 0])
+        blog_chunks.append(chunk[:, 1])
+    return SubscriptionGraph(
+        np.concatenate(user_chunks) if user_chunks else EMPTY,
+        np.concatenate(blog_chunks) if blog_chunks else EMPTY,
+        change_id
+    )
+
+
+class SubscriptionGraphCache:
+    """
+    Снимок графа подписок процесса. Снимок загружается целиком один раз, а
+    затем обновляется по журналу изменений лент. Если с последнего
+    обновления журнал мог быть очищен, снимок загружается заново.
+    """
+
+    def __init__(self):
+        self.graph: SubscriptionGraph | None = None
+
+    async def get(self, session: AsyncSession) -> SubscriptionGraph:
+        """Возвращает актуальный снимок графа подписок."""
+        max_age = timedelta(days=constants.FEED_CHANGES_RETENTION_DAYS)
+        if (
+            self.graph is None or
+            datetime.utcnow() - self.graph.refreshed_at >= max_age
+        ):
+            self.graph = await load_subscription_graph(session)
+            return self.graph
+        until_id = await feed_change_crud.get_last_position(session)
+        if until_id is None or until_id <= self.graph.change_id:
+            return self.graph
+        changes = await feed_change_crud.get_subscription_changes(
+            session, since_id=self.graph.change_id, until_id=until_id
+        )
+        self.graph = self.graph.apply_changes(changes, until_id)
+        return self.graph
+
+
+subscription_graph = SubscriptionGraphCache()
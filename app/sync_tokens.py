@@ -0,0 +1,34 @@
+import time
+from datetime import timedelta
+
+from app.config import constants
+
+# Токен синхронизации: позиция в журнале изменений лент и время выдачи.
+TOKEN_SEPARATOR = '.'
+
+
+class ExpiredSyncToken(Exception):
+    """Записи журнала после позиции токена уже удалены."""
+
+
+def encode_sync_token(change_id: int) -> str:
+    """Формирует токен синхронизации для позиции в журнале изменений."""
+    issued_at = int(time.time())
+    return f'{change_id}{TOKEN_SEPARATOR}{issued_at}'
+
+
+def decode_sync_token(token: str) -> int:
+    """
+    Возвращает позицию в журнале изменений из токена синхронизации.
+    Вызывает ValueError для некорректного токена и ExpiredSyncToken, если
+    токен старше срока хранения журнала.
+    """
+    change_id, issued_at = (
+        int(part) for part in token.split(TOKEN_SEPARATOR)
+    )
+    if change_id < 0:
+        raise ValueError(token)
+    retention = timedelta(days=constants.FEED_CHANGES_RETENTION_DAYS)
+    if issued_at + retention.total_seconds() <= time.time():
+        raise ExpiredSyncToken(token)
+    return change_id
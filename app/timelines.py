@@ -0,0 +1,207 @@
+import heapq
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from app.config import constants, settings
+from app.db.invalidation import ALL_ENTITIES, invalidation_bus
+from app.db.redis import get_redis
+
+TIMELINE_BACKEND_MEMORY = 'memory'
+TIMELINE_BACKEND_REDIS = 'redis'
+
+# Лента блога: пары (время создания поста в секундах, ID поста) в порядке
+# убывания времени, при равном времени - ID поста.
+Timeline = list[tuple[float, int]]
+
+
+def to_timestamp(moment: datetime) -> float:
+    """Переводит время создания поста (UTC без часового пояса) в секунды."""
+    return moment.replace(tzinfo=timezone.utc).timestamp()
+
+
+class LocalTimelineCache:
+    """LRU-кэш лент блогов в памяти процесса."""
+
+    def __init__(self, max_blogs: int, max_length: int):
+        self.max_blogs = max_blogs
+        self.max_length = max_length
+        self._timelines: OrderedDict[int, Timeline] = OrderedDict()
+
+    async def get_many(self, blog_ids: list[int]) -> dict[int, Timeline]:
+        """Возвращает закэшированные ленты блогов."""
+        timelines = {}
+        for blog_id in blog_ids:
+            timeline = self._timelines.get(blog_id)
+            if timeline is not None:
+                self._timelines.move_to_end(blog_id)
+                timelines[blog_id] = timeline
+        return timelines
+
+    async def set_many(self, timelines: dict[int, Timeline]) -> None:
+        """
+        Сохраняет ленты блогов, вытесняя давно не запрошенные. Посты,
+        добавленные в ленту, пока она загружалась, не теряются.
+        """
+        for blog_id, timeline in timelines.items():
+            current = self._timelines.get(blog_id, [])
+            self._timelines[blog_id] = sorted(
+                set(timeline) | set(current), reverse=True
+            )[:self.max_length]
+            self._timelines.move_to_end(blog_id)
+        while len(self._timelines) > self.max_blogs:
+            self._timelines.popitem(last=False)
+
+    async def add(self, blog_id: int, post_id: int, created_at: datetime):
+        """Добавляет новый пост в ленту блога, если она закэширована."""
+        timeline = self._timelines.get(blog_id)
+        if timeline is None:
+            return
+        entry = (to_timestamp(created_at), post_id)
+        self._timelines[blog_id] = sorted(
+            [entry, *timeline], reverse=True
+        )[:self.max_length]
+
+    async def evict(self, blog_id: int) -> None:
+        """Удаляет ленту блога из кэша."""
+        self.discard(blog_id)
+
+    def discard(self, blog_id: int) -> None:
+        """Синхронно удаляет ленту блога из кэша."""
+        self._timelines.pop(blog_id, None)
+
+    def handle_invalidation(self, event: dict) -> None:
+        """
+        Удаляет ленту блога, изменённую другим процессом, или весь кэш при
+        сбросе шины инвалидации.
+        """
+        if event['entity'] == ALL_ENTITIES:
+            self._timelines.clear()
+        else:
+            self.discard(event['blog_id'])
+
+
+class RedisTimelineCache:
+    """
+    Кэш лент блогов в сортированных множествах Redis. Пустая, но
+    загруженная лента отличается от отсутствующей служебным элементом.
+    """
+    KEY = 'timeline:blog:{blog_id}'
+    LOADED_MARKER = b'loaded'
+    ADD_SCRIPT = """
+        if redis.call('EXISTS', KEYS[1]) == 1 then
+            redis.call('ZADD', KEYS[1], ARGV[1], ARGV[2])
+            redis.call('ZREMRANGEBYRANK', KEYS[1], 0, -ARGV[3] - 2)
+        end
+    """
+
+    def __init__(self, max_length: int, ttl: int):
+        self.max_length = max_length
+        self.ttl = ttl
+
+    async def get_many(self, blog_ids: list[int]) -> dict[int, Timeline]:
+        """Возвращает закэшированные ленты блогов."""
+        async with get_redis().pipeline(transaction=False) as pipe:
+            for blog_id in blog_ids:
+                pipe.zrevrange(
+                    self.KEY.format(blog_id=blog_id), 0, -1, withscores=True
+                )
+            results = await pipe.execute()
+        timelines = {}
+        for blog_id, entries in zip(blog_ids, results):
+            if entries:
+                # При равном времени Redis упорядочивает посты по ID как
+                # по строкам, поэтому порядок ленты восстанавливается.
+                timelines[blog_id] = sorted(
+                    (
+                        (score, int(member)) for member, score in entries
+                        if member != self.LOADED_MARKER
+                    ),
+                    reverse=True
+                )
+        return timelines
+
+    async def set_many(self, timelines: dict[int, Timeline]) -> None:
+        """
+        Сохраняет ленты блогов. Загруженная лента сливается с уже
+        сохранённой, а не заменяет её: пост, закоммиченный, пока другой
+        запрос загружал ленту, мог попасть в кэш только через add.
+        """
+        async with get_redis().pipeline(transaction=True) as pipe:
+            for blog_id, timeline in timelines.items():
+                key = self.KEY.format(blog_id=blog_id)
+                mapping = {
+                    post_id: timestamp
+                    for timestamp, post_id in timeline[:self.max_length]
+                }
+                mapping[self.LOADED_MARKER] = float('inf')
+                pipe.zadd(key, mapping)
+                pipe.zremrangebyrank(key, 0, -self.max_length - 2)
+                pipe.expire(key, self.ttl)
+            await pipe.execute()
+
+    async def add(self, blog_id: int, post_id: int, created_at: datetime):
+        """Добавляет новый пост в ленту блога, если она закэширована."""
+        await get_redis().eval(
+            self.ADD_SCRIPT, 1, self.KEY.format(blog_id=blog_id),
+            to_timestamp(created_at), post_id, self.max_length
+        )
+
+    async def evict(self, blog_id: int) -> None:
+        """Удаляет ленту блога из кэша."""
+        await get_redis().delete(self.KEY.format(blog_id=blog_id))
+
+
+def merge_timelines(
+    timelines: list[Timeline], max_length: int, horizon: float,
+    offset: int, limit: int, include=None, exclude=None
+) -> list[int] | None:
+    """
+    Сливает ленты блогов k-путевым слиянием через кучу и возвращает ID постов
+    запрошенной страницы. Если какая-то лента обрезана до max_length и
+    страница заходит за её последний элемент, результат был бы неполным,
+    и функция возвращает None.
+    """
+    floor = max(
+        (timeline[-1][0] for timeline in timelines
+         if len(timeline) >= max_length),
+        default=None
+    )
+    page_end = offset + limit
+    selected = []
+    merged = heapq.merge(*timelines, reverse=True)
+    for timestamp, post_id in merged:
+        if timestamp < horizon:
+            break
+        if floor is not None and timestamp <= floor:
+            return None
+        if include is not None and post_id not in include:
+            continue
+        if exclude is not None and post_id in exclude:
+            continue
+        selected.append(post_id)
+        if len(selected) == page_end:
+            break
+    return selected[offset:]
+
+
+def _create_timeline_cache():
+    """Создает кэш лент блогов согласно настройкам."""
+    if settings.feed_timeline_cache == TIMELINE_BACKEND_REDIS:
+        return RedisTimelineCache(
+            max_length=constants.TIMELINE_MAX_LENGTH,
+            ttl=constants.TIMELINE_TTL_SECONDS
+        )
+    if settings.feed_timeline_cache == TIMELINE_BACKEND_MEMORY:
+        return LocalTimelineCache(
+            max_blogs=constants.TIMELINE_CACHE_MAX_BLOGS,
+            max_length=constants.TIMELINE_MAX_LENGTH
+        )
+    return None
+
+
+timeline_cache = _create_timeline_cache()
+
+if isinstance(timeline_cache, LocalTimelineCache):
+    invalidation_bus.subscribe(
+        'posts', timeline_cache.handle_invalidation, local=False
+    )
@@ -0,0 +1,137 @@
+import inspect
+import os
+from contextlib import contextmanager
+from functools import wraps
+
+from app.config import settings
+
+TRACING_EXPORTERS = ('otlp', 'file')
+
+# Трассировщик процесса; None, пока трассировка не настроена.
+tracer = None
+_provider = None
+
+
+def is_tracing_enabled() -> bool:
+    """Включена ли трассировка в настройках."""
+    return bool(settings.tracing_exporter)
+
+
+def _create_exporter():
+    """
+    Возвращает экспортёр спанов: OTLP по HTTP (адрес коллектора задаётся
+    стандартной переменной OTEL_EXPORTER_OTLP_ENDPOINT) или запись спанов
+    построчно в JSON-файл для проверки без коллектора.
+    """
+    if settings.tracing_exporter == 'otlp':
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+            OTLPSpanExporter
+        )
+        return OTLPSpanExporter()
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+    return ConsoleSpanExporter(
+        out=open(settings.tracing_file, 'a', encoding='utf-8'),
+        formatter=lambda span: span.to_json(indent=None) + os.linesep
+    )
+
+
+def configure_tracing(service_name: str) -> None:
+    """
+    Настраивает трассировку процесса, если она включена. OpenTelemetry
+    импортируется только здесь, так что без трассировки он не загружается.
+    Процессы, порождённые через fork, должны вызывать функцию заново.
+    """
+    global tracer, _provider
+    if not is_tracing_enabled():
+        return
+    if settings.tracing_exporter not in TRACING_EXPORTERS:
+        raise ValueError(
+            f'Неизвестный экспортёр трассировки: {settings.tracing_exporter}'
+        )
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import SERVICE_NAME, Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+    _provider = TracerProvider(
+        resource=Resource.create({SERVICE_NAME: service_name})
+    )
+    _provider.add_span_processor(BatchSpanProcessor(_create_exporter()))
+    trace.set_tracer_provider(_provider)
+    tracer = _provider.get_tracer('app')
+
+
+def shutdown_tracing() -> None:
+    """Отправляет накопленные спаны и останавливает трассировку."""
+    if _provider is not None:
+        _provider.shutdown()
+
+
+def _clean(attributes: dict) -> dict:
+    """Убирает атрибуты без значения: OpenTelemetry их не принимает."""
+    return {
+        key: value for key, value in attributes.items() if value is not None
+    }
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Открывает текущий спан с атрибутами. Без трассировки ничего не делает и
+    возвращает None.
+    """
+    if tracer is None:
+        yield None
+        return
+    with tracer.start_as_current_span(
+        name, attributes=_clean(attributes)
+    ) as current:
+        yield current
+
+
+def start_span(name: str, **attributes):
+    """
+    Начинает дочерний спан текущего спана, не делая его текущим. Спан нужно
+    завершить вызовом end_span. Без трассировки возвращает None.
+    """
+    if tracer is None:
+        return None
+    return tracer.start_span(name, attributes=_clean(attributes))
+
+
+def end_span(current, exception: BaseException | None = None) -> None:
+    """Завершает спан, отмечая в нём исключение, если оно передано."""
+    if current is None:
+        return
+    if exception is not None:
+        from opentelemetry.trace import Status, StatusCode
+        current.record_exception(exception)
+        current.set_status(Status(StatusCode.ERROR, str(exception)))
+    current.end()
+
+
+def traced(name: str):
+    """Декоратор корутины, выполняющий её внутри спана name."""
+    def decorator(function):
+        @wraps(function)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await function(*args, **kwargs)
+        wrapper.__traced__ = True
+        return wrapper
+    return decorator
+
+
+def trace_methods(cls) -> None:
+    """
+    Оборачивает в спаны публичные асинхронные методы класса, в том числе
+    унаследованные от примесей. Спан называется по классу и методу.
+    """
+    for name, method in inspect.getmembers(cls, inspect.iscoroutinefunction):
+        if name.startswith('_') or getattr(method, '__traced__', False):
+            continue
+        if isinstance(
+            inspect.getattr_static(cls, name), (staticmethod, classmethod)
+        ):
+            continue
+        setattr(cls, name, traced(f'{cls.__name__}.{name}')(method))
@@ -0,0 +1,61 @@
+import asyncio
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.crud import (
+    post_crud, read_status_crud, subscription_crud, user_crud
+)
+from app.db.loader import get_loader
+from app.db.session import AsyncSessionLocal, get_engine
+from app.db.shards import shard_router
+from app.db.totals import TotalMode
+from app.models import Blog, Post, ReadStatus, Subscription, User
+
+# ID, которого нет в базе: прогревочные запросы ничего не находят.
+MISSING_ID = 0
+
+
+async def warm_up_pool(db_engine: AsyncEngine) -> None:
+    """Открывает постоянные соединения пула заранее."""
+    async def ping():
+        async with db_engine.connect() as connection:
+            await connection.execute(text('SELECT 1'))
+
+    await asyncio.gather(*(ping() for _ in range(db_engine.pool.size())))
+
+
+async def warm_up_statements() -> None:
+    """
+    Выполняет основные запросы API для несуществующих объектов, чтобы
+    скомпилированные запросы попали в кэш SQLAlchemy до первых запросов
+    пользователей.
+    """
+    async with AsyncSessionLocal() as session:
+        loader = get_loader(session)
+        for model in (User, Blog, Post, Subscription, ReadStatus):
+            await loader.load(model, MISSING_ID)
+        await user_crud.get_by_username_or_email(session, '', '')
+        await subscription_crud.get(session, MISSING_ID, MISSING_ID)
+        await subscription_crud.get_multi_for_user(session, MISSING_ID)
+        await read_status_crud.get(session, MISSING_ID, MISSING_ID)
+        await read_status_crud.get_multi_for_user(session, MISSING_ID)
+        await post_crud.get_multi_for_blog(session, MISSING_ID, limit=1)
+        await post_crud.count_for_blog(session, MISSING_ID)
+        for read in (None, True, False):
+            await post_crud.get_page_for_user_feed(
+                session, MISSING_ID, limit=1, read=read
+            )
+            for total_mode in (TotalMode.EXACT, TotalMode.CAPPED):
+                await post_crud.count_for_user_feed(
+                    session, MISSING_ID, read=read, total_mode=total_mode
+                )
+
+
+async def warm_up() -> None:
+    """Прогревает пулы соединений основной базы и шардов и кэш запросов."""
+    engines = [get_engine()]
+    if shard_router is not None:
+        engines += shard_router.engines
+    await asyncio.gather(*(warm_up_pool(db_engine) for db_engine in engines))
+    await warm_up_statements()
@@ -5,4 +5,4 @@ echo "Running Alembic migrations"
 alembic upgrade head
 
 echo "Starting the application"
-exec uvicorn app.main:app --host 0.0.0.0 --port 8000
\ No newline at end of file
+exec python -m app.serve
\ No newline at end of file